@@ -14,6 +14,7 @@ from PyQt5 import QtWidgets, QtGui, QtCore
 import kaggle
 
 from .models.densenet_1ch import DenseNet, densenet201
+from .models.partition import DEFAULT_CUT, split_densenet
 
 torch.backends.cudnn.benchmark = True
 
@@ -61,13 +62,15 @@ class ModelThread(QtCore.QThread):
     __flop: int
 
     __batch_size: int
+    __split_point: str
     __run_mode: str
     __run_warmup: bool
     __run_inference: bool
 
-    def __init__(self, parent=None) -> None:
+    def __init__(self, parent=None, split_point: str = DEFAULT_CUT) -> None:
         super().__init__(parent)
         self.setObjectName("ModelThread")
+        self.__split_point = split_point
         self.__device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.__run_mode = ""
         self.__flop = 0
@@ -224,34 +227,14 @@ class ModelThread(QtCore.QThread):
         return
 
     def _gen_model_split(self):
-        first_layer_names = []
-
-        # 첫 Max Pool 지점까지의 레이어 이름 수집
-        for name, layer in self.__model.features.named_children():
-            first_layer_names.append(name)
-            if isinstance(layer, torch.nn.MaxPool2d):
-                break
-
-        # 1번, 2번, 3번 모델의 레이어 수집
-        first_layers = []  # Input Layer ~ Max Pool Layer
-        second_layer = []  # Max Pool Layer ~ DenseNet End
-        third_layer = []  # DenseNet End ~ Classifier
-        for name, layer in self.__model.features.named_children():
-            if name in first_layer_names:
-                first_layers.append(layer)
-            else:
-                second_layer.append(layer)
-        third_layer = [
-            torch.nn.ReLU(inplace=True),
-            torch.nn.AdaptiveAvgPool2d((1, 1)),
-            torch.nn.Flatten(start_dim=1),
-            self.__model.classifier,
-        ]
-        second_layer += third_layer
-
-        # 각 파트 모델 생성
-        first_part_model = torch.nn.Sequential(*first_layers)
-        second_part_model = torch.nn.Sequential(*second_layer)
+        # features의 분할 지점 모듈까지를 1번 모델, 나머지와 Classifier를 2번 모델로 분할
+        first_part_model, second_part_model, manifest = split_densenet(
+            self.__model, self.__split_point
+        )
+        print(
+            f"Split Model at {manifest.cut}: {manifest.shape}"
+            f" {manifest.head_flops / 10**9:.4f} / {manifest.tail_flops / 10**9:.4f} GFLOPs"
+        )
         return first_part_model, second_part_model
 
 
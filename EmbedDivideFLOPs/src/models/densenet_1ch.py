@@ -9,7 +9,14 @@ import torch.utils.checkpoint as cp
 from torch import Tensor
 
 
-__all__ = ["DenseNet", "densenet121", "densenet169", "densenet201", "densenet161"]
+__all__ = [
+    "DenseNet",
+    "densenet121",
+    "densenet169",
+    "densenet201",
+    "densenet161",
+    "set_concat_buffer",
+]
 
 
 class _DenseLayer(nn.Module):
@@ -57,7 +64,8 @@ class _DenseLayer(nn.Module):
         self.memory_efficient = memory_efficient
 
     def bn_function(self, inputs: List[Tensor]) -> Tensor:
-        concated_features = torch.cat(inputs, 1)
+        # 입력이 하나(블록 출력 버퍼의 앞부분 view)이면 복사하지 않음
+        concated_features = inputs[0] if len(inputs) == 1 else torch.cat(inputs, 1)
         bottleneck_output = self.conv1(
             self.relu1(self.norm1(concated_features))
         )  # noqa: T484
@@ -111,6 +119,7 @@ class _DenseLayer(nn.Module):
 
 class _DenseBlock(nn.ModuleDict):
     _version = 2
+    concat_buffer: bool = True  # 배치 크기 1 추론(no_grad) 시 블록 출력 버퍼를 미리 할당
 
     def __init__(
         self,
@@ -133,12 +142,43 @@ class _DenseBlock(nn.ModuleDict):
             self.add_module("denselayer%d" % (i + 1), layer)
 
     def forward(self, init_features: Tensor) -> Tensor:
+        if (
+            self.concat_buffer
+            and not torch.is_grad_enabled()
+            and not torch.jit.is_scripting()
+            and init_features.shape[0] == 1
+        ):
+            # 배치가 2 이상이면 버퍼 앞부분 view가 연속 메모리가 아니어서 conv/BN이 다른 커널을 사용하고
+            # 결과가 torch.cat 경로와 달라지므로(1e-6 수준) 배치 크기 1에서만 사용
+            return self._forward_buffer(init_features)
         features = [init_features]
         for name, layer in self.items():
             new_features = layer(features)
             features.append(new_features)
         return torch.cat(features, 1)
 
+    @torch.jit.unused
+    def _forward_buffer(self, init_features: Tensor) -> Tensor:
+        """블록 출력 크기의 버퍼 하나에 layer 출력을 차례로 기록
+
+        layer마다 이전 출력 전체를 torch.cat으로 복사하는 대신 버퍼 앞부분의 view를 입력으로 사용하므로
+        복사량이 layer 수의 제곱에서 선형으로 줄어듭니다. view는 배치 크기 1일 때만 연속 메모리이며,
+        그때만 결과가 torch.cat 경로와 비트 단위로 같습니다.
+        """
+        layers = list(self.values())
+        channels = init_features.shape[1]
+        total = channels + sum(layer.conv2.out_channels for layer in layers)
+        output = init_features.new_empty(
+            (init_features.shape[0], total) + tuple(init_features.shape[2:])
+        )
+        output[:, :channels].copy_(init_features)
+        for layer in layers:
+            new_features = layer(output[:, :channels])
+            growth = new_features.shape[1]
+            output[:, channels : channels + growth].copy_(new_features)
+            channels += growth
+        return output
+
 
 class _Transition(nn.Sequential):
     def __init__(self, num_input_features: int, num_output_features: int) -> None:
@@ -255,6 +295,13 @@ class DenseNet(nn.Module):
         return out
 
 
+def set_concat_buffer(model: nn.Module, enabled: bool = True) -> None:
+    """model(DenseNet 또는 분할 모델)의 모든 dense block에서 추론 시 출력 버퍼 사용 여부 지정"""
+    for module in model.modules():
+        if isinstance(module, _DenseBlock):
+            module.concat_buffer = enabled
+
+
 def _densenet(
     arch: str,
     growth_rate: int,
@@ -0,0 +1,155 @@
+import json
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Tuple
+
+import torch
+from torch import nn
+
+from .densenet_1ch import DenseNet
+
+__all__ = [
+    "DEFAULT_CUT",
+    "SplitManifest",
+    "cut_points",
+    "count_flops",
+    "split_densenet",
+    "split_weight_paths",
+]
+
+DEFAULT_CUT = "pool0"
+INPUT_SHAPE = (1, 1, 256, 256)
+
+
+class SplitManifest(NamedTuple):
+    cut: str  # 헤드의 마지막 features 하위 모듈 이름
+    input_shape: Tuple[int, ...]  # 헤드 입력 shape
+    shape: Tuple[int, ...]  # 분할 지점 텐서 shape
+    head_flops: int  # 헤드 연산량 (thop 기준 MAC)
+    tail_flops: int  # 테일 연산량 (thop 기준 MAC)
+
+    @property
+    def tensor_bytes(self) -> int:
+        """분할 지점 텐서의 float32 바이트 수"""
+        numel = 1
+        for size in self.shape:
+            numel *= size
+        return numel * 4
+
+    def to_dict(self) -> Dict:
+        """JSON 저장용 사전"""
+        return dict(self._asdict(), tensor_bytes=self.tensor_bytes)
+
+    def save(self, path: str) -> None:
+        """JSON 파일 저장"""
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> "SplitManifest":
+        """JSON 파일 로드"""
+        with open(path) as f:
+            data = json.load(f)
+        return cls(
+            cut=data["cut"],
+            input_shape=tuple(data["input_shape"]),
+            shape=tuple(data["shape"]),
+            head_flops=data["head_flops"],
+            tail_flops=data["tail_flops"],
+        )
+
+
+def cut_points(model: DenseNet) -> List[str]:
+    """분할 가능한 지점 (features의 최상위 하위 모듈 이름 순서)"""
+    return [name for name, _ in model.features.named_children()]
+
+
+def _module_flops(module: nn.Module, inputs: Tuple, output: torch.Tensor) -> int:
+    """모듈 하나의 연산량 (thop과 같은 기준: 컨볼루션/선형은 MAC, 나머지는 원소 수)"""
+    if isinstance(module, nn.Conv2d):
+        kernel = module.kernel_size[0] * module.kernel_size[1]
+        return output.numel() * kernel * module.in_channels // module.groups
+    if isinstance(module, nn.Linear):
+        return output.numel() * module.in_features
+    if isinstance(module, nn.BatchNorm2d):
+        return 2 * output.numel()
+    if isinstance(module, (nn.AvgPool2d, nn.AdaptiveAvgPool2d)):
+        return inputs[0].numel()
+    return 0
+
+
+def count_flops(module: nn.Module, inputs: torch.Tensor) -> Tuple[int, torch.Tensor]:
+    """forward hook으로 연산량 측정, (연산량, 출력) 반환"""
+    total = [0]
+
+    def hook(layer: nn.Module, layer_inputs: Tuple, output: torch.Tensor) -> None:
+        total[0] += _module_flops(layer, layer_inputs, output)
+
+    handles = [
+        layer.register_forward_hook(hook)
+        for layer in module.modules()
+        if not list(layer.children())
+    ]
+    try:
+        with torch.no_grad():
+            output = module(inputs)
+    finally:
+        for handle in handles:
+            handle.remove()
+    return total[0], output
+
+
+def split_densenet(
+    model: DenseNet,
+    cut: str = DEFAULT_CUT,
+    input_shape: Tuple[int, ...] = INPUT_SHAPE,
+) -> Tuple[nn.Sequential, nn.Sequential, SplitManifest]:
+    """DenseNet을 features의 `cut` 모듈 직후에서 헤드/테일로 분할
+
+    헤드는 장치에서, 테일은 서버에서 실행하며 head(x)를 tail에 넣으면 model(x)와 같은 결과를 냅니다.
+    """
+    names = cut_points(model)
+    if cut not in names:
+        raise ValueError(f"unknown cut point: {cut} (available: {', '.join(names)})")
+    index = names.index(cut) + 1
+    children = list(model.features.named_children())
+    head = nn.Sequential(OrderedDict(children[:index]))
+    tail = nn.Sequential(
+        OrderedDict(
+            children[index:]
+            + [
+                ("relu", nn.ReLU(inplace=True)),
+                ("avgpool", nn.AdaptiveAvgPool2d((1, 1))),
+                ("flatten", nn.Flatten(start_dim=1)),
+                ("classifier", model.classifier),
+            ]
+        )
+    )
+    head.eval()
+    tail.eval()
+
+    device = next(model.parameters()).device
+    inputs = torch.zeros(input_shape, device=device)
+    head_flops, feature = count_flops(head, inputs)
+    tail_flops, _ = count_flops(tail, feature)
+    manifest = SplitManifest(
+        cut=cut,
+        input_shape=tuple(input_shape),
+        shape=tuple(feature.shape),
+        head_flops=head_flops,
+        tail_flops=tail_flops,
+    )
+    return head, tail, manifest
+
+
+def split_weight_paths(
+    model_dir: Path, cut: str = DEFAULT_CUT, name: str = "densenet201"
+) -> Tuple[Path, Path, Path]:
+    """분할 모델 파일 경로 (헤드, 테일, manifest), 기본 분할 지점은 기존 파일 이름 유지"""
+    prefix = f"ckpt_{name}_partial" if cut == DEFAULT_CUT else f"ckpt_{name}_{cut}"
+    model_dir = Path(model_dir)
+    return (
+        model_dir / f"{prefix}_1.pt",
+        model_dir / f"{prefix}_2.pt",
+        model_dir / f"{prefix}.json",
+    )
@@ -0,0 +1,194 @@
+import os
+import mmap
+import struct
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Union
+
+import torch
+
+from comm.codec import DTYPE_CODES, CODE_DTYPES
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "tdistwork" / "features"
+
+_MAGIC = b"TWFC"
+_SUFFIX = ".feat"
+# 항목 파일 헤더: magic, dtype, ndim, shape[8], 텐서 바이트는 _DATA_OFFSET부터 (정렬 유지)
+_HEADER = struct.Struct("!4sBB8Q")
+_DATA_OFFSET = 128
+
+
+def model_fingerprint(weight_path: Union[str, Path], device: str = "") -> str:
+    """헤드 모델 가중치 파일의 이름, 크기, 수정 시각과 실행 장치로 만든 식별자"""
+    stat = os.stat(weight_path)
+    return f"{Path(weight_path).name}:{stat.st_size}:{stat.st_mtime_ns}:{device}"
+
+
+class FeatureCache:
+    __directory: Path
+    __max_bytes: int
+    __fingerprint: str
+    __entries: "OrderedDict[str, int]"
+    __bytes: int
+    __hits: int
+    __misses: int
+    __lock: threading.Lock
+
+    def __init__(
+        self,
+        directory: Union[str, Path] = DEFAULT_CACHE_DIR,
+        max_bytes: int = 256 * 1024 * 1024,
+        fingerprint: str = "",
+    ) -> None:
+        """이미지별 헤드 모델 출력의 디스크 캐시 (읽기는 mmap, 크기 한도를 넘으면 LRU 제거)
+
+        키는 이미지 경로, 파일 크기와 수정 시각, 헤드 모델 식별자(fingerprint)의 digest이므로
+        이미지나 헤드 모델이 바뀌면 이전 항목은 사용하지 않고 LRU 순서에 따라 제거됩니다.
+        LRU 순서는 항목 파일의 수정 시각으로 유지하므로 재시작 후에도 이어집니다.
+        """
+        self.__directory = Path(directory)
+        self.__directory.mkdir(parents=True, exist_ok=True)
+        self.__max_bytes = max_bytes
+        self.__fingerprint = fingerprint
+        self.__entries = OrderedDict()
+        self.__bytes = 0
+        self.__hits = 0
+        self.__misses = 0
+        self.__lock = threading.Lock()
+        files = sorted(
+            self.__directory.glob(f"*{_SUFFIX}"), key=lambda p: p.stat().st_mtime_ns
+        )
+        for path in files:
+            self.__entries[path.stem] = path.stat().st_size
+            self.__bytes += path.stat().st_size
+        self._evict()
+
+    @property
+    def fingerprint(self) -> str:
+        """헤드 모델 식별자"""
+        return self.__fingerprint
+
+    @fingerprint.setter
+    def fingerprint(self, fingerprint: str) -> None:
+        self.__fingerprint = fingerprint
+
+    def key(self, image_path: Union[str, Path]) -> str:
+        """이미지 파일과 헤드 모델 식별자의 digest, 이미지가 없으면 빈 문자열"""
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            return ""
+        text = (
+            f"{Path(image_path).resolve()}:{stat.st_size}:{stat.st_mtime_ns}"
+            f":{self.__fingerprint}"
+        )
+        return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+    def get(self, image_path: Union[str, Path]) -> Optional[torch.Tensor]:
+        """캐시된 헤드 출력 (파일을 mmap한 텐서), 없으면 None"""
+        key = self.key(image_path)
+        with self.__lock:
+            if key not in self.__entries:
+                self.__misses += 1
+                return None
+            self.__entries.move_to_end(key)
+        path = self._path(key)
+        try:
+            tensor = self._load(path)
+            os.utime(path)  # 재시작 후 LRU 순서 유지
+        except (OSError, ValueError) as e:
+            print(f"feature cache read error: {path.name} {e}")
+            self._remove(key)
+            with self.__lock:
+                self.__misses += 1
+            return None
+        with self.__lock:
+            self.__hits += 1
+        return tensor
+
+    def put(self, image_path: Union[str, Path], tensor: torch.Tensor) -> None:
+        """헤드 출력 저장, 한도를 넘으면 오래 사용하지 않은 항목부터 삭제"""
+        key = self.key(image_path)
+        tensor = tensor.detach().cpu().contiguous()
+        if not key or tensor.dtype not in DTYPE_CODES or tensor.dim() > 8:
+            return
+        data = tensor.reshape(-1).view(torch.uint8).numpy().tobytes()
+        size = _DATA_OFFSET + len(data)
+        if size > self.__max_bytes:
+            return
+        shape = list(tensor.shape) + [0] * (8 - tensor.dim())
+        header = _HEADER.pack(_MAGIC, DTYPE_CODES[tensor.dtype], tensor.dim(), *shape)
+        fd, temp_path = tempfile.mkstemp(dir=self.__directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(header.ljust(_DATA_OFFSET, b"\0"))
+                f.write(data)
+            os.replace(temp_path, self._path(key))
+        except OSError as e:
+            print(f"feature cache write error: {e}")
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            return
+        with self.__lock:
+            self.__bytes += size - self.__entries.pop(key, 0)
+            self.__entries[key] = size
+        self._evict()
+
+    def report(self) -> str:
+        """적중률과 사용량"""
+        with self.__lock:
+            lookups = self.__hits + self.__misses
+            ratio = self.__hits / lookups if lookups else 0.0
+            return (
+                f"feature cache: hit {self.__hits} ({ratio:.1%}), miss {self.__misses},"
+                f" {len(self.__entries)} entries {self.__bytes / 2**20:.1f} MiB"
+                f" / {self.__max_bytes / 2**20:.0f} MiB"
+            )
+
+    def _path(self, key: str) -> Path:
+        """항목 파일 경로"""
+        return self.__directory / f"{key}{_SUFFIX}"
+
+    def _load(self, path: Path) -> torch.Tensor:
+        """항목 파일을 mmap해 텐서로 반환 (복사하지 않음)"""
+        with open(path, "rb") as f:
+            # copy-on-write 매핑: 파일은 바뀌지 않고 읽은 페이지만 메모리에 올림
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        if len(mapped) < _DATA_OFFSET:
+            raise ValueError("truncated entry")
+        magic, dtype_code, ndim, *shape = _HEADER.unpack_from(mapped)
+        if magic != _MAGIC or dtype_code not in CODE_DTYPES or ndim > 8:
+            raise ValueError("invalid entry")
+        dtype = CODE_DTYPES[dtype_code]
+        numel = 1
+        for size in shape[:ndim]:
+            numel *= size
+        itemsize = torch.empty(0, dtype=dtype).element_size()
+        if _DATA_OFFSET + numel * itemsize != len(mapped):
+            raise ValueError("size mismatch")
+        tensor = torch.frombuffer(mapped, dtype=dtype, count=numel, offset=_DATA_OFFSET)
+        return tensor.view(tuple(shape[:ndim]))
+
+    def _remove(self, key: str) -> None:
+        """항목 삭제"""
+        with self.__lock:
+            size = self.__entries.pop(key, None)
+            if size is None:
+                return
+            self.__bytes -= size
+        try:
+            os.unlink(self._path(key))
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        """크기 한도까지 오래 사용하지 않은 항목 삭제"""
+        while True:
+            with self.__lock:
+                if self.__bytes <= self.__max_bytes or not self.__entries:
+                    return
+                key = next(iter(self.__entries))
+            self._remove(key)
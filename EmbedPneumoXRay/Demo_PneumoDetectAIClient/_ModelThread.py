@@ -1,14 +1,23 @@
+import time
+import threading
+from collections import OrderedDict
 from pathlib import Path
+from typing import Optional, Tuple
 from PyQt5.QtCore import QThread
 from PyQt5.QtCore import pyqtSignal as Signal
 
-from PIL import Image
 import numpy as np
 
 import torch
-from torchvision import transforms
 
-from model import DenseNet, densenet201
+from model import DenseNet, load_densenet201, load_image
+from model import DEFAULT_CUT, split_densenet, split_weight_paths
+from model import optimize_for_inference, load_quantized, quantized_weight_paths
+from model import load_exits, attach_exits, exit_weight_path
+from model.early_exit import EarlyExitSequential, densenet_sequential
+from model.partition import INPUT_SHAPE
+
+from _FeatureCache import FeatureCache, model_fingerprint
 
 WORK_DIR = Path(__file__).parent.parent
 
@@ -20,17 +29,53 @@ class ModelThread(QThread):
     __image: np.ndarray
     __result: torch.Tensor
     __device: str = "cuda:0"
+    __split_point: str = DEFAULT_CUT
+    __elapsed: float = 0.0
+    __image_path: str = ""
+    __cache: FeatureCache = None
+    __optimize: bool = False
+    __quantize: bool = False
+    __early_exit: float = 0.0
+    __exits: torch.nn.ModuleDict = None
+    __features: "OrderedDict[str, torch.Tensor]"
+    __max_features: int = 32
+    __lock: threading.Lock
+    __features_lock: threading.Lock
 
     modelResult = Signal(torch.Tensor)
 
-    def __init__(self) -> None:
-        """모델 스레드"""
+    def __init__(
+        self,
+        split_point: str = DEFAULT_CUT,
+        feature_cache: FeatureCache = None,
+        optimize: bool = False,
+        quantize: bool = False,
+        early_exit: float = 0.0,
+    ) -> None:
+        """모델 스레드 (split_point: 장치에서 실행할 마지막 features 모듈 이름)
+
+        feature_cache를 지정하면 이미지별 헤드 출력을 저장하고, 저장된 이미지는 디코딩과 연산을 생략합니다.
+        optimize이면 BatchNorm을 컨볼루션에 합친 추론용 모델을 사용합니다.
+        quantize이면 `model/`의 int8 모델(없으면 fp32 모델)을 CPU에서 실행합니다.
+        early_exit이 0보다 크면 헤드 안의 출구 분류기 확신도가 그 값 이상일 때 분류 결과(logit)를 바로 반환합니다.
+        """
         super().__init__()
+        self.__split_point = split_point
+        self.__cache = feature_cache
+        self.__optimize = optimize
+        self.__quantize = quantize
+        self.__early_exit = early_exit
+        self.__features = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__features_lock = threading.Lock()
         self.__result = (np.array([]), np.array([]))
         self.__image = None
         self.__model_origin = None
         self.__model_partial = None
         self.__device = "cuda:0" if torch.cuda.is_available() else "cpu"
+        if quantize:
+            # int8 연산은 CPU에서만 실행
+            self.__device = "cpu"
         self._init_model_partial()
         # self.start(WORK_DIR / "data/NORMAL/IM-0001-0001.jpeg")
 
@@ -40,91 +85,227 @@ class ModelThread(QThread):
         self.wait()
         return self.get_result()
 
+    @property
+    def elapsed(self) -> float:
+        """마지막 모델 연산 시간 (초)"""
+        return self.__elapsed
+
+    @property
+    def has_origin(self) -> bool:
+        """원본 모델로 장치에서 전체 연산이 가능한지 여부"""
+        return (
+            self.__model_origin is not None
+            or (WORK_DIR / "model/ckpt_densenet201.pt").exists()
+            or (self.__quantize and self._int8_paths()[0].exists())
+        )
+
+    def measure(self, use_origin: bool = False, repeat: int = 3) -> float:
+        """빈 입력으로 모델을 warm-up하고 연산 시간 중앙값 반환 (초)"""
+        if use_origin:
+            self._init_model_origin()
+            model = self.__model_origin
+        else:
+            self._init_model_partial()
+            model = self.__model_partial
+        inputs = torch.zeros(INPUT_SHAPE, device=self.__device)
+        samples = []
+        with torch.no_grad():
+            model(inputs)
+            for _ in range(repeat):
+                start_time = time.perf_counter()
+                model(inputs)
+                if self.__device.startswith("cuda"):
+                    torch.cuda.synchronize()
+                samples.append(time.perf_counter() - start_time)
+        if isinstance(model, EarlyExitSequential):
+            model.stats.reset()  # 측정용 입력은 통계에서 제외
+        return sorted(samples)[len(samples) // 2]
+
+    def has_features(self, image_path: str) -> bool:
+        """미리 연산한 헤드 출력이 메모리에 있는지 여부"""
+        return image_path in self.__features
+
+    def precompute(self, image_path: str) -> bool:
+        """헤드 출력을 미리 연산해 저장 (백그라운드 스레드에서 호출), 이미 있으면 False"""
+        if self._cached_features(image_path) is not None:
+            return False
+        image = load_image(image_path)
+        with self.__lock:
+            self._init_model_partial()
+            with torch.no_grad():
+                result = self.__model_partial(image.to(self.__device)).cpu()
+        self._store_features(image_path, result, self.__cache is not None)
+        return True
+
+    def _cached_features(self, image_path: str) -> Optional[torch.Tensor]:
+        """메모리 또는 디스크 캐시의 헤드 출력, 없으면 None"""
+        with self.__features_lock:
+            result = self.__features.get(image_path)
+        if result is None and self.__cache is not None:
+            result = self.__cache.get(image_path)
+            if result is not None:
+                self._store_features(image_path, result, False)
+        return result
+
+    def _store_features(
+        self, image_path: str, result: torch.Tensor, persist: bool
+    ) -> None:
+        """헤드 출력을 메모리에 저장 (최근 __max_features개), persist이면 디스크 캐시에도 저장"""
+        with self.__features_lock:
+            self.__features[image_path] = result
+            self.__features.move_to_end(image_path)
+            while len(self.__features) > self.__max_features:
+                self.__features.popitem(last=False)
+        if persist:
+            self.__cache.put(image_path, result)
+
     def _init_model_origin(self) -> None:
         """원본 모델 초기화"""
         if not self.__model_origin is None:
             return
+        int8_path = self._int8_paths()[0]
+        if self.__quantize and int8_path.exists():
+            self.__model_origin, _ = load_quantized(int8_path)
+            print(f"int8 model loaded: {int8_path.name}")
+            return
         weight_path = str(WORK_DIR / "model/ckpt_densenet201.pt")
-        load_info = torch.load(weight_path, map_location=self.__device)
-        model_state_dict = load_info["model_state_dict"]
         print(f"load model on {self.__device}")
         print(f"model path: {weight_path}")
-        self.__model_origin = densenet201(pretrained=True, num_classes=2)
-        self.__model_origin.to(self.__device)
-        self.__model_origin.load_state_dict(model_state_dict, strict=False)
-        self.__model_origin.eval()
+        self.__model_origin = self._optimize(
+            load_densenet201(weight_path, self.__device)
+        )
+        if self.__early_exit > 0:
+            self.__model_origin = self._attach_exits(
+                densenet_sequential(self.__model_origin)
+            )
         print("model loaded")
 
     def _init_model_partial(self) -> None:
         """분할 모델 초기화"""
         if not self.__model_partial is None:
             return
-        weight_path = str(WORK_DIR / "model/ckpt_densenet201_partial_1.pt")
-        weight_path_2 = str(WORK_DIR / "model/ckpt_densenet201_partial_2.pt")
+        weight_path, weight_path_2, manifest_path = split_weight_paths(
+            WORK_DIR / "model", self.__split_point
+        )
+        int8_path = self._int8_paths()[1]
+        if self.__quantize and int8_path.exists():
+            self.__model_partial, _ = load_quantized(int8_path)
+            print(f"int8 partial model loaded: {int8_path.name}")
+            self._set_fingerprint(int8_path, False)
+            return
+        if self.__quantize:
+            print(f"int8 model not found: {int8_path.name}")
 
-        if Path(weight_path).exists():
+        if weight_path.exists():
             # 사전 분할한 학습모델 로드
             self.__model_partial = torch.load(weight_path)
             self.__model_partial.to(self.__device)
             self.__model_partial.eval()
-            # 모델 디버그
-            # self.__model_partial2 = torch.load(weight_path_2)
-            # self.__model_partial2.to(self.__device)
-            # self.__model_partial2.eval()
-            print("partial model loaded")
+            print(f"partial model loaded: {weight_path.name}")
+            self.__model_partial = self._attach_exits(
+                self._optimize(self.__model_partial)
+            )
+            self._set_fingerprint(weight_path, self.__optimize)
             return
 
-        self._init_model_origin()
-        first_layers = []  # Input Layer ~ Max Pool Layer
-        second_layers = []  # Max Pool Layer ~ Output Layer
-        first_layer_names = []
-        for name, module in self.__model_origin.features.named_modules():
-            if name == "":
-                continue
-            first_layer_names.append(name)
-            if isinstance(module, torch.nn.MaxPool2d):
-                break
-        for name, module in self.__model_origin.features.named_children():
-            if name in first_layer_names:
-                first_layers.append(module)
-            else:
-                second_layers.append(module)
-        print(f"first layers: {first_layer_names}")
-        second_layers += [
-            torch.nn.ReLU(inplace=True),
-            torch.nn.AdaptiveAvgPool2d((1, 1)),
-            torch.nn.Flatten(start_dim=1),
-            self.__model_origin.classifier,
-        ]
-        self.__model_partial = torch.nn.Sequential(*first_layers)
-        self.__model_partial.to(self.__device)
-        self.__model_partial.eval()
-        self.__model_partial2 = torch.nn.Sequential(*second_layers)
-        self.__model_partial2.to(self.__device)
-        self.__model_partial2.eval()
-        torch.save(self.__model_partial, weight_path)
-        torch.save(self.__model_partial2, weight_path_2)
+        # 파일에는 변환하지 않은 모델을 저장
+        model_partial, model_partial2, manifest = split_densenet(
+            load_densenet201(WORK_DIR / "model/ckpt_densenet201.pt", self.__device),
+            self.__split_point,
+        )
+        print(
+            f"split at {manifest.cut}: {manifest.shape}"
+            f" head {manifest.head_flops / 10**9:.3f} GFLOPs"
+            f" tail {manifest.tail_flops / 10**9:.3f} GFLOPs"
+        )
+        torch.save(model_partial, weight_path)
+        torch.save(model_partial2, weight_path_2)
+        manifest.save(manifest_path)
+        self.__model_partial = self._attach_exits(self._optimize(model_partial))
+        self._set_fingerprint(weight_path, self.__optimize)
         return
 
+    def _optimize(self, model: torch.nn.Module) -> torch.nn.Module:
+        """optimize이면 BatchNorm을 합친 추론용 모델로 변환, 출력 검증에 실패하면 원본 유지"""
+        if not self.__optimize:
+            return model
+        inputs = torch.randn(INPUT_SHAPE, device=self.__device)
+        try:
+            model, report = optimize_for_inference(model, inputs)
+        except ValueError as e:
+            print(f"optimize skipped: {e}")
+            return model
+        print(f"optimized: {report.summary()}")
+        return model
+
+    def _attach_exits(self, model: torch.nn.Module) -> torch.nn.Module:
+        """early_exit이면 모델 안에 있는 출구 분류기를 붙인 모델, 출구 파일이 없거나 붙일 출구가 없으면 그대로"""
+        if self.__early_exit <= 0:
+            return model
+        exit_path = exit_weight_path(WORK_DIR / "model")
+        if self.__exits is None:
+            if not exit_path.exists():
+                print(f"exit heads not found: {exit_path.name}")
+                self.__early_exit = 0.0
+                return model
+            self.__exits = load_exits(exit_path, self.__device)
+        try:
+            model = attach_exits(
+                model,
+                self.__exits,
+                self.__early_exit,
+                torch.zeros(INPUT_SHAPE, device=self.__device),
+            )
+        except ValueError as e:
+            print(f"early exit skipped: {e}")
+            return model
+        if isinstance(model, EarlyExitSequential):
+            print(f"early exit: {', '.join(model.exits.keys())} >= {self.__early_exit}")
+        return model
+
+    def _int8_paths(self) -> Tuple[Path, Path, Path]:
+        """int8 모델 파일 경로 (전체, 분할 헤드, 분할 테일)"""
+        return quantized_weight_paths(WORK_DIR / "model", self.__split_point)
+
+    def _set_fingerprint(self, weight_path: Path, optimized: bool) -> None:
+        """헤드 모델 식별자를 특징 캐시에 지정 (모델이 바뀌면 이전 항목은 사용하지 않음)"""
+        if self.__cache is not None:
+            device = self.__device + ("+opt" if optimized else "")
+            if isinstance(self.__model_partial, EarlyExitSequential):
+                # 출구에서 끝난 이미지는 특징 대신 logit을 저장하므로 threshold별로 구분
+                device += f"+exit{self.__early_exit}"
+            self.__cache.fingerprint = model_fingerprint(weight_path, device)
+
     def start(self, image_path: str, using_origin: bool = False):
-        """스레드 시작"""
-        transform = transforms.Compose(
-            [
-                transforms.Resize((256, 256)),
-                transforms.ToTensor(),
-                transforms.Normalize(mean=[0.5], std=[0.5]),
-            ]
-        )
-        with Image.open(image_path) as image:
-            image = image.convert("L")
-            self.__image = transform(image).unsqueeze(0)
+        """스레드 시작, 특징 캐시에 있는 헤드 출력은 스레드 없이 바로 결과로 사용"""
+        # modelResult를 받은 직후에는 이전 연산 스레드가 아직 끝나는 중일 수 있음
+        self.wait()
+        self.__image_path = image_path
         self.__using_origin = using_origin
+        if not using_origin:
+            start_time = time.perf_counter()
+            cached = self._cached_features(image_path)
+            if cached is not None:
+                self.__image = None
+                self.__result = cached
+                self.__elapsed = time.perf_counter() - start_time
+                print(f"result: {self.__result.shape} (cached)")
+                self.modelResult.emit(self.__result)
+                return
+        self.__image = load_image(image_path)
         super().start()
 
     def run(self):
         """모델 연산"""
         if self.__image is None:
             return
+        # 백그라운드 미리 연산과 모델을 동시에 실행하지 않음
+        with self.__lock:
+            self._run()
+
+    def _run(self) -> None:
+        """모델 연산 (잠금 상태에서 호출)"""
+        start_time = time.perf_counter()
         if self.__using_origin:
             self._init_model_origin()
             with torch.no_grad():
@@ -132,6 +313,9 @@ class ModelThread(QThread):
                 result = self.__model_origin(self.__image)
                 self.__result = result.argmax(dim=1).cpu()
                 print(f"result: {self.__result} ({result})")
+            if isinstance(self.__model_origin, EarlyExitSequential):
+                print(self.__model_origin.stats.report())
+            self.__elapsed = time.perf_counter() - start_time
             self.modelResult.emit(self.__result)
         else:
             self._init_model_partial()
@@ -140,10 +324,12 @@ class ModelThread(QThread):
                 result = self.__model_partial(self.__image)
                 self.__result = result.cpu()
                 print(f"result: {self.__result.shape}")
-                # 모델 디버그
-                # result = self.__model_partial2(result)
-                # self.__result = result.argmax(dim=1).cpu()
-                # print(f"result: {self.__result} ({result})")
+            if isinstance(self.__model_partial, EarlyExitSequential):
+                print(self.__model_partial.stats.report())
+            self.__elapsed = time.perf_counter() - start_time
+            self._store_features(
+                self.__image_path, self.__result, self.__cache is not None
+            )
             self.modelResult.emit(self.__result)
 
     def get_result(self) -> torch.Tensor:
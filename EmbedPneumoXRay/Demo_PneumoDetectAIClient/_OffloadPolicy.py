@@ -0,0 +1,173 @@
+import time
+import threading
+from collections import Counter
+from typing import Optional
+
+from comm import FrameHeader
+
+LOCAL = "local"  # 장치에서 원본 모델 전체 실행
+OFFLOAD = "offload"  # 헤드만 실행하고 분할 지점 텐서를 서버로 전송
+
+OFFLOAD_MODES = ("always", "adaptive", "local")
+
+_ALPHA = 0.3  # 지수 이동 평균 가중치
+_HYSTERESIS = 0.1  # 현재 방식보다 이만큼 빨라야 전환
+_PROBE_INTERVAL = 10.0  # 로컬 실행 중 서버 상태를 다시 확인하는 간격 (초)
+_FAILURE_BACKOFF = 5.0  # 접속 오류 후 로컬 실행 유지 시간 (초)
+_MIN_DEADLINE = 0.5  # 오프로드 응답 대기 최소 시간 (초)
+_UNKNOWN_DEADLINE = 2.0  # 서버 왕복 시간을 모를 때의 응답 대기 시간 (초)
+
+
+def _ewma(current: Optional[float], sample: float) -> float:
+    """지수 이동 평균 갱신"""
+    if current is None:
+        return sample
+    return current + _ALPHA * (sample - current)
+
+
+def _ms(seconds: Optional[float]) -> str:
+    """초를 ms 문자열로 변환, 값이 없으면 -"""
+    return "-" if seconds is None else f"{seconds * 1000:.1f} ms"
+
+
+class OffloadPolicy:
+    __mode: str
+    __head: Optional[float]
+    __full: Optional[float]
+    __remote: Optional[float]
+    __service: Optional[float]
+    __queue_depth: int
+    __hold_until: float
+    __last_remote: float
+    __current: str
+    __counts: Counter
+    __lock: threading.Lock
+
+    def __init__(self, mode: str = "adaptive") -> None:
+        """요청마다 로컬 전체 실행과 분할 오프로드 중 예상 지연 시간이 짧은 쪽을 선택
+
+        장치의 헤드/전체 모델 실행 시간, 서버 왕복 시간, 서버가 알려준 대기열 길이를
+        이동 평균으로 추정하며, 서버 과부하나 접속 오류가 있으면 일정 시간 로컬로 실행합니다.
+        """
+        if mode not in OFFLOAD_MODES:
+            raise ValueError(f"unknown offload mode: {mode}")
+        self.__mode = mode
+        self.__head = None
+        self.__full = None
+        self.__remote = None
+        self.__service = None
+        self.__queue_depth = 0
+        self.__hold_until = 0.0
+        self.__last_remote = 0.0
+        self.__current = LOCAL if mode == "local" else OFFLOAD
+        self.__counts = Counter()
+        self.__lock = threading.Lock()
+
+    @property
+    def mode(self) -> str:
+        """실행 방식 선택 모드 (always, adaptive, local)"""
+        return self.__mode
+
+    def estimate(self, choice: str) -> Optional[float]:
+        """선택한 방식의 예상 지연 시간 (초), 추정값이 없으면 None"""
+        with self.__lock:
+            return self._estimate(choice)
+
+    def choose(self) -> str:
+        """이번 요청의 실행 방식"""
+        with self.__lock:
+            choice = self._choose()
+            self.__current = choice
+            self.__counts[choice] += 1
+            return choice
+
+    def deadline(self) -> float:
+        """오프로드 응답 대기 시간 (초), 넘으면 로컬로 다시 실행"""
+        with self.__lock:
+            if self.__remote is None:
+                return _UNKNOWN_DEADLINE
+            return max(_MIN_DEADLINE, 2 * self._remote())
+
+    def record_local(self, choice: str, seconds: float) -> None:
+        """장치 모델 실행 시간 기록 (LOCAL: 전체 모델, OFFLOAD: 헤드)"""
+        with self.__lock:
+            if choice == LOCAL:
+                self.__full = _ewma(self.__full, seconds)
+            else:
+                self.__head = _ewma(self.__head, seconds)
+
+    def record_response(self, seconds: float, header: Optional[FrameHeader]) -> None:
+        """서버 응답 기록: 전송부터 응답까지 시간, 서버 대기열 길이와 배치 실행 시간
+
+        왕복 시간에서 서버가 알려준 대기/실행 시간을 빼 전송 시간만 추정하고,
+        서버 시간은 현재 대기열 길이로 따로 예상합니다.
+        """
+        with self.__lock:
+            server = 0.0
+            if header is not None:
+                self.__queue_depth = header.queue_depth
+                self.__service = _ewma(self.__service, header.service_us / 1e6)
+                server = (header.queue_us + header.service_us) / 1e6
+            self.__remote = _ewma(self.__remote, max(0.0, seconds - server))
+            self.__last_remote = time.monotonic()
+
+    def record_busy(self, retry_after: float, queue_depth: int = 0) -> None:
+        """서버 과부하 거절 기록, retry_after 동안 로컬 실행"""
+        with self.__lock:
+            self.__queue_depth = max(self.__queue_depth, queue_depth)
+            self.__hold_until = time.monotonic() + retry_after
+            self.__last_remote = time.monotonic()
+
+    def record_failure(self) -> None:
+        """접속 오류 또는 응답 시간 초과 기록, 잠시 로컬 실행"""
+        with self.__lock:
+            self.__hold_until = time.monotonic() + _FAILURE_BACKOFF
+            self.__last_remote = time.monotonic()
+            self.__counts["fallback"] += 1
+
+    def report(self) -> str:
+        """선택 횟수와 현재 추정값"""
+        with self.__lock:
+            items = ", ".join(f"{k} {v}" for k, v in sorted(self.__counts.items()))
+            local = self._estimate(LOCAL)
+            offload = self._estimate(OFFLOAD)
+        return (
+            f"offload policy ({self.__mode}): {items or 'no request'}"
+            f" / local {_ms(local)}, offload {_ms(offload)}"
+        )
+
+    def _estimate(self, choice: str) -> Optional[float]:
+        """예상 지연 시간 (잠금 상태에서 호출)"""
+        if choice == LOCAL:
+            return self.__full
+        if self.__head is None or self.__remote is None:
+            return None
+        return self.__head + self._remote()
+
+    def _remote(self) -> float:
+        """서버 응답까지 예상 시간: 전송 시간 + 앞선 대기열과 이 요청의 실행 시간 (잠금 상태에서 호출)"""
+        if self.__service is None:
+            return self.__remote
+        return self.__remote + (self.__queue_depth + 1) * self.__service
+
+    def _choose(self) -> str:
+        """실행 방식 선택 (잠금 상태에서 호출)"""
+        if self.__mode == "always":
+            return OFFLOAD
+        if self.__mode == "local":
+            return LOCAL
+        now = time.monotonic()
+        if self.__full is None:
+            return OFFLOAD  # 로컬 실행 시간을 모르면 기존처럼 오프로드
+        if now < self.__hold_until:
+            return LOCAL
+        if now - self.__last_remote > _PROBE_INTERVAL:
+            # 서버 상태가 오래되었으면 한 번 오프로드해 추정값 갱신 (응답 대기 시간으로 보호)
+            return OFFLOAD
+        local = self.__full
+        offload = self._estimate(OFFLOAD)
+        if offload is None:
+            return OFFLOAD
+        if self.__current == LOCAL:
+            return OFFLOAD if offload < local * (1 - _HYSTERESIS) else LOCAL
+        return LOCAL if local < offload * (1 - _HYSTERESIS) else OFFLOAD
@@ -0,0 +1,97 @@
+import threading
+from collections import deque
+from typing import Deque, Iterable
+
+from PyQt5.QtCore import QThread
+from PyQt5.QtCore import pyqtSignal as Signal
+
+from _ModelThread import ModelThread
+
+
+class PrecomputeThread(QThread):
+    __model: ModelThread
+    __pending: Deque[str]
+    __max_pending: int
+    __cond: threading.Condition
+    __running: bool
+
+    featureReady = Signal(str)
+
+    def __init__(self, model: ModelThread, max_pending: int = 32) -> None:
+        """목록 이미지의 헤드 출력을 낮은 우선순위로 미리 연산하는 스레드
+
+        대기열은 최대 max_pending개이며, 선택한 이미지는 prioritize로 맨 앞에 둡니다.
+        연산은 한 번에 한 장씩 ModelThread와 모델을 번갈아 사용하므로 전송 요청을 오래 막지 않습니다.
+        """
+        super().__init__()
+        self.__model = model
+        self.__pending = deque()
+        self.__max_pending = max(1, max_pending)
+        self.__cond = threading.Condition()
+        self.__running = False
+
+    @property
+    def pending(self) -> int:
+        """대기 중인 이미지 수"""
+        return len(self.__pending)
+
+    def submit(self, paths: Iterable[str]) -> int:
+        """이미지를 대기열 뒤에 추가, 가득 차면 나머지는 버리고 추가한 수 반환"""
+        added = 0
+        with self.__cond:
+            for path in paths:
+                if len(self.__pending) >= self.__max_pending:
+                    break
+                if path in self.__pending or self.__model.has_features(path):
+                    continue
+                self.__pending.append(path)
+                added += 1
+            self.__cond.notify()
+        return added
+
+    def prioritize(self, path: str) -> None:
+        """이미지를 대기열 맨 앞으로 (가득 차면 맨 뒤 항목을 버림)"""
+        if self.__model.has_features(path):
+            return
+        with self.__cond:
+            if path in self.__pending:
+                self.__pending.remove(path)
+            elif len(self.__pending) >= self.__max_pending:
+                self.__pending.pop()
+            self.__pending.appendleft(path)
+            self.__cond.notify()
+
+    def cancel(self) -> None:
+        """대기 중인 이미지 취소 (연산 중인 이미지는 마침)"""
+        with self.__cond:
+            self.__pending.clear()
+
+    def start(self):
+        """스레드 시작"""
+        self.__running = True
+        super().start(QThread.LowestPriority)
+
+    def stop(self) -> None:
+        """대기열을 비우고 스레드 종료"""
+        with self.__cond:
+            self.__running = False
+            self.__pending.clear()
+            self.__cond.notify()
+        self.wait()
+
+    def run(self):
+        """대기열의 이미지를 차례로 연산"""
+        while True:
+            with self.__cond:
+                while self.__running and not self.__pending:
+                    self.__cond.wait()
+                if not self.__running:
+                    return
+                path = self.__pending.popleft()
+            try:
+                if self.__model.precompute(path):
+                    print(f"precomputed: {path}")
+            except Exception as e:
+                print(f"precompute error: {path} {e}")
+                continue
+            self.featureReady.emit(path)
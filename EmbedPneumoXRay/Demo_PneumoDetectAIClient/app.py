@@ -1,8 +1,10 @@
 import sys
+import time
 import socket
 import argparse
 import random
-import pickle
+import threading
+from concurrent.futures import Future
 from pathlib import Path
 
 from PyQt5.QtWidgets import QApplication, QSplashScreen
@@ -10,13 +12,13 @@ from PyQt5.QtWidgets import QHBoxLayout, QVBoxLayout
 from PyQt5.QtWidgets import QMainWindow, QWidget, QLabel, QPushButton
 from PyQt5.QtWidgets import QListWidget, QListWidgetItem
 from PyQt5.QtGui import QPixmap
-from PyQt5.QtCore import Qt, QThread
+from PyQt5.QtCore import Qt, QThread, QTimer
 from PyQt5.QtCore import pyqtSignal as Signal, pyqtSlot as Slot
 
 
 import torch
 
-from typing import List
+from typing import List, Tuple
 
 torch.backends.cudnn.benchmark = True
 torch.backends.cudnn.enabled = True
@@ -28,6 +30,12 @@ sys.path.append(str(APP_DIR))
 sys.path.append(str(WORK_DIR))
 
 from _ModelThread import ModelThread
+from _OffloadPolicy import OffloadPolicy, OFFLOAD_MODES, LOCAL, OFFLOAD
+from _FeatureCache import FeatureCache, DEFAULT_CACHE_DIR
+from _PrecomputeThread import PrecomputeThread
+from model import DEFAULT_CUT
+from comm import ServerPool, ServerBusyError, ENCODINGS, codec_stats
+from comm import TraceWriter, BALANCE_POLICIES, parse_servers
 
 
 def print_versions():
@@ -42,73 +50,191 @@ def print_versions():
 
 
 class ClientThread(QThread):
-    __ip: str
-    __port: int
-    __socket: socket.socket
+    __connection: ServerPool
+    __trace: TraceWriter = None
+    __policy: OffloadPolicy = None
+    __running: bool
+    __max_retry: int = 3
 
     errorLog = Signal(str)
-    recvData = Signal(bytes)
-
-    def __init__(self, ip: str, port: int = 8000):
-        """클라이언트 스레드"""
+    recvData = Signal(int, torch.Tensor)
+    sendFailed = Signal(int)
+
+    def __init__(
+        self,
+        servers: List[Tuple[str, int]],
+        encoding: str = "raw",
+        link_mbps: float = 100.0,
+        trace_path: str = "",
+        policy: str = "least-outstanding",
+        offload_policy: OffloadPolicy = None,
+    ):
+        """클라이언트 스레드 (encoding: 분할 지점 텐서 전송 인코딩, auto는 link_mbps 기준 자동 선택)
+
+        서버가 여러 대이면 policy에 따라 요청을 분산하고, 상태가 나쁜 서버는 일시적으로 제외합니다.
+        offload_policy에는 서버 왕복 시간과 과부하/오류를 기록하며, adaptive 모드에서는
+        거절된 요청을 재시도하지 않고 sendFailed 시그널로 알려 장치에서 실행하게 합니다.
+        """
         super().__init__()
-        self.__ip = ip
-        self.__port = port
+        self.__policy = offload_policy
+        if offload_policy is not None and offload_policy.mode == "adaptive":
+            self.__max_retry = 0
+        if trace_path:
+            self.__trace = TraceWriter(trace_path)
+        self.__connection = ServerPool(
+            servers,
+            policy,
+            encoding=ENCODINGS[encoding],
+            link_mbps=link_mbps,
+            trace=self.__trace,
+        )
+        self.__running = False
+
+    def start(self):
+        """서버 접속 유지 스레드 시작"""
+        self.__running = True
+        super().start(QThread.LowPriority)
 
     def run(self):
-        """서버 접속"""
-        while True:
-            try:
-                self.__socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                self.__socket.connect((self.__ip, self.__port))
-                print(f"connected to {self.__ip}:{self.__port}")
-                break
-            except Exception as e:
-                print(f"connect error: {e}")
-                self.sleep(1)
+        """서버 접속 유지, 연결이 끊기면 재접속하고 제외된 서버는 상태 확인 후 복귀"""
+        while self.__running:
+            self.__connection.connect()
+            self.sleep(1)
         return
 
-    def send(self, data: bytes) -> None:
-        """데이터 전송"""
-        # self.start()
-        # self.wait()
-        self.__socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.__socket.connect((self.__ip, self.__port))
-        self.__socket.sendall(data)
-        print(f"send data: ({len(data)} bytes) {data[:100]} Complete")
-
-    def recv(self) -> bytes:
-        """데이터 수신"""
-        received_data = b""
-        while True:
-            data = self.__socket.recv(4096)
-            if not data:
-                break
-            received_data += data
-            if len(data) < 4096:
-                break
-        return received_data
+    def send(self, tensor: torch.Tensor, deadline_ms: int = 0) -> int:
+        """텐서 전송, 요청 ID 반환 (응답은 recvData 시그널로 전달)
+
+        deadline_ms를 지정하면 서버는 기한 안에 처리할 수 없는 요청을 실행하지 않고 바로 실패시킵니다.
+        """
+        sent = time.perf_counter()
+        # 재시도도 처음 전송 기준의 같은 기한을 따르도록 절대 시각으로 보관 (0이면 기한 없음)
+        expires = sent + deadline_ms / 1000 if deadline_ms > 0 else 0.0
+        request_id, future = self.__connection.submit(tensor, deadline_ms=deadline_ms)
+        future.add_done_callback(
+            lambda f: self._on_response(request_id, tensor, 0, sent, expires, f)
+        )
+        print(f"send tensor: #{request_id} {tuple(tensor.shape)}")
+        return request_id
+
+    def _resend(
+        self, request_id: int, tensor: torch.Tensor, attempt: int, expires: float
+    ) -> None:
+        """거절된 요청 재전송, 기한은 처음 전송 이후 지난 시간만큼 줄임"""
+        sent = time.perf_counter()
+        deadline_ms = 0
+        if expires > 0:
+            deadline_ms = int((expires - sent) * 1000)
+            if deadline_ms <= 0:
+                self.errorLog.emit(f"#{request_id} 요청 실패: 재시도 전 기한 초과")
+                self.sendFailed.emit(request_id)
+                return
+        _, future = self.__connection.submit(tensor, deadline_ms=deadline_ms)
+        future.add_done_callback(
+            lambda f: self._on_response(request_id, tensor, attempt, sent, expires, f)
+        )
+
+    def _on_response(
+        self,
+        request_id: int,
+        tensor: torch.Tensor,
+        attempt: int,
+        sent: float,
+        expires: float,
+        future: Future,
+    ) -> None:
+        """응답 처리, 서버 혼잡으로 거절되면 서버가 알려준 시간 이후 재시도 (expires는 기한 시각, 0이면 없음)"""
+        error = future.exception()
+        if self.__policy is not None:
+            if error is None:
+                self.__policy.record_response(time.perf_counter() - sent, future.header)
+            elif isinstance(error, ServerBusyError):
+                header = future.header
+                self.__policy.record_busy(
+                    error.retry_after, header.queue_depth if header else 0
+                )
+            else:
+                self.__policy.record_failure()
+        delay = 0.0
+        if isinstance(error, ServerBusyError):
+            delay = max(error.retry_after, 0.1 * 2**attempt)
+        if (
+            isinstance(error, ServerBusyError)
+            and attempt < self.__max_retry
+            and (expires <= 0 or time.perf_counter() + delay < expires)
+        ):
+            self.errorLog.emit(
+                f"#{request_id} 서버 혼잡, {delay:.1f}초 후 재시도"
+                f" ({attempt + 1}/{self.__max_retry})"
+            )
+            timer = threading.Timer(
+                delay, self._resend, args=(request_id, tensor, attempt + 1, expires)
+            )
+            timer.daemon = True
+            timer.start()
+            return
+        if error is not None:
+            self.errorLog.emit(f"#{request_id} 요청 실패: {error}")
+            self.sendFailed.emit(request_id)
+            return
+        self.recvData.emit(request_id, future.result())
 
     def close(self):
-        """소켓 닫기"""
-        self.__socket.close()
+        """서버 접속 종료"""
+        self.__running = False
+        self.__connection.close()
+        self.wait()
+        print(codec_stats().report())
+        if self.__policy is not None:
+            print(self.__policy.report())
+        if self.__trace is not None:
+            self.__trace.close()
+            print(f"trace: {self.__trace.count} records")
 
 
 class AppMainWindow(QMainWindow):
     __data_count: int = 16
     __data: List[dict] = []
     __list_width: int = 700
-    __server_ip: str = ""
-    __server_port: int = 8000
+    __server_name: str = ""
     __client: ClientThread = None
+    __request_id: int = 0
     __model: ModelThread = None
-
-    def __init__(self) -> None:
-        """AI 연산 서버용 메인 윈도우"""
+    __policy: OffloadPolicy = None
+    __precompute: PrecomputeThread = None
+    __pending: Tuple[str, str] = None  # 장치에서 연산 중인 (이미지 경로, 실행 위치)
+
+    def __init__(
+        self,
+        split_point: str = DEFAULT_CUT,
+        offload: str = "always",
+        feature_cache: FeatureCache = None,
+        optimize: bool = False,
+        quantize: bool = False,
+        early_exit: float = 0.0,
+    ) -> None:
+        """AI 연산 서버용 메인 윈도우 (offload: 요청마다 장치/서버 실행 선택 방식, feature_cache: 헤드 출력 캐시)"""
         super().__init__()
-        self.__model = ModelThread()
+        self.__model = ModelThread(
+            split_point, feature_cache, optimize, quantize, early_exit
+        )
+        if offload != "always" and not self.__model.has_origin:
+            print("origin model not found, offload: always")
+            offload = "always"
+        self.__policy = OffloadPolicy(offload)
+        if offload == "adaptive":
+            # 첫 요청부터 비교할 수 있도록 장치 연산 시간을 미리 측정
+            self.__policy.record_local(OFFLOAD, self.__model.measure(False))
+            self.__policy.record_local(LOCAL, self.__model.measure(True))
+            print(self.__policy.report())
+        self.__model.modelResult.connect(self.on_model_result)
         self._init_data()  # 데이터 설정
         self._init_ui()  # UI 설정
+        if offload != "local":
+            # 전송 버튼을 누르기 전에 목록 이미지의 헤드 출력을 미리 연산
+            self.__precompute = PrecomputeThread(self.__model)
+            self.__precompute.submit(data["path"] for data in self.__data)
+            self.__precompute.start()
 
     def _init_data(self) -> None:
         """데이터 설정"""
@@ -208,6 +334,8 @@ class AppMainWindow(QMainWindow):
         """리스트 아이템 클릭 이벤트"""
         path = item.data(1)
         print(f"clicked: {path}")
+        if self.__precompute is not None:
+            self.__precompute.prioritize(path)
 
         screen_size = QApplication.primaryScreen().size()
         pixmap = QPixmap(path)
@@ -215,55 +343,179 @@ class AppMainWindow(QMainWindow):
         pixmap = pixmap.scaled(*size, aspectRatioMode=Qt.KeepAspectRatio)
         self.image_label.setPixmap(pixmap)
         self.image_path_label.setText(path)
-        self.server_result_label.setText(
-            f"[{self.__server_ip}:{self.__server_port}] 전송 대기 중"
-        )
+        self.__request_id = 0
+        self.server_result_label.setText(f"[{self.__server_name}] 전송 대기 중")
 
         self.send_data_button.show()
 
     def on_send_data_button_clicked(self):
-        """서버에 데이터 전송"""
-        self.server_result_label.setText("텐서 연산 중")
+        """서버에 데이터 전송, 오프로드 정책이 장치 실행을 선택하면 원본 모델로 연산"""
+        if self.__pending is not None:
+            return
         path = self.image_path_label.text()
-        self.server_result_label.update()
-        result = self.__model(path, False)
-        serialized_data = pickle.dumps(result.cpu())
-        print(f"send tensor: ({len(serialized_data)} bytes) {serialized_data[:100]}")
+        if self.__policy.choose() == LOCAL:
+            self._run_local(path)
+            return
+        self.__request_id = 0  # 이전 요청의 응답과 기한은 무시
+        self.server_result_label.setText("텐서 연산 중")
+        self._start_model(path, OFFLOAD)
+
+    def _start_model(self, path: str, mode: str) -> None:
+        """장치 연산 시작, 결과는 on_model_result로 받음
+
+        미리 연산 중이면 모델 잠금을 기다려야 하므로 GUI 스레드에서 기다리지 않고 ModelThread에서 연산합니다.
+        """
+        self.__pending = (path, mode)
+        self.send_data_button.setEnabled(False)
+        self.__model.start(path, mode == LOCAL)
+
+    def on_model_result(self, result: torch.Tensor) -> None:
+        """장치 연산 완료, 그 사이 다른 이미지를 선택했으면 결과를 버림"""
+        if self.__pending is None:
+            return
+        path, mode = self.__pending
+        self.__pending = None
+        self.send_data_button.setEnabled(True)
+        self.__policy.record_local(mode, self.__model.elapsed)
+        if path != self.image_path_label.text():
+            return
+        if mode == LOCAL:
+            result_txt = "정상" if result[0] == 0 else "폐렴"
+            self.server_result_label.setText(f"결과: {result_txt} (장치)")
+            return
+        if result.dim() == 2:
+            # 헤드 안의 출구 분류기에서 끝난 이미지는 전송하지 않음
+            self.__request_id = 0
+            result_txt = "정상" if result.argmax(dim=1)[0] == 0 else "폐렴"
+            self.server_result_label.setText(f"결과: {result_txt} (장치 출구)")
+            return
         self.server_result_label.setText("텐서 전송 중")
-        self.__client.send(serialized_data)
+        if self.__policy.mode != "adaptive":
+            self.__request_id = self.__client.send(result)
+            self.server_result_label.setText("텐서 전송 완료")
+            return
+        # 응답 대기 기한을 서버에도 알려 늦어질 요청은 서버가 실행하지 않게 함
+        deadline_ms = int(self.__policy.deadline() * 1000)
+        request_id = self.__client.send(result, deadline_ms)
+        self.__request_id = request_id
         self.server_result_label.setText("텐서 전송 완료")
-        self.on_recv_data(self.__client.recv())
-        self.__client.close()
-
-    def on_recv_data(self, data: bytes) -> None:
+        QTimer.singleShot(deadline_ms, lambda: self.on_deadline(request_id))
+
+    def _run_local(self, path: str) -> None:
+        """장치에서 원본 모델로 연산하고 결과 표시"""
+        if self.__pending is not None:
+            return
+        self.__request_id = 0  # 늦게 도착한 서버 응답은 무시
+        self.server_result_label.setText("장치에서 연산 중")
+        self._start_model(path, LOCAL)
+
+    def on_deadline(self, request_id: int) -> None:
+        """오프로드 응답이 기한 내에 오지 않으면 장치에서 다시 연산"""
+        if request_id == 0 or request_id != self.__request_id:
+            return
+        self.__policy.record_failure()
+        self.log(f"#{request_id} 서버 응답 지연, 장치에서 연산")
+        self._run_local(self.image_path_label.text())
+
+    def on_send_failed(self, request_id: int) -> None:
+        """오프로드 요청 실패 시 adaptive 모드면 장치에서 연산"""
+        if request_id != self.__request_id or self.__policy.mode != "adaptive":
+            return
+        self._run_local(self.image_path_label.text())
+
+    def on_recv_data(self, request_id: int, result: torch.Tensor) -> None:
         """서버에서 데이터 수신"""
-        print(f"recv tensor: ({len(data)} bytes) {data[:100]}")
-        result = pickle.loads(data)
-        print(f"result: {result.shape} ({result})")
+        print(f"result: #{request_id} {result.shape} ({result})")
+        if request_id != self.__request_id:
+            return
+        self.server_error_label.setText("")
         result_txt = "정상" if result[0] == 0 else "폐렴"
         self.server_result_label.setText(f"결과: {result_txt}")
 
-    def connect_server(self, ip: str, port: int = 8000) -> None:
-        """AI 연산 서버 접속"""
-        if ip == "":
-            ip = socket.gethostbyname(socket.gethostname())
+    def connect_server(
+        self,
+        servers: List[Tuple[str, int]],
+        encoding: str = "raw",
+        link_mbps: float = 100.0,
+        trace_path: str = "",
+        policy: str = "least-outstanding",
+    ) -> None:
+        """AI 연산 서버 접속 (servers: (ip, port) 목록, trace_path: 요청/응답 트레이스 기록 파일)"""
+        servers = [
+            (ip or socket.gethostbyname(socket.gethostname()), port)
+            for ip, port in servers
+        ]
         if self.__client:
             self.__client.close()
-        self.__client = ClientThread(ip, port)
+        self.__client = ClientThread(
+            servers, encoding, link_mbps, trace_path, policy, self.__policy
+        )
         self.__client.errorLog.connect(self.log)
         self.__client.recvData.connect(self.on_recv_data)
-        self.__server_ip = ip
-        self.__server_port = port
+        self.__client.sendFailed.connect(self.on_send_failed)
+        self.__client.start()
+        self.__server_name = ", ".join(f"{ip}:{port}" for ip, port in servers)
 
     def log(self, msg: str) -> None:
         """로그 출력"""
         self.server_error_label.setText(msg)
 
+    def closeEvent(self, event) -> None:
+        if self.__precompute is not None:
+            self.__precompute.stop()
+        self.__model.wait()
+        return super().closeEvent(event)
+
 
 def arg_parse():
     parser = argparse.ArgumentParser()
     parser.add_argument("--ip", type=str, default="192.168.3.5")
     parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--servers",
+        type=str,
+        default="",
+        help="ip:port,ip:port 형식의 AI 연산 서버 목록, 지정하면 --ip/--port 대신 사용",
+    )
+    parser.add_argument(
+        "--balance", type=str, default="least-outstanding", choices=BALANCE_POLICIES
+    )
+    parser.add_argument("--encoding", type=str, default="raw", choices=ENCODINGS)
+    parser.add_argument("--link-mbps", type=float, default=100.0)
+    parser.add_argument("--split", type=str, default=DEFAULT_CUT)
+    parser.add_argument(
+        "--offload",
+        type=str,
+        default="always",
+        choices=OFFLOAD_MODES,
+        help="always: 항상 서버로 전송, adaptive: 요청마다 예상 지연 시간으로 선택, local: 장치에서만 실행",
+    )
+    parser.add_argument(
+        "--trace", type=str, default="", help="요청/응답 트레이스 기록 파일"
+    )
+    parser.add_argument(
+        "--feature-cache-mb",
+        type=float,
+        default=0,
+        help="이미지별 헤드 출력 디스크 캐시 크기 (MiB), 0이면 사용하지 않음",
+    )
+    parser.add_argument("--feature-cache-dir", type=str, default=str(DEFAULT_CACHE_DIR))
+    parser.add_argument(
+        "--optimize",
+        action="store_true",
+        help="BatchNorm을 컨볼루션에 합친 추론용 모델 사용",
+    )
+    parser.add_argument(
+        "--quantize",
+        action="store_true",
+        help="model/의 int8 양자화 모델을 CPU에서 실행 (Devtool_Quantize로 생성)",
+    )
+    parser.add_argument(
+        "--early-exit",
+        type=float,
+        default=0.0,
+        help="장치 모델 안의 출구 분류기 확신도 threshold (0이면 사용 안 함, Devtool_EarlyExit로 생성)",
+    )
     return parser.parse_args()
 
 
@@ -273,11 +525,29 @@ def main():
     app = QApplication([])
     splash = QSplashScreen(QPixmap(str(APP_DIR / "splash.jpg")))
     splash.show()
-    main_window = AppMainWindow()
+    feature_cache = None
+    if args.feature_cache_mb > 0:
+        feature_cache = FeatureCache(
+            args.feature_cache_dir, int(args.feature_cache_mb * 1024 * 1024)
+        )
+    main_window = AppMainWindow(
+        args.split,
+        args.offload,
+        feature_cache,
+        args.optimize,
+        args.quantize,
+        args.early_exit,
+    )
     splash.finish(main_window)
-    main_window.connect_server(args.ip, args.port)
+    servers = parse_servers(args.servers, args.port) or [(args.ip, args.port)]
+    main_window.connect_server(
+        servers, args.encoding, args.link_mbps, args.trace, args.balance
+    )
     main_window.showFullScreen()
-    sys.exit(app.exec_())
+    code = app.exec_()
+    if feature_cache is not None:
+        print(feature_cache.report())
+    sys.exit(code)
 
 
 if __name__ == "__main__":
@@ -1,9 +1,9 @@
 import sys
 import socket
 import threading
-import pickle
+import functools
 from pathlib import Path
-from typing import Dict, Any
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from PySide6.QtWidgets import QApplication, QMainWindow
 from PySide6.QtWidgets import QWidget, QGroupBox, QLabel, QTextEdit, QPushButton
@@ -21,6 +21,13 @@ ROOT_DIR = Path(__file__).parent.parent
 
 from core import SshClientThread
 from core import IpCheckerThread
+from serve import BatchScheduler, InferenceServer, ServerLimits, WorkerPool
+from serve import ResultCache, weight_version, weight_signature
+from comm import codec_stats, TraceWriter
+from model import DEFAULT_CUT, SplitManifest, split_weight_paths
+from model import optimize_for_inference, load_quantized, quantized_weight_paths
+from model import pruned_weight_paths
+from model import EarlyExitSequential, load_exits, attach_exits, exit_weight_path
 
 _FONT_SIZE = 18
 
@@ -75,78 +82,366 @@ class Config:
         """AI 연산 서버 포트"""
         return self.__config.get("server_port", 8000)
 
+    @property
+    def servers(self) -> List[str]:
+        """클라이언트가 요청을 분산할 AI 연산 서버 목록 (ip:port), 비어 있으면 이 서버만"""
+        return self.__config.get("servers", []) or []
+
+    @property
+    def balance(self) -> str:
+        """클라이언트 부하 분산 정책 (least-outstanding, latency)"""
+        return self.__config.get("balance", "least-outstanding")
+
+    @property
+    def offload(self) -> str:
+        """클라이언트 실행 방식 선택 (always, adaptive, local)"""
+        return self.__config.get("offload", "always")
+
+    @property
+    def feature_cache_mb(self) -> float:
+        """클라이언트 헤드 출력 디스크 캐시 크기 (MiB), 0이면 사용하지 않음"""
+        return self.__config.get("feature_cache_mb", 0)
+
+    @property
+    def split_point(self) -> str:
+        """분할 지점 (장치에서 실행할 마지막 features 모듈 이름)"""
+        return self.__config.get("split_point", DEFAULT_CUT)
+
+    @property
+    def optimize(self) -> bool:
+        """BatchNorm을 컨볼루션에 합친 추론용 모델 사용 여부 (서버 테일, 클라이언트 헤드)"""
+        return self.__config.get("optimize", False)
+
+    @property
+    def quantize(self) -> bool:
+        """int8 양자화 모델 사용 여부 (CPU 서버 테일, 클라이언트 헤드)"""
+        return self.__config.get("quantize", False)
+
+    @property
+    def pruned(self) -> bool:
+        """채널 가지치기 테일 모델 사용 여부 (서버 테일)"""
+        return self.__config.get("pruned", False)
+
+    @property
+    def early_exit(self) -> float:
+        """출구 분류기 확신도 threshold (0이면 사용 안 함, 서버 테일과 클라이언트 헤드)"""
+        return self.__config.get("early_exit", 0.0)
+
+    @property
+    def max_batch_size(self) -> int:
+        """배치 추론 최대 크기"""
+        return self.__config.get("max_batch_size", 8)
+
+    @property
+    def max_batch_wait(self) -> float:
+        """배치 구성 최대 대기 시간 (ms)"""
+        return self.__config.get("max_batch_wait", 5.0)
+
+    @property
+    def workers(self) -> int:
+        """추론 워커 프로세스 수, 0이면 서버 프로세스에서 직접 실행"""
+        return self.__config.get("workers", 0)
+
+    @property
+    def trace_path(self) -> str:
+        """요청/응답 트레이스 기록 파일, 비어 있으면 기록하지 않음"""
+        return self.__config.get("trace_path", "") or ""
+
+    @property
+    def trace_payload(self) -> bool:
+        """트레이스에 텐서 페이로드까지 저장할지 여부 (False이면 digest와 shape만)"""
+        return self.__config.get("trace_payload", True)
+
+    @property
+    def cache_entries(self) -> int:
+        """추론 결과 캐시 최대 항목 수, 0이면 캐시하지 않음"""
+        return self.__config.get("cache_entries", 0)
+
+    @property
+    def cache_mb(self) -> float:
+        """추론 결과 캐시 최대 크기 (MiB)"""
+        return self.__config.get("cache_mb", 64)
+
+    @property
+    def reload_interval(self) -> float:
+        """테일 가중치 파일 변경 확인 간격 (초), 0이면 확인하지 않음"""
+        return self.__config.get("reload_interval", 5.0)
+
+    @property
+    def server_limits(self) -> ServerLimits:
+        """서버 수용 한도 (접속 수, 동시 요청 수, 대기열 길이, 시간 제한)"""
+        limits = self.__config.get("limits", {}) or {}
+        return ServerLimits()._replace(
+            **{k: v for k, v in limits.items() if k in ServerLimits._fields}
+        )
+
 
 class ServerThread(QThread):
-    __server_socket: socket.socket = None
-    __model: torch.nn.Module = None
+    __server: InferenceServer = None
+    __model: Callable[[torch.Tensor], torch.Tensor] = None
+    __scheduler: BatchScheduler = None
+    __pool: WorkerPool = None
+    __trace: TraceWriter = None
+    __cache: ResultCache = None
+    __watcher: threading.Thread = None
+    __stopping: threading.Event = None
 
     serverLog = Signal(str)
 
     def __init__(self) -> None:
-        """AI 연산 서버"""
+        """AI 연산 서버 (이벤트 루프 스레드, 로그는 시그널로 GUI에 전달)"""
         super().__init__()
 
     def run(self):
         """AI 연산 서버 시작"""
         Config.init()
-        weight_path = (
-            Path(__file__).parent.parent / "model/ckpt_densenet201_partial_2.pt"
+        _, weight_path, manifest_path = split_weight_paths(
+            ROOT_DIR / "model", Config().split_point
+        )
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        if Config().pruned:
+            weight_path = self._pruned_tail(weight_path)
+        quantized = False
+        if Config().quantize:
+            _, _, int8_path = quantized_weight_paths(
+                ROOT_DIR / "model", Config().split_point
+            )
+            if device.type != "cpu":
+                self.serverLog.emit("int8 모델 생략: GPU 서버는 fp32 모델 사용")
+            elif not int8_path.exists():
+                self.serverLog.emit(f"int8 모델 없음, fp32 사용: {int8_path.name}")
+            else:
+                weight_path = int8_path
+                quantized = True
+        # int8 모델은 이미 BN을 합쳐 양자화했으므로 추론 최적화는 fp32 모델에만 적용
+        optimize = Config().optimize and not quantized
+        concurrency = 1
+        sample_shape = None
+        if manifest_path.exists():
+            sample_shape = SplitManifest.load(manifest_path).shape[1:]
+        exit_path = ""
+        if Config().early_exit > 0 and not quantized:
+            exit_path = str(exit_weight_path(ROOT_DIR / "model"))
+            if not Path(exit_path).exists():
+                self.serverLog.emit(f"출구 분류기 없음: {Path(exit_path).name}")
+                exit_path = ""
+        load = functools.partial(
+            self._load_model,
+            weight_path,
+            device,
+            sample_shape,
+            optimize,
+            quantized,
+            exit_path,
+        )
+        self.__model, self.__pool = load()
+        if self.__pool is not None:
+            concurrency = self.__pool.workers
+        self.__scheduler = BatchScheduler(
+            self.__model,
+            device,
+            max_batch_size=Config().max_batch_size,
+            max_wait=Config().max_batch_wait / 1000,
+            log=self.serverLog.emit,
+            concurrency=concurrency,
+        )
+        self.__scheduler.start()
+        if Config().trace_path:
+            self.__trace = TraceWriter(Config().trace_path, Config().trace_payload)
+        version = functools.partial(
+            self._model_version, weight_path, optimize, exit_path
+        )
+        if Config().cache_entries > 0:
+            # 가중치 파일이 바뀌어 모델을 다시 로드하면 버전이 달라져 이전 결과는 사용하지 않음
+            self.__cache = ResultCache(
+                Config().cache_entries,
+                int(Config().cache_mb * 1024 * 1024),
+                version(),
+            )
+            self.serverLog.emit(f"추론 결과 캐시: model version {self.__cache.version}")
+        if Config().reload_interval > 0:
+            paths = [weight_path] + ([Path(exit_path)] if exit_path else [])
+            self.__stopping = threading.Event()
+            self.__watcher = threading.Thread(
+                target=self._watch_weights, args=(paths, load, version), daemon=True
+            )
+            self.__watcher.start()
+        self.__server = InferenceServer(
+            self.__scheduler,
+            Config().server_ip,
+            Config().server_port,
+            limits=Config().server_limits,
+            postprocess=lambda output: output.argmax(dim=1),
+            log=self.serverLog.emit,
+            trace=self.__trace,
+            cache=self.__cache,
         )
-        self.__model = torch.load(weight_path)
-        self.__server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.__server_socket.bind((Config().server_ip, Config().server_port))
-        self.__server_socket.listen(5)
-        self.serverLog.emit(f"서버 시작: {Config().server_ip}:{Config().server_port}")
         try:
-            while True:
-                client, addr = self.__server_socket.accept()
-                thread = threading.Thread(
-                    target=self.accept_client, args=(client, addr)
-                )
-                thread.daemon = True
-                thread.start()
+            self.__server.run()
         except KeyboardInterrupt:
             self.serverLog.emit("서버 종료 명령 수신")
         finally:
-            self.stop_server()
+            if self.__watcher is not None:
+                self.__stopping.set()
+                self.__watcher.join()
+            self.__scheduler.stop()
+            if self.__pool is not None:
+                self.__pool.stop()
+                if exit_path:
+                    self.serverLog.emit(self.__pool.exit_stats.report())
+            self.serverLog.emit(codec_stats().report())
+            if isinstance(self.__model, EarlyExitSequential):
+                self.serverLog.emit(self.__model.stats.report())
+            if self.__cache is not None:
+                self.serverLog.emit(self.__cache.report())
+            if self.__trace is not None:
+                self.__trace.close()
+                self.serverLog.emit(
+                    f"trace: {self.__trace.count} records -> {Config().trace_path}"
+                )
 
-    def stop_server(self) -> None:
-        """AI 연산 서버 종료"""
-        self.__server_socket.close()
-        self.serverLog.emit(f"서버 종료: {Config().server_ip}:{Config().server_port}")
-
-    def accept_client(self, client: socket.socket, address: str) -> None:
-        """클라이언트 접속 처리"""
-        self.serverLog.emit(f"클라이언트 접속: {address}")
-        # client.settimeout(3.0)
-        data_len = len(pickle.dumps(torch.rand(1, 64, 64, 64)))
+    def _load_model(
+        self,
+        weight_path: Path,
+        device: torch.device,
+        sample_shape: Optional[Tuple[int, ...]],
+        optimize: bool,
+        quantized: bool,
+        exit_path: str,
+    ) -> Tuple[Callable[[torch.Tensor], torch.Tensor], Optional[WorkerPool]]:
+        """테일 모델 로드 (CPU 워커 풀 또는 이 프로세스), 모델과 워커 풀(없으면 None) 반환"""
+        if Config().workers > 0 and device.type == "cpu":
+            pool = WorkerPool(
+                weight_path,
+                Config().workers,
+                Config().max_batch_size,
+                sample_shape,
+                log=self.serverLog.emit,
+                optimize=optimize,
+                quantized=quantized,
+                exit_path=exit_path,
+                exit_threshold=Config().early_exit,
+            )
+            pool.start()
+            return pool, pool
+        if quantized:
+            model, _ = load_quantized(weight_path)
+            self.serverLog.emit(
+                f"int8 모델 로드: {weight_path.name}"
+                f" (backend {torch.backends.quantized.engine})"
+            )
+            return model, None
+        model = torch.load(weight_path, weights_only=False)
+        model.to(device)
+        model.eval()
+        if optimize:
+            model = self._optimize(model, sample_shape, device)
+        if exit_path:
+            model = self._attach_exits(model, exit_path, sample_shape, device)
+        return model, None
+
+    def _model_version(self, weight_path: Path, optimize: bool, exit_path: str) -> str:
+        """결과 캐시 모델 버전 (테일과 출구 분류기 파일 digest, 추론 설정)"""
+        version = weight_version(weight_path) + ("+opt" if optimize else "")
+        if exit_path:
+            version += f"+exit{Config().early_exit}:{weight_version(exit_path)}"
+        return version
+
+    def _watch_weights(
+        self,
+        paths: List[Path],
+        load: Callable[[], Tuple[Callable, Optional[WorkerPool]]],
+        version: Callable[[], str],
+    ) -> None:
+        """가중치 파일이 바뀌면 테일 모델을 다시 로드해 교체하고 결과 캐시 무효화"""
+        signature = weight_signature(*paths)
+        while not self.__stopping.wait(Config().reload_interval):
+            current = weight_signature(*paths)
+            if current == signature:
+                continue
+            # 쓰는 중인 파일이면 로드에 실패하고, 쓰기가 끝나 크기/시각이 바뀌면 다시 시도
+            signature = current
+            try:
+                model, pool = load()
+            except Exception as e:
+                self.serverLog.emit(f"테일 모델 다시 로드 실패, 이전 모델 유지: {e}")
+                continue
+            previous, previous_pool = self.__model, self.__pool
+            self.__model, self.__pool = model, pool
+            self.__scheduler.set_model(model)
+            message = f"테일 모델 다시 로드: {paths[0].name}"
+            if self.__cache is not None and self.__cache.set_version(version()):
+                message += f", 결과 캐시 초기화 (model version {self.__cache.version})"
+            self.serverLog.emit(message)
+            if previous_pool is not None:
+                previous_pool.stop(drain=10.0)
+                if previous_pool.exit_stats.total:
+                    self.serverLog.emit(previous_pool.exit_stats.report())
+            elif isinstance(previous, EarlyExitSequential):
+                self.serverLog.emit(previous.stats.report())
+
+    def _pruned_tail(self, weight_path: Path) -> Path:
+        """가지치기 테일 경로 (장치의 fp32 헤드와 호환), 없으면 기존 fp32 테일 경로"""
+        _, _, pruned_path = pruned_weight_paths(
+            ROOT_DIR / "model", Config().split_point
+        )
+        if not pruned_path.exists():
+            self.serverLog.emit(f"가지치기 모델 없음, fp32 사용: {pruned_path.name}")
+            return weight_path
+        self.serverLog.emit(f"가지치기 테일 사용: {pruned_path.name}")
+        return pruned_path
+
+    def _attach_exits(
+        self,
+        model: torch.nn.Module,
+        exit_path: str,
+        sample_shape: Optional[Tuple[int, ...]],
+        device: torch.device,
+    ) -> torch.nn.Module:
+        """테일 안에 있는 출구 분류기를 붙인 모델, 붙일 출구가 없거나 채널 수가 맞지 않으면 원본 유지"""
+        sample = None
+        if sample_shape is not None:
+            sample = torch.zeros((1,) + tuple(sample_shape), device=device)
+        try:
+            model = attach_exits(
+                model, load_exits(exit_path, device), Config().early_exit, sample
+            )
+        except ValueError as e:
+            self.serverLog.emit(f"출구 분류기 생략: {e}")
+            return model
+        if isinstance(model, EarlyExitSequential):
+            self.serverLog.emit(
+                f"출구 분류기: {', '.join(model.exits.keys())}"
+                f" (threshold {Config().early_exit})"
+            )
+        else:
+            self.serverLog.emit("출구 분류기 생략: 테일에 출구 위치 없음")
+        return model
+
+    def _optimize(
+        self,
+        model: torch.nn.Module,
+        sample_shape: Optional[Tuple[int, ...]],
+        device: torch.device,
+    ) -> torch.nn.Module:
+        """BatchNorm을 합친 추론용 테일 모델로 변환, 입력 shape을 모르거나 출력 검증에 실패하면 원본 유지"""
+        if sample_shape is None:
+            self.serverLog.emit("추론 최적화 생략: 분할 manifest 없음")
+            return model
+        inputs = torch.randn((1,) + tuple(sample_shape), device=device)
         try:
-            received_data = b""
-            while True:
-                data = client.recv(4096)
-                if not data:
-                    break
-                received_data += data
-                if len(received_data) >= data_len:
-                    break
-        except socket.timeout:
-            self.serverLog.emit(f"클라이언트 접속 대기 시간 초과: {address}")
-            client.close()
-            return
-        except Exception as e:
-            self.serverLog.emit(f"클라이언트 접속 오류: {address} {e}")
-            client.close()
-            return
+            model, report = optimize_for_inference(model, inputs)
+        except ValueError as e:
+            self.serverLog.emit(f"추론 최적화 생략: {e}")
+            return model
+        self.serverLog.emit(f"추론 최적화: {report.summary()}")
+        return model
 
-        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        tensor: torch.Tensor = pickle.loads(received_data)
-        self.serverLog.emit(f"데이터 수신: {len(received_data):,} byte ({tensor.shape})")
-        tensor = tensor.to(device)
-        result = self.__model(tensor).argmax(dim=1).cpu()
-        result = pickle.dumps(result)
-        client.sendall(result)
-        self.serverLog.emit(f"데이터 송신: {len(result)} byte")
-        client.close()
+    def stop_server(self) -> None:
+        """AI 연산 서버 종료"""
+        if self.__server is not None:
+            self.__server.stop()
+        self.wait()
 
 
 class AppMainWindow(QMainWindow):
@@ -237,10 +532,23 @@ class AppMainWindow(QMainWindow):
             ssh.command(f"cd {repo_path}")
         ssh.command(f"export DISPLAY={Config().display}")
         print(f"{ip} run ETRI-IITP-Medical-Demo")
+        servers = ""
+        if Config().servers:
+            servers = (
+                f" --servers {','.join(Config().servers)}"
+                f" --balance {Config().balance}"
+            )
         ssh.command(
             "python3 Demo_PneumoDetectAIClient/app.py"
             f" --ip {Config().server_ip}"
             f" --port {Config().server_port}"
+            f" --split {Config().split_point}"
+            f" --offload {Config().offload}"
+            f" --feature-cache-mb {Config().feature_cache_mb}"
+            + (" --optimize" if Config().optimize else "")
+            + (" --quantize" if Config().quantize else "")
+            + (f" --early-exit {Config().early_exit}" if Config().early_exit else "")
+            + servers
         )
 
     def on_ip_disconnected(self, ip: str) -> None:
@@ -255,7 +563,7 @@ class AppMainWindow(QMainWindow):
             self.__ip_checker_thread[ip].close()
         for ip in self.__ip_ssh_client_thread:
             self.__ip_ssh_client_thread[ip].close()
-        self._stop_server()
+        self.__server.stop_server()
         return super().closeEvent(event)
 
 
@@ -0,0 +1,122 @@
+import sys
+import json
+import argparse
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import torch
+
+sys.path.append(Path(__file__).parent.parent.as_posix())
+
+ROOT_DIR = Path(__file__).parent.parent
+
+from comm import ENCODINGS
+from comm.protocol import FrameHeader, encode_tensor, decode_tensor, unpack_header
+from model import XRayFolder
+
+
+def arg_parse():
+    parser = argparse.ArgumentParser(
+        description="분할 지점 텐서 전송 인코딩별 정확도 검사 (fp32 경로 대비)"
+    )
+    parser.add_argument("--data", type=str, default=str(ROOT_DIR / "data"))
+    parser.add_argument(
+        "--head",
+        type=str,
+        default=str(ROOT_DIR / "model/ckpt_densenet201_partial_1.pt"),
+    )
+    parser.add_argument(
+        "--tail",
+        type=str,
+        default=str(ROOT_DIR / "model/ckpt_densenet201_partial_2.pt"),
+    )
+    parser.add_argument(
+        "--encodings", type=str, default="fp16,bf16,int8,sparse,sparse+zlib"
+    )
+    parser.add_argument("--limit", type=int, default=200)
+    parser.add_argument("--output", type=str, default="")
+    return parser.parse_args()
+
+
+def wire_roundtrip(
+    tensor: torch.Tensor, encoding: int
+) -> Tuple[torch.Tensor, FrameHeader]:
+    """전송 프레임으로 인코딩 후 수신 측과 같은 방식으로 복원, 복원한 텐서와 프레임 헤더 반환"""
+    header, meta, payload = encode_tensor(tensor, 0, encoding=encoding)
+    frame = unpack_header(header)
+    return decode_tensor(frame, bytearray(payload), meta), frame
+
+
+def main():
+    """메인 함수"""
+    args = arg_parse()
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    head = torch.load(args.head, map_location=device, weights_only=False).eval()
+    tail = torch.load(args.tail, map_location=device, weights_only=False).eval()
+    dataset = XRayFolder(args.data, args.limit)
+    encodings = {name: ENCODINGS[name] for name in args.encodings.split(",")}
+    print(f"data: {args.data} ({len(dataset)} images, {dataset.class_names})")
+    if not len(dataset):
+        raise SystemExit(f"no images found: {args.data}")
+
+    stats: Dict[str, Dict[str, List[float]]] = {
+        name: {"bytes": [], "agree": [], "correct": [], "max_diff": [], "mean_diff": []}
+        for name in ["fp32"] + list(encodings)
+    }
+    with torch.inference_mode():
+        for i in range(len(dataset)):
+            image, label, path = dataset[i]
+            feature = head(image.unsqueeze(0).to(device)).cpu()
+            # 테일의 inplace ReLU가 feature를 바꾸므로 복사본으로 테일 실행
+            reference = tail(feature.to(device, copy=True)).cpu()
+            decoded, frame = wire_roundtrip(feature, ENCODINGS["raw"])
+            stats["fp32"]["bytes"].append(frame.payload_len + frame.meta_len)
+            stats["fp32"]["agree"].append(1.0)
+            stats["fp32"]["correct"].append(float(reference.argmax(1).item() == label))
+            stats["fp32"]["max_diff"].append(0.0)
+            stats["fp32"]["mean_diff"].append(0.0)
+            for name, encoding in encodings.items():
+                decoded, frame = wire_roundtrip(feature, encoding)
+                logits = tail(decoded.to(device)).cpu()
+                diff = (logits - reference).abs()
+                stats[name]["bytes"].append(frame.payload_len + frame.meta_len)
+                stats[name]["agree"].append(
+                    float(logits.argmax(1).item() == reference.argmax(1).item())
+                )
+                stats[name]["correct"].append(float(logits.argmax(1).item() == label))
+                stats[name]["max_diff"].append(diff.max().item())
+                stats[name]["mean_diff"].append(diff.mean().item())
+            print(f"\r{i + 1}/{len(dataset)} {Path(path).name}", end="", flush=True)
+    print()
+
+    fp32_bytes = sum(stats["fp32"]["bytes"]) / len(dataset)
+    summary = {}
+    print(
+        f"{'encoding':>11} {'bytes/img':>12} {'ratio':>6} {'argmax':>8}"
+        f" {'accuracy':>9} {'max|dlogit|':>12} {'mean|dlogit|':>13}"
+    )
+    for name, values in stats.items():
+        count = len(values["bytes"])
+        mean_bytes = sum(values["bytes"]) / count
+        summary[name] = {
+            "bytes_per_image": mean_bytes,
+            "compression_ratio": fp32_bytes / mean_bytes,
+            "argmax_agreement": sum(values["agree"]) / count,
+            "accuracy": sum(values["correct"]) / count,
+            "max_logit_diff": max(values["max_diff"]),
+            "mean_logit_diff": sum(values["mean_diff"]) / count,
+        }
+        row = summary[name]
+        print(
+            f"{name:>11} {mean_bytes:12,.0f} {row['compression_ratio']:6.2f}"
+            f" {row['argmax_agreement']:8.2%} {row['accuracy']:9.2%}"
+            f" {row['max_logit_diff']:12.5f} {row['mean_logit_diff']:13.5f}"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"images": len(dataset), "encodings": summary}, f, indent=2)
+        print(f"saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import torch
+from torch import nn
+
+sys.path.append(Path(__file__).parent.parent.as_posix())
+
+ROOT_DIR = Path(__file__).parent.parent
+
+from model import densenet201, load_densenet201
+from model.partition import INPUT_SHAPE
+
+MODES = {"cat": False, "buffer": True}
+
+
+def arg_parse():
+    parser = argparse.ArgumentParser(
+        description="dense block별 torch.cat 경로와 출력 버퍼 경로의 추론 시간/메모리 비교"
+    )
+    parser.add_argument(
+        "--weight", type=str, default=str(ROOT_DIR / "model/ckpt_densenet201.pt")
+    )
+    parser.add_argument(
+        "--batch-sizes",
+        type=str,
+        default="1,2,4,8",
+        help="측정할 배치 크기 목록 (서버 배치 추론 크기 포함)",
+    )
+    parser.add_argument("--device", type=str, default="", help="cuda, cpu (기본: 자동)")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", type=str, default="")
+    return parser.parse_args()
+
+
+def measure_ms(
+    fn: Callable[[], torch.Tensor], device: torch.device, warmup: int, repeat: int
+) -> float:
+    """함수 실행 시간 중앙값 (ms)"""
+    samples = []
+    for i in range(warmup + repeat):
+        if device.type == "cuda":
+            torch.cuda.synchronize(device)
+        start_time = time.perf_counter()
+        fn()
+        if device.type == "cuda":
+            torch.cuda.synchronize(device)
+        if i >= warmup:
+            samples.append((time.perf_counter() - start_time) * 1000)
+    return statistics.median(samples)
+
+
+def measure_memory(
+    fn: Callable[[], torch.Tensor], device: torch.device
+) -> Tuple[float, float]:
+    """함수 실행 중 최대 추가 메모리와 총 할당량 (MiB)
+
+    CUDA는 할당기 통계를, CPU는 profiler의 연산별 할당/해제 기록을 시간순으로 누적해 계산합니다.
+    """
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+        base = torch.cuda.memory_allocated(device)
+        torch.cuda.reset_peak_memory_stats(device)
+        torch.cuda.reset_accumulated_memory_stats(device)
+        fn()
+        torch.cuda.synchronize(device)
+        peak = torch.cuda.max_memory_allocated(device) - base
+        allocated = torch.cuda.memory_stats(device)["allocated_bytes.all.allocated"]
+        return peak / 2**20, allocated / 2**20
+    from torch.profiler import profile, ProfilerActivity
+
+    with profile(activities=[ProfilerActivity.CPU], profile_memory=True) as prof:
+        fn()
+    events = sorted(
+        (e for e in prof.events() if e.self_cpu_memory_usage),
+        key=lambda e: e.time_range.start,
+    )
+    current = peak = allocated = 0
+    for event in events:
+        current += event.self_cpu_memory_usage
+        peak = max(peak, current)
+        allocated += max(event.self_cpu_memory_usage, 0)
+    return peak / 2**20, allocated / 2**20
+
+
+def block_inputs(
+    model: nn.Module, inputs: torch.Tensor
+) -> Dict[str, Tuple[nn.Module, torch.Tensor]]:
+    """전체 모델을 한 번 실행해 각 dense block의 입력 텐서 수집"""
+    captured = {}
+
+    def hook(name: str):
+        def capture(module: nn.Module, args: Tuple[torch.Tensor]) -> None:
+            captured[name] = (module, args[0].clone())
+
+        return capture
+
+    handles = [
+        module.register_forward_pre_hook(hook(name))
+        for name, module in model.features.named_children()
+        if name.startswith("denseblock")
+    ]
+    with torch.inference_mode():
+        model(inputs)
+    for handle in handles:
+        handle.remove()
+    return captured
+
+
+def benchmark(args) -> None:
+    """dense block별 두 경로의 시간, 메모리, 출력 일치 여부 측정"""
+    if args.device:
+        device = torch.device(args.device)
+    else:
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    if Path(args.weight).exists():
+        model = load_densenet201(args.weight, device)
+    else:
+        # 연산 시간과 메모리는 가중치 값과 무관하므로 임의 가중치로 측정하고,
+        # 출력 비교가 의미 있도록 BN 통계는 기본값(평균 0, 분산 1)이 아닌 값으로 지정
+        print(f"weight not found, using random weights: {args.weight}")
+        model = densenet201(num_classes=2).to(device).eval()
+        for module in model.modules():
+            if isinstance(module, nn.BatchNorm2d):
+                module.running_mean.uniform_(-0.5, 0.5)
+                module.running_var.uniform_(0.5, 2.0)
+
+    rows: List[Dict] = []
+    print(
+        f"{'block':>11} {'layers':>6} {'input':>18} {'cat ms':>9} {'buffer ms':>9}"
+        f" {'speedup':>7} {'cat MiB':>14} {'buffer MiB':>14} {'equal':>5}"
+    )
+    for batch_size in [int(size) for size in args.batch_sizes.split(",")]:
+        inputs = torch.randn((batch_size,) + INPUT_SHAPE[1:], device=device)
+        rows += benchmark_blocks(model, inputs, device, args)
+    print("MiB: peak/allocated")
+    if not all(row["equal"] for row in rows):
+        print("WARNING: buffer output differs from torch.cat output")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "host": socket.gethostname(),
+                    "device": str(device),
+                    "batch_sizes": args.batch_sizes,
+                    "torch": torch.__version__,
+                    "blocks": rows,
+                },
+                f,
+                indent=2,
+            )
+        print(f"saved: {args.output}")
+
+
+def benchmark_blocks(
+    model: nn.Module, inputs: torch.Tensor, device: torch.device, args
+) -> List[Dict]:
+    """입력 배치 하나로 dense block별 두 경로 측정"""
+    rows: List[Dict] = []
+    for name, (block, x) in block_inputs(model, inputs).items():
+        row = {"block": name, "layers": len(block), "input": list(x.shape)}
+        outputs = {}
+        with torch.inference_mode():
+            for mode, enabled in MODES.items():
+                block.concat_buffer = enabled
+                outputs[mode] = block(x)
+                row[f"{mode}_ms"] = measure_ms(
+                    lambda: block(x), device, args.warmup, args.repeat
+                )
+                peak, allocated = measure_memory(lambda: block(x), device)
+                row[f"{mode}_peak_mib"] = peak
+                row[f"{mode}_alloc_mib"] = allocated
+        block.concat_buffer = True
+        row["equal"] = torch.equal(outputs["cat"], outputs["buffer"])
+        rows.append(row)
+        print(
+            f"{name:>11} {row['layers']:6d} {str(tuple(x.shape)):>18}"
+            f" {row['cat_ms']:9.2f} {row['buffer_ms']:9.2f}"
+            f" {row['cat_ms'] / row['buffer_ms']:6.2f}x"
+            f" {row['cat_peak_mib']:6.1f}/{row['cat_alloc_mib']:7.1f}"
+            f" {row['buffer_peak_mib']:6.1f}/{row['buffer_alloc_mib']:7.1f}"
+            f" {str(row['equal']):>5}"
+        )
+    return rows
+
+
+def main():
+    """메인 함수"""
+    args = arg_parse()
+    benchmark(args)
+
+
+if __name__ == "__main__":
+    main()
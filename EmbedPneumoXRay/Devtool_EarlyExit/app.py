@@ -0,0 +1,194 @@
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+from pathlib import Path
+from typing import Dict, List
+
+import torch
+from torch import nn
+import torch.nn.functional as F
+
+sys.path.append(Path(__file__).parent.parent.as_posix())
+
+ROOT_DIR = Path(__file__).parent.parent
+
+from model import load_densenet201, XRayFolder
+from model import build_exit_heads, train_exits, save_exits, load_exits
+from model import attach_exits, exit_weight_path
+from model.early_exit import EXIT_POINTS, FINAL, densenet_sequential, exit_features
+from model.partition import INPUT_SHAPE
+
+
+def arg_parse():
+    parser = argparse.ArgumentParser(
+        description="DenseNet-201 출구 분류기 학습 (고정 backbone)과 확신도 threshold별 정확도/출구 비율/지연시간 비교"
+    )
+    parser.add_argument(
+        "--weight", type=str, default=str(ROOT_DIR / "model/ckpt_densenet201.pt")
+    )
+    parser.add_argument(
+        "--data", type=str, default="", help="학습용 `<라벨>/*.jpeg` 폴더"
+    )
+    parser.add_argument(
+        "--points", type=str, default=",".join(EXIT_POINTS), help="출구 위치 목록"
+    )
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--lr", type=float, default=1e-3)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument(
+        "--test", type=str, default="", help="평가용 `<라벨>/*.jpeg` 폴더"
+    )
+    parser.add_argument("--test-limit", type=int, default=200)
+    parser.add_argument(
+        "--thresholds", type=str, default="0.8,0.9,0.95,0.99", help="비교할 확신도 목록"
+    )
+    parser.add_argument(
+        "--exits", type=str, default="", help="학습 대신 평가할 출구 분류기 파일"
+    )
+    parser.add_argument(
+        "--model-dir", type=str, default=str(ROOT_DIR / "model"), help="저장 폴더"
+    )
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", type=str, default="")
+    return parser.parse_args()
+
+
+def measure_ms(
+    module: nn.Module, inputs: torch.Tensor, warmup: int, repeat: int
+) -> float:
+    """모듈 실행 시간 중앙값 (ms)"""
+    samples = []
+    with torch.inference_mode():
+        for i in range(warmup + repeat):
+            start_time = time.perf_counter()
+            module(inputs)
+            if i >= warmup:
+                samples.append((time.perf_counter() - start_time) * 1000)
+    return statistics.median(samples)
+
+
+def collect(
+    body: nn.Sequential, heads: nn.ModuleDict, dataset: XRayFolder
+) -> Dict[str, torch.Tensor]:
+    """이미지별 출구/최종 logit을 한 번씩 계산 (threshold별 결과는 이 값으로 계산)"""
+    outputs = {name: [] for name in list(heads.keys()) + [FINAL]}
+    labels = []
+    with torch.inference_mode():
+        for i in range(len(dataset)):
+            image, label, path = dataset[i]
+            image = image.unsqueeze(0)
+            features = exit_features(body, heads.keys(), image)
+            for name, head in heads.items():
+                outputs[name].append(head(features[name]))
+            outputs[FINAL].append(body(image))
+            labels.append(label)
+            print(f"\r{i + 1}/{len(dataset)} {Path(path).name}", end="", flush=True)
+    print()
+    result = {name: torch.cat(logits) for name, logits in outputs.items()}
+    result["labels"] = torch.tensor(labels)
+    return result
+
+
+def simulate(
+    outputs: Dict[str, torch.Tensor], names: List[str], threshold: float
+) -> Dict[str, object]:
+    """threshold에서 샘플마다 처음 확신도를 넘는 출구의 예측으로 정확도와 출구 비율 계산"""
+    labels = outputs["labels"]
+    remaining = torch.ones_like(labels, dtype=torch.bool)
+    prediction = torch.empty_like(labels)
+    fractions = {}
+    for name in names:
+        probs = F.softmax(outputs[name], dim=1)
+        done = remaining & (probs.max(dim=1).values >= threshold)
+        if name == FINAL:
+            done = remaining
+        prediction[done] = probs.argmax(dim=1)[done]
+        fractions[name] = done.float().mean().item()
+        remaining &= ~done
+    return {
+        "accuracy": (prediction == labels).float().mean().item(),
+        "exit_fractions": fractions,
+    }
+
+
+def main():
+    """메인 함수"""
+    args = arg_parse()
+    model = load_densenet201(args.weight, "cpu")
+    path = exit_weight_path(Path(args.model_dir))
+    if args.exits:
+        heads = load_exits(args.exits)
+        print(f"exits: {args.exits} ({', '.join(heads.keys())})")
+    else:
+        if not args.data:
+            raise SystemExit("--data is required for training (or use --exits)")
+        heads = build_exit_heads(model, args.points.split(","))
+        dataset = XRayFolder(args.data)
+        print(f"train: {args.data} ({len(dataset)} images, {dataset.class_names})")
+        heads = train_exits(
+            model, heads, dataset, args.epochs, args.lr, args.batch_size
+        )
+        save_exits(heads, path)
+        print(f"saved: {path}")
+
+    body = densenet_sequential(model)
+    names = list(heads.keys()) + [FINAL]
+    # 출구별 지연시간: 그 출구까지의 출구 분류기만 붙이고 항상 끝나도록(확신도 0) 실행
+    inputs = torch.zeros(INPUT_SHAPE)
+    latency = {}
+    for i, name in enumerate(names):
+        if name == FINAL:
+            module = attach_exits(body, heads, 1.01)
+        else:
+            subset = nn.ModuleDict({n: heads[n] for n in names[: i + 1]})
+            module = attach_exits(body, subset, 1e-6)
+        latency[name] = measure_ms(module, inputs, args.warmup, args.repeat)
+    latency["no exits"] = measure_ms(body, inputs, args.warmup, args.repeat)
+    print("CPU latency: " + ", ".join(f"{n} {ms:.2f} ms" for n, ms in latency.items()))
+
+    result = {"exits": list(heads.keys()), "latency_ms": latency, "thresholds": {}}
+    if args.test:
+        dataset = XRayFolder(args.test, args.test_limit)
+        print(f"test: {args.test} ({len(dataset)} images, {dataset.class_names})")
+        outputs = collect(body, heads, dataset)
+        result["accuracy"] = {
+            name: (outputs[name].argmax(1) == outputs["labels"]).float().mean().item()
+            for name in names
+        }
+        print(
+            "accuracy: "
+            + ", ".join(f"{n} {a:.2%}" for n, a in result["accuracy"].items())
+        )
+        print(
+            f"{'threshold':>9} {'accuracy':>9} {'ms':>8} "
+            + " ".join(f"{name:>12}" for name in names)
+        )
+        for threshold in [float(t) for t in args.thresholds.split(",")]:
+            row = simulate(outputs, names, threshold)
+            row["expected_ms"] = sum(
+                fraction * latency[name]
+                for name, fraction in row["exit_fractions"].items()
+            )
+            result["thresholds"][str(threshold)] = row
+            print(
+                f"{threshold:9.3f} {row['accuracy']:9.2%} {row['expected_ms']:8.2f} "
+                + " ".join(f"{row['exit_fractions'][n]:12.1%}" for n in names)
+            )
+
+    if args.output:
+        result.update(
+            host=socket.gethostname(),
+            torch=torch.__version__,
+            threads=torch.get_num_threads(),
+        )
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
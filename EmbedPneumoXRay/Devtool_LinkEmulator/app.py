@@ -0,0 +1,321 @@
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import threading
+import statistics
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+import torch
+
+sys.path.append(Path(__file__).parent.parent.as_posix())
+
+from comm import ENCODINGS, MSG_PING, MSG_REQUEST, ServerConnection
+
+_CHUNK_SIZE = 16 * 1024
+_IDLE_SLACK = 0.005  # 초
+
+
+class LinkProfile(NamedTuple):
+    bandwidth_mbps: float = 0.0  # 대역폭 제한, 0이면 제한 없음
+    latency_ms: float = 0.0  # 단방향 지연 시간
+    jitter_ms: float = 0.0  # 지연 시간 표준편차
+    stall_rate: float = 0.0  # 청크마다 전송이 멈출 확률 (패킷 손실 후 재전송 모사)
+    stall_ms: float = 200.0  # 전송이 멈추는 시간
+
+
+PRESETS = {
+    "ethernet": LinkProfile(bandwidth_mbps=940.0, latency_ms=0.2),
+    "wifi": LinkProfile(
+        bandwidth_mbps=40.0, latency_ms=3.0, jitter_ms=2.0, stall_rate=0.002
+    ),
+    "wifi-congested": LinkProfile(
+        bandwidth_mbps=8.0, latency_ms=10.0, jitter_ms=8.0, stall_rate=0.01
+    ),
+    "lte": LinkProfile(
+        bandwidth_mbps=15.0, latency_ms=25.0, jitter_ms=10.0, stall_rate=0.005
+    ),
+}
+
+
+def arg_parse():
+    parser = argparse.ArgumentParser(
+        description="대역폭, 지연, 지터, 전송 멈춤을 적용하는 TCP 프록시 및 부하 측정"
+    )
+    parser.add_argument("--listen", type=str, default="127.0.0.1:9000")
+    parser.add_argument("--target", type=str, default="127.0.0.1:8000")
+    parser.add_argument("--preset", type=str, default="", choices=[""] + list(PRESETS))
+    parser.add_argument("--bandwidth-mbps", type=float, default=None)
+    parser.add_argument("--latency-ms", type=float, default=None)
+    parser.add_argument("--jitter-ms", type=float, default=None)
+    parser.add_argument("--stall-rate", type=float, default=None)
+    parser.add_argument("--stall-ms", type=float, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--workload",
+        type=int,
+        default=0,
+        help="요청 수, 지정하면 프록시를 거쳐 요청을 보내고 지연 시간 분포 출력 후 종료",
+    )
+    parser.add_argument(
+        "--kind", type=str, default="request", choices=["request", "ping"]
+    )
+    parser.add_argument("--shape", type=str, default="1,64,64,64")
+    parser.add_argument("--encoding", type=str, default="raw", choices=ENCODINGS)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--output", type=str, default="")
+    return parser.parse_args()
+
+
+def link_profile(args) -> LinkProfile:
+    """프리셋에 개별 인자를 덮어쓴 링크 설정"""
+    profile = PRESETS.get(args.preset, LinkProfile())
+    overrides = {
+        field: getattr(args, field)
+        for field in LinkProfile._fields
+        if getattr(args, field) is not None
+    }
+    return profile._replace(**overrides)
+
+
+def split_address(address: str):
+    """ip:port 분리"""
+    ip, port = address.rsplit(":", 1)
+    return ip, int(port)
+
+
+class LinkEmulator:
+    __profile: LinkProfile
+    __listen: str
+    __target: str
+    __random: random.Random
+    __loop: Optional[asyncio.AbstractEventLoop]
+    __stop_event: Optional[asyncio.Event]
+    __ready: threading.Event
+
+    def __init__(
+        self, profile: LinkProfile, listen: str, target: str, seed: int = 0
+    ) -> None:
+        """클라이언트와 AI 연산 서버 사이에서 링크 조건을 적용하는 TCP 프록시 (양방향 동일 조건)"""
+        self.__profile = profile
+        self.__listen = listen
+        self.__target = target
+        self.__random = random.Random(seed)
+        self.__loop = None
+        self.__stop_event = None
+        self.__ready = threading.Event()
+
+    def run(self) -> None:
+        """이벤트 루프를 생성하고 종료 요청까지 프록시 실행 (블로킹)"""
+        asyncio.run(self.serve())
+
+    def start(self) -> threading.Thread:
+        """백그라운드 스레드에서 프록시 실행, 접속 가능해질 때까지 대기"""
+        thread = threading.Thread(target=self.run, daemon=True)
+        thread.start()
+        self.__ready.wait()
+        return thread
+
+    def stop(self) -> None:
+        """프록시 종료 요청, 다른 스레드에서 호출 가능"""
+        if self.__loop is not None and self.__stop_event is not None:
+            self.__loop.call_soon_threadsafe(self.__stop_event.set)
+
+    async def serve(self) -> None:
+        """프록시 실행"""
+        self.__loop = asyncio.get_running_loop()
+        self.__stop_event = asyncio.Event()
+        host, port = split_address(self.__listen)
+        server = await asyncio.start_server(self._handle_client, host, port)
+        print(f"link emulator: {self.__listen} -> {self.__target} {self.__profile}")
+        self.__ready.set()
+        async with server:
+            await self.__stop_event.wait()
+
+    async def _handle_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """접속마다 대상 서버에 연결하고 양방향 전달"""
+        try:
+            upstream_reader, upstream_writer = await asyncio.open_connection(
+                *split_address(self.__target)
+            )
+        except OSError as e:
+            print(f"upstream connect error: {self.__target} {e}")
+            writer.close()
+            return
+        pipes = [
+            asyncio.ensure_future(self._pipe(reader, upstream_writer)),
+            asyncio.ensure_future(self._pipe(upstream_reader, writer)),
+        ]
+        try:
+            await asyncio.wait(pipes, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            for pipe in pipes:
+                pipe.cancel()
+            await asyncio.gather(*pipes, return_exceptions=True)
+            writer.close()
+            upstream_writer.close()
+
+    async def _pipe(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """한 방향 전달: 대역폭만큼 읽고 지연 시간이 지난 뒤 순서대로 송신"""
+        queue: asyncio.Queue = asyncio.Queue()
+        deliver = asyncio.ensure_future(self._deliver(queue, writer))
+        profile = self.__profile
+        loop = asyncio.get_running_loop()
+        link_free = loop.time()
+        last_delivery = 0.0
+        try:
+            while True:
+                data = await reader.read(_CHUNK_SIZE)
+                if not data:
+                    break
+                now = loop.time()
+                if profile.bandwidth_mbps > 0:
+                    # 병목 링크 직렬화: 링크가 비는 시점까지 다음 읽기를 늦춤
+                    # (sleep 지연으로 생긴 짧은 공백은 링크가 쉰 것으로 보지 않음)
+                    if now - link_free > _IDLE_SLACK:
+                        link_free = now
+                    link_free += len(data) * 8 / (profile.bandwidth_mbps * 1e6)
+                    await asyncio.sleep(max(0.0, link_free - now))
+                    now = link_free
+                delay = profile.latency_ms
+                if profile.jitter_ms > 0:
+                    delay += abs(self.__random.gauss(0, profile.jitter_ms))
+                if self.__random.random() < profile.stall_rate:
+                    delay += profile.stall_ms
+                # TCP는 순서를 보장하므로 앞 청크보다 먼저 도착할 수 없음
+                last_delivery = max(now + delay / 1000, last_delivery)
+                queue.put_nowait((last_delivery, data))
+        finally:
+            queue.put_nowait(None)
+            await deliver
+
+    async def _deliver(self, queue: asyncio.Queue, writer: asyncio.StreamWriter):
+        """도착 시각이 된 청크 송신"""
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                deliver_at, data = item
+                await asyncio.sleep(max(0.0, deliver_at - loop.time()))
+                writer.write(data)
+                await writer.drain()
+            writer.write_eof()
+        except (ConnectionError, OSError):
+            pass
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """백분위수 (최근접 순위)"""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def run_workload(args) -> Dict:
+    """프록시를 거쳐 요청을 보내고 요청별 왕복 시간 측정"""
+    ip, port = split_address(args.listen)
+    connection = ServerConnection(
+        ip, port, timeout=10.0, encoding=ENCODINGS[args.encoding]
+    )
+    if not connection.connect():
+        raise SystemExit(f"connect failed: {args.listen}")
+    shape = tuple(int(size) for size in args.shape.split(","))
+    tensor = torch.relu(torch.randn(shape))
+    kind = MSG_PING if args.kind == "ping" else MSG_REQUEST
+    if kind == MSG_PING:
+        tensor = torch.zeros(tensor.numel() * tensor.element_size(), dtype=torch.uint8)
+
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+    next_index = iter(range(args.workload))
+
+    def worker():
+        nonlocal errors
+        for _ in next_index:
+            start_time = time.perf_counter()
+            _, future = connection.submit(tensor, kind=kind)
+            try:
+                future.result(60.0)
+            except Exception as e:
+                with lock:
+                    errors += 1
+                print(f"request failed: {e}")
+                continue
+            with lock:
+                latencies.append((time.perf_counter() - start_time) * 1000)
+
+    start_time = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start_time
+    connection.close()
+
+    result = {"requests": args.workload, "errors": errors, "elapsed_s": elapsed}
+    if latencies:
+        result.update(
+            throughput=len(latencies) / elapsed,
+            mean_ms=statistics.mean(latencies),
+            p50_ms=percentile(latencies, 50),
+            p90_ms=percentile(latencies, 90),
+            p99_ms=percentile(latencies, 99),
+            max_ms=max(latencies),
+        )
+    return result
+
+
+def main():
+    """메인 함수"""
+    args = arg_parse()
+    profile = link_profile(args)
+    emulator = LinkEmulator(profile, args.listen, args.target, args.seed)
+    if args.workload <= 0:
+        try:
+            emulator.run()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    thread = emulator.start()
+    result = run_workload(args)
+    emulator.stop()
+    thread.join()
+    result.update(
+        link=profile._asdict(),
+        kind=args.kind,
+        shape=args.shape,
+        encoding=args.encoding,
+        concurrency=args.concurrency,
+    )
+    print(
+        f"{result['requests']} requests, {result['errors']} errors,"
+        f" {result['elapsed_s']:.2f} s"
+    )
+    if "p50_ms" in result:
+        print(
+            f"latency ms: mean {result['mean_ms']:.2f} p50 {result['p50_ms']:.2f}"
+            f" p90 {result['p90_ms']:.2f} p99 {result['p99_ms']:.2f}"
+            f" max {result['max_ms']:.2f}, {result['throughput']:.1f} req/s"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+import sys
+import json
+import time
+import socket
+import argparse
+import platform
+import threading
+import statistics
+from concurrent.futures import wait
+from pathlib import Path
+from typing import Dict, List, NamedTuple
+
+import torch
+
+sys.path.append(Path(__file__).parent.parent.as_posix())
+
+from comm import ENCODINGS, ServerConnection, ResponseFuture
+from comm import ServerBusyError, DeadlineExceededError
+
+# 요청 결과
+OK = "ok"
+BUSY = "busy"
+ERROR = "error"
+TIMEOUT = "timeout"
+EXPIRED = "expired"  # 서버가 기한 초과로 실행하지 않음
+
+
+def arg_parse():
+    parser = argparse.ArgumentParser(
+        description="가상 장치 N대로 AI 연산 서버에 분할 지점 텐서를 보내 처리 용량 측정"
+    )
+    parser.add_argument("--server", type=str, default="127.0.0.1:8000")
+    parser.add_argument("--devices", type=int, default=4)
+    parser.add_argument(
+        "--mode",
+        type=str,
+        default="closed",
+        choices=["closed", "open"],
+        help="closed: 응답을 받으면 다음 요청, open: --rate 간격으로 응답과 무관하게 요청",
+    )
+    parser.add_argument(
+        "--rate", type=float, default=5.0, help="장치당 초당 요청 수 (open)"
+    )
+    parser.add_argument(
+        "--think",
+        type=float,
+        default=0.0,
+        help="응답 후 다음 요청까지 대기 초 (closed)",
+    )
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument(
+        "--warmup", type=float, default=3.0, help="통계에서 제외할 시작 구간 (초)"
+    )
+    parser.add_argument("--shape", type=str, default="1,64,64,64")
+    parser.add_argument("--encoding", type=str, default="raw", choices=ENCODINGS)
+    parser.add_argument("--timeout", type=float, default=5.0)
+    parser.add_argument(
+        "--deadline-ms", type=int, default=0, help="요청 응답 기한, 0이면 기한 없음"
+    )
+    parser.add_argument(
+        "--client-id",
+        type=int,
+        default=0,
+        help="모든 가상 장치가 함께 쓰는 공정 분배 ID, 0이면 장치(접속)마다 따로 분배",
+    )
+    parser.add_argument("--window", type=float, default=1.0, help="시계열 구간 (초)")
+    parser.add_argument("--output", type=str, default="")
+    parser.add_argument(
+        "--baseline", type=str, default="", help="비교할 이전 결과 JSON"
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=0.1, help="기준 대비 허용 성능 저하 비율"
+    )
+    return parser.parse_args()
+
+
+class Sample(NamedTuple):
+    sent: float  # 측정 시작 기준 전송 시각 (초)
+    latency: float  # 왕복 시간 (초)
+    result: str
+    queue_ms: float = 0.0  # 서버 대기열 대기 시간
+    service_ms: float = 0.0  # 서버 배치 실행 시간
+    queue_depth: int = 0  # 응답 시점 서버 대기열 길이
+
+
+class Device:
+    __connection: ServerConnection
+    __tensor: torch.Tensor
+    __timeout: float
+    __deadline_ms: int
+    __origin: float
+    __samples: List[Sample]
+    __pending: Dict[ResponseFuture, float]
+    __lock: threading.Lock
+
+    def __init__(
+        self,
+        address: str,
+        tensor: torch.Tensor,
+        encoding: int,
+        timeout: float,
+        deadline_ms: int = 0,
+        client_id: int = 0,
+    ) -> None:
+        """AI 연산 서버와 지속 연결 하나를 유지하는 가상 장치"""
+        ip, port = address.rsplit(":", 1)
+        self.__connection = ServerConnection(
+            ip, int(port), timeout, encoding, log=lambda msg: None, client_id=client_id
+        )
+        self.__tensor = tensor
+        self.__timeout = timeout
+        self.__deadline_ms = deadline_ms
+        self.__origin = 0.0
+        self.__samples = []
+        self.__pending = {}
+        self.__lock = threading.Lock()
+
+    @property
+    def samples(self) -> List[Sample]:
+        """측정 결과"""
+        with self.__lock:
+            return list(self.__samples)
+
+    def connect(self, origin: float) -> bool:
+        """서버 접속, origin은 측정 시작 시각"""
+        self.__origin = origin
+        return self.__connection.connect()
+
+    def run_closed(self, stop_at: float, think: float) -> None:
+        """응답을 받은 뒤 다음 요청을 보내는 폐루프 부하"""
+        while time.perf_counter() < stop_at:
+            future = self._send()
+            wait([future], self.__timeout)
+            if think > 0:
+                time.sleep(think)
+
+    def run_open(self, stop_at: float, rate: float) -> None:
+        """응답과 무관하게 일정 간격으로 요청을 보내는 개루프 부하"""
+        interval = 1.0 / rate
+        next_send = time.perf_counter()
+        while next_send < stop_at:
+            time.sleep(max(0.0, next_send - time.perf_counter()))
+            self._send()
+            next_send += interval
+
+    def finish(self) -> None:
+        """남은 요청을 기한까지 기다린 뒤 응답이 없는 요청은 timeout 처리하고 접속 종료"""
+        with self.__lock:
+            pending = dict(self.__pending)
+        wait(list(pending), self.__timeout)
+        with self.__lock:
+            for sent in self.__pending.values():
+                self.__samples.append(
+                    Sample(sent - self.__origin, self.__timeout, TIMEOUT)
+                )
+            self.__pending = {}
+        self.__connection.close()
+
+    def _send(self) -> ResponseFuture:
+        """요청 전송, 응답 시각은 수신 스레드의 완료 콜백에서 기록"""
+        sent = time.perf_counter()
+        _, future = self.__connection.submit(
+            self.__tensor, deadline_ms=self.__deadline_ms
+        )
+        with self.__lock:
+            self.__pending[future] = sent
+        future.add_done_callback(lambda f: self._on_done(sent, f))
+        return future
+
+    def _on_done(self, sent: float, future: ResponseFuture) -> None:
+        """요청 결과 기록, 기한을 넘긴 응답은 timeout"""
+        latency = time.perf_counter() - sent
+        error = future.exception()
+        header = future.header
+        if latency > self.__timeout:
+            result = TIMEOUT
+        elif error is None:
+            result = OK
+        elif isinstance(error, ServerBusyError):
+            result = BUSY
+        elif isinstance(error, DeadlineExceededError):
+            result = EXPIRED
+        else:
+            result = ERROR
+        sample = Sample(
+            sent - self.__origin,
+            latency,
+            result,
+            header.queue_us / 1000 if header else 0.0,
+            header.service_us / 1000 if header else 0.0,
+            header.queue_depth if header else 0,
+        )
+        with self.__lock:
+            if self.__pending.pop(future, None) is None:
+                return  # finish()에서 이미 timeout으로 기록
+            self.__samples.append(sample)
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """백분위수 (최근접 순위)"""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(samples: List[Sample], duration: float) -> Dict:
+    """결과 요약: 처리량, 지연 시간 백분위수, 결과별 개수, 서버 대기 시간"""
+    counts = {name: 0 for name in (OK, BUSY, ERROR, TIMEOUT, EXPIRED)}
+    for sample in samples:
+        counts[sample.result] += 1
+    summary = {"requests": len(samples), **counts}
+    ok = [sample for sample in samples if sample.result == OK]
+    summary["throughput"] = len(ok) / duration if duration > 0 else 0.0
+    if ok:
+        latencies = [sample.latency * 1000 for sample in ok]
+        summary.update(
+            mean_ms=statistics.mean(latencies),
+            p50_ms=percentile(latencies, 50),
+            p95_ms=percentile(latencies, 95),
+            p99_ms=percentile(latencies, 99),
+            max_ms=max(latencies),
+            queue_ms=statistics.mean(sample.queue_ms for sample in ok),
+            service_ms=statistics.mean(sample.service_ms for sample in ok),
+        )
+    return summary
+
+
+def timeseries(samples: List[Sample], window: float, end: float) -> List[Dict]:
+    """전송 시각 구간별 처리량, 지연 시간, 서버 대기열 변화"""
+    rows = []
+    start = 0.0
+    while start < end:
+        bucket = [s for s in samples if start <= s.sent < start + window]
+        ok = [s for s in bucket if s.result == OK]
+        row = {
+            "t": start,
+            "sent": len(bucket),
+            "ok": len(ok),
+            "failed": len(bucket) - len(ok),
+        }
+        if ok:
+            row.update(
+                p50_ms=percentile([s.latency * 1000 for s in ok], 50),
+                queue_ms=statistics.mean(s.queue_ms for s in ok),
+                service_ms=statistics.mean(s.service_ms for s in ok),
+                queue_depth=max(s.queue_depth for s in ok),
+            )
+        rows.append(row)
+        start += window
+    return rows
+
+
+def compare(summary: Dict, baseline_path: str, tolerance: float) -> bool:
+    """기준 결과 대비 처리량 감소 또는 p99 증가가 허용 범위를 넘으면 False"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)["summary"]
+    passed = True
+    checks = [
+        ("throughput", summary.get("throughput", 0.0), baseline.get("throughput"), 1),
+        ("p99_ms", summary.get("p99_ms"), baseline.get("p99_ms"), -1),
+    ]
+    for name, value, reference, direction in checks:
+        if value is None or not reference:
+            continue
+        change = (value - reference) / reference
+        regressed = change * direction < -tolerance
+        passed = passed and not regressed
+        print(
+            f"{name}: {reference:.2f} -> {value:.2f} ({change:+.1%})"
+            f"{' REGRESSION' if regressed else ''}"
+        )
+    return passed
+
+
+def main():
+    """메인 함수"""
+    args = arg_parse()
+    shape = tuple(int(size) for size in args.shape.split(","))
+    tensor = torch.relu(torch.randn(shape))
+    devices = [
+        Device(
+            args.server,
+            tensor,
+            ENCODINGS[args.encoding],
+            args.timeout,
+            args.deadline_ms,
+            args.client_id,
+        )
+        for _ in range(args.devices)
+    ]
+    origin = time.perf_counter()
+    connected = sum(device.connect(origin) for device in devices)
+    print(f"{connected}/{len(devices)} devices connected to {args.server}")
+    if connected == 0:
+        raise SystemExit(1)
+
+    stop_at = origin + args.warmup + args.duration
+    if args.mode == "closed":
+        target, extra = "run_closed", args.think
+    else:
+        target, extra = "run_open", args.rate
+    threads = [
+        threading.Thread(target=getattr(device, target), args=(stop_at, extra))
+        for device in devices
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for device in devices:
+        device.finish()
+
+    samples = sorted(
+        (sample for device in devices for sample in device.samples),
+        key=lambda sample: sample.sent,
+    )
+    measured = [sample for sample in samples if sample.sent >= args.warmup]
+    summary = summarize(measured, args.duration)
+    series = timeseries(samples, args.window, args.warmup + args.duration)
+
+    print(
+        f"{'t':>6} {'sent':>6} {'ok':>6} {'fail':>6} {'p50':>9} {'queue':>9} {'depth':>6}"
+    )
+    for row in series:
+        print(
+            f"{row['t']:6.1f} {row['sent']:6d} {row['ok']:6d} {row['failed']:6d}"
+            f" {row.get('p50_ms', 0):9.2f} {row.get('queue_ms', 0):9.2f}"
+            f" {row.get('queue_depth', 0):6d}"
+        )
+    print(
+        f"requests {summary['requests']}: ok {summary[OK]}, busy {summary[BUSY]},"
+        f" error {summary[ERROR]}, timeout {summary[TIMEOUT]},"
+        f" expired {summary[EXPIRED]}"
+    )
+    print(f"throughput: {summary['throughput']:.1f} req/s")
+    if "p50_ms" in summary:
+        print(
+            f"latency ms: mean {summary['mean_ms']:.2f} p50 {summary['p50_ms']:.2f}"
+            f" p95 {summary['p95_ms']:.2f} p99 {summary['p99_ms']:.2f}"
+            f" max {summary['max_ms']:.2f}"
+        )
+        print(
+            f"server ms: queue {summary['queue_ms']:.2f}"
+            f" service {summary['service_ms']:.2f}"
+        )
+
+    if args.output:
+        result = {
+            "config": vars(args),
+            "environment": {
+                "host": socket.gethostname(),
+                "python": platform.python_version(),
+                "torch": torch.__version__,
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            },
+            "summary": summary,
+            "timeseries": series,
+        }
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"saved: {args.output}")
+    if args.baseline and not compare(summary, args.baseline, args.tolerance):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+from pathlib import Path
+from typing import Tuple
+
+import torch
+from torch import nn
+
+sys.path.append(Path(__file__).parent.parent.as_posix())
+
+ROOT_DIR = Path(__file__).parent.parent
+
+from model import load_densenet201, XRayFolder, DEFAULT_CUT
+from model import count_flops, cut_points, split_densenet, split_weight_paths
+from model import prune_densenet, search_ratios, fine_tune, pruned_weight_paths
+from model.prune import prune_groups
+from model.partition import INPUT_SHAPE
+
+
+def arg_parse():
+    parser = argparse.ArgumentParser(
+        description="DenseNet-201 구조적 채널 가지치기 (FLOPs 또는 CPU 지연시간 목표, 선택적 재학습, 분할 모델 저장)"
+    )
+    parser.add_argument(
+        "--weight", type=str, default=str(ROOT_DIR / "model/ckpt_densenet201.pt")
+    )
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument(
+        "--target-flops", type=float, help="현재 연산량 대비 목표 비율 (예: 0.6)"
+    )
+    target.add_argument(
+        "--target-ms", type=float, help="이 CPU에서의 목표 지연시간 (ms)"
+    )
+    parser.add_argument(
+        "--cut", type=str, default=DEFAULT_CUT, help="분할 모델을 만들 분할 지점"
+    )
+    parser.add_argument(
+        "--scope",
+        type=str,
+        default="tail",
+        choices=["tail", "full"],
+        help="tail: 분할 지점 뒤만 가지치기해 장치의 기존 헤드와 호환, full: 전체 모델",
+    )
+    parser.add_argument("--step", type=float, default=0.05, help="탐색 비율 간격")
+    parser.add_argument(
+        "--attempts", type=int, default=3, help="지연시간 목표의 최대 탐색 횟수"
+    )
+    parser.add_argument(
+        "--data", type=str, default="", help="재학습용 `<라벨>/*.jpeg` 폴더"
+    )
+    parser.add_argument(
+        "--epochs", type=int, default=0, help="재학습 epoch (0이면 생략)"
+    )
+    parser.add_argument("--lr", type=float, default=1e-3)
+    parser.add_argument(
+        "--test", type=str, default="", help="정확도 검사용 `<라벨>/*.jpeg` 폴더"
+    )
+    parser.add_argument("--test-limit", type=int, default=200)
+    parser.add_argument(
+        "--model-dir", type=str, default=str(ROOT_DIR / "model"), help="저장 폴더"
+    )
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", type=str, default="")
+    return parser.parse_args()
+
+
+def measure_ms(
+    module: nn.Module, inputs: torch.Tensor, warmup: int, repeat: int
+) -> float:
+    """모듈 실행 시간 중앙값 (ms)"""
+    samples = []
+    with torch.inference_mode():
+        for i in range(warmup + repeat):
+            start_time = time.perf_counter()
+            module(inputs)
+            if i >= warmup:
+                samples.append((time.perf_counter() - start_time) * 1000)
+    return statistics.median(samples)
+
+
+def accuracy(model: nn.Module, dataset: XRayFolder) -> float:
+    """데이터셋 정확도"""
+    correct = 0
+    with torch.inference_mode():
+        for i in range(len(dataset)):
+            image, label, _ = dataset[i]
+            correct += model(image.unsqueeze(0)).argmax(1).item() == label
+    return correct / max(1, len(dataset))
+
+
+def main():
+    """메인 함수"""
+    args = arg_parse()
+    model = load_densenet201(args.weight, "cpu")
+    inputs = torch.zeros(INPUT_SHAPE)
+    if args.cut not in cut_points(model):
+        raise SystemExit(f"unknown cut point: {args.cut}")
+
+    # tail 범위이면 테일(분할 지점 뒤)의 연산량/지연시간만 목표로 하고 헤드는 그대로 유지
+    groups = prune_groups(model)
+    if args.scope == "tail":
+        names = cut_points(model)
+        groups = [g for g in groups if names.index(g) > names.index(args.cut)]
+    if not groups:
+        raise SystemExit(f"nothing to prune after {args.cut}")
+
+    def measured(candidate: nn.Module) -> Tuple[nn.Module, torch.Tensor]:
+        """비용 측정 대상 (tail 범위이면 분할 테일과 헤드 출력, 아니면 전체 모델과 입력)"""
+        if args.scope == "full":
+            return candidate, inputs
+        head, tail, _ = split_densenet(candidate, args.cut)
+        with torch.inference_mode():
+            feature = head(inputs)
+        return tail, feature
+
+    def flops(candidate: nn.Module) -> float:
+        return float(count_flops(*measured(candidate))[0])
+
+    def latency(candidate: nn.Module) -> float:
+        return measure_ms(*measured(candidate), args.warmup, args.repeat)
+
+    before = {"flops": flops(model), "ms": latency(model)}
+    print(f"scope {args.scope} (cut {args.cut}), groups: {', '.join(groups)}")
+    # 지연시간 목표도 측정 잡음에 흔들리지 않도록 연산량 비율로 탐색하고,
+    # 측정한 지연시간이 목표보다 크면 그 차이만큼 연산량 비율을 낮춰 다시 탐색
+    if args.target_flops is not None:
+        fraction = args.target_flops
+    else:
+        fraction = args.target_ms / before["ms"]
+    for attempt in range(args.attempts):
+        try:
+            ratios, _ = search_ratios(
+                model, flops, before["flops"] * fraction, groups, args.step
+            )
+        except ValueError as e:
+            raise SystemExit(str(e))
+        if args.target_flops is not None:
+            break
+        ms = latency(prune_densenet(model, ratios))
+        print(f"attempt {attempt + 1}: {ms:.2f} ms (target {args.target_ms} ms)")
+        if ms <= args.target_ms:
+            break
+        fraction *= args.target_ms / ms
+    else:
+        print(f"target {args.target_ms} ms not reached in {args.attempts} attempts")
+    pruned = prune_densenet(model, ratios)
+
+    if args.epochs > 0:
+        if not args.data:
+            raise SystemExit("--data is required for fine-tuning")
+        dataset = XRayFolder(args.data)
+        print(f"fine-tune: {args.data} ({len(dataset)} images)")
+        pruned = fine_tune(pruned, dataset, args.epochs, args.lr)
+
+    after = {"flops": flops(pruned), "ms": latency(pruned)}
+    print(f"{'':>6} {'MFLOPs':>10} {'ms':>9}")
+    for name, row in (("before", before), ("after", after)):
+        print(f"{name:>6} {row['flops'] / 1e6:10.1f} {row['ms']:9.2f}")
+    print(
+        f"flops {after['flops'] / before['flops']:.1%}, speed-up {before['ms'] / after['ms']:.2f}x"
+    )
+
+    result = {"accuracy": {}}
+    if args.test:
+        dataset = XRayFolder(args.test, args.test_limit)
+        result["accuracy"] = {"before": accuracy(model, dataset)}
+        result["accuracy"]["after"] = accuracy(pruned, dataset)
+        print(
+            f"accuracy ({len(dataset)} images): {result['accuracy']['before']:.2%}"
+            f" -> {result['accuracy']['after']:.2%}"
+        )
+
+    model_dir = Path(args.model_dir)
+    full_path, head_path, tail_path = pruned_weight_paths(model_dir, args.cut)
+    torch.save(pruned, full_path)
+    print(f"saved: {full_path}")
+    if args.scope == "tail":
+        # 헤드는 fp32 모델과 같으므로 서버는 장치의 기존 헤드 출력에 이 테일을 실행
+        head, tail, manifest = split_densenet(pruned, args.cut)
+        torch.save(head, head_path)
+        torch.save(tail, tail_path)
+        manifest.save(split_weight_paths(model_dir, args.cut, "densenet201_pruned")[2])
+        print(f"saved: {head_path}, {tail_path}")
+
+    result.update(
+        host=socket.gethostname(),
+        torch=torch.__version__,
+        threads=torch.get_num_threads(),
+        scope=args.scope,
+        cut=args.cut,
+        ratios=ratios,
+        epochs=args.epochs,
+        before=before,
+        after=after,
+    )
+    output = args.output or full_path.with_name(f"{full_path.stem}_report.json")
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"saved: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import torch
+
+sys.path.append(Path(__file__).parent.parent.as_posix())
+
+ROOT_DIR = Path(__file__).parent.parent
+
+from model import load_densenet201, load_image, XRayFolder
+from model import split_densenet, split_weight_paths
+from model import quantize_int8, save_quantized, quantized_weight_paths
+from model.quantize import default_backend
+
+
+def arg_parse():
+    parser = argparse.ArgumentParser(
+        description="DenseNet-201 int8 정적 양자화 (보정, 전체/분할 모델 저장, 정확도와 CPU 처리량 비교)"
+    )
+    parser.add_argument(
+        "--weight", type=str, default=str(ROOT_DIR / "model/ckpt_densenet201.pt")
+    )
+    parser.add_argument(
+        "--calib", type=str, default=str(ROOT_DIR / "data"), help="보정용 X레이 폴더"
+    )
+    parser.add_argument("--calib-limit", type=int, default=100)
+    parser.add_argument(
+        "--test",
+        type=str,
+        default=str(ROOT_DIR / "data"),
+        help="`<라벨>/*.jpeg` 구조의 정확도 검사 폴더",
+    )
+    parser.add_argument("--test-limit", type=int, default=200)
+    parser.add_argument(
+        "--cuts", type=str, default="pool0", help="분할 모델을 만들 분할 지점 목록"
+    )
+    parser.add_argument(
+        "--backend",
+        type=str,
+        default=default_backend(),
+        choices=torch.backends.quantized.supported_engines,
+    )
+    parser.add_argument(
+        "--model-dir", type=str, default=str(ROOT_DIR / "model"), help="저장 폴더"
+    )
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", type=str, default="")
+    return parser.parse_args()
+
+
+def calibration_images(folder: str, limit: int) -> List[torch.Tensor]:
+    """폴더(하위 폴더 포함)의 X레이 이미지를 고르게 limit장 골라 입력 텐서로 변환"""
+    paths = sorted(Path(folder).rglob("*.jpeg"))
+    if not paths:
+        raise SystemExit(f"no calibration images: {folder}")
+    if limit > 0 and len(paths) > limit:
+        step = len(paths) / limit
+        paths = [paths[int(i * step)] for i in range(limit)]
+    return [load_image(str(path)) for path in paths]
+
+
+def measure_ms(fn: Callable[[], torch.Tensor], warmup: int, repeat: int) -> float:
+    """함수 실행 시간 중앙값 (ms)"""
+    samples = []
+    for i in range(warmup + repeat):
+        start_time = time.perf_counter()
+        fn()
+        if i >= warmup:
+            samples.append((time.perf_counter() - start_time) * 1000)
+    return statistics.median(samples)
+
+
+def evaluate(
+    models: Dict[str, Callable[[torch.Tensor], torch.Tensor]], dataset: XRayFolder
+) -> Dict[str, Dict[str, float]]:
+    """모델별 정확도와 fp32 대비 argmax 일치율, 최대 logit 차이"""
+    correct = {name: 0 for name in models}
+    agree = {name: 0 for name in models}
+    max_diff = {name: 0.0 for name in models}
+    with torch.inference_mode():
+        for i in range(len(dataset)):
+            image, label, path = dataset[i]
+            image = image.unsqueeze(0)
+            reference = None
+            for name, model in models.items():
+                logits = model(image)
+                if reference is None:
+                    reference = logits
+                prediction = logits.argmax(1).item()
+                correct[name] += prediction == label
+                agree[name] += prediction == reference.argmax(1).item()
+                diff = (logits - reference).abs().max().item()
+                max_diff[name] = max(max_diff[name], diff)
+            print(f"\r{i + 1}/{len(dataset)} {Path(path).name}", end="", flush=True)
+    print()
+    count = max(1, len(dataset))
+    return {
+        name: {
+            "accuracy": correct[name] / count,
+            "argmax_agreement": agree[name] / count,
+            "max_logit_diff": max_diff[name],
+        }
+        for name in models
+    }
+
+
+def main():
+    """메인 함수"""
+    args = arg_parse()
+    model = load_densenet201(args.weight, "cpu")
+    images = calibration_images(args.calib, args.calib_limit)
+    print(f"calibration: {args.calib} ({len(images)} images), backend {args.backend}")
+    model_dir = Path(args.model_dir)
+    info = {"calibration_images": len(images)}
+    inputs = images[0].repeat(args.batch_size, 1, 1, 1)
+
+    full = quantize_int8(model, images, args.backend)
+    full_path, _, _ = quantized_weight_paths(model_dir)
+    save_quantized(full, full_path, info)
+    print(f"saved: {full_path}")
+    models = {"fp32": model, "int8": full}
+    speed = {"fp32": lambda: model(inputs), "int8": lambda: full(inputs)}
+    for cut in args.cuts.split(","):
+        head, tail, manifest = split_densenet(model, cut)
+        with torch.inference_mode():
+            features = [head(image) for image in images]
+        head_q = quantize_int8(head, images, args.backend)
+        tail_q = quantize_int8(tail, features, args.backend)
+        _, head_path, tail_path = quantized_weight_paths(model_dir, cut)
+        save_quantized(head_q, head_path, dict(info, cut=cut))
+        save_quantized(tail_q, tail_path, dict(info, cut=cut))
+        # 서버와 클라이언트는 fp32 분할 manifest로 전송 텐서 shape을 확인
+        manifest_path = split_weight_paths(model_dir, cut)[2]
+        if not manifest_path.exists():
+            manifest.save(manifest_path)
+        print(f"saved: {head_path}, {tail_path}")
+        # 장치와 서버 모두 int8, 장치는 fp32 헤드이고 서버만 int8 테일
+        models[f"int8 head+tail {cut}"] = lambda x, h=head_q, t=tail_q: t(h(x))
+        models[f"int8 tail {cut}"] = lambda x, h=head, t=tail_q: t(h(x))
+        with torch.inference_mode():
+            feature = head(inputs)
+        speed[f"fp32 head {cut}"] = lambda h=head: h(inputs)
+        speed[f"int8 head {cut}"] = lambda h=head_q: h(inputs)
+        speed[f"fp32 tail {cut}"] = lambda t=tail, f=feature: t(f)
+        speed[f"int8 tail {cut}"] = lambda t=tail_q, f=feature: t(f)
+
+    dataset = XRayFolder(args.test, args.test_limit)
+    print(f"test: {args.test} ({len(dataset)} images, {dataset.class_names})")
+    accuracy = evaluate(models, dataset)
+    print(
+        f"{'model':>28} {'accuracy':>9} {'delta':>8} {'argmax':>8} {'max|dlogit|':>12}"
+    )
+    for name, row in accuracy.items():
+        row["accuracy_delta"] = row["accuracy"] - accuracy["fp32"]["accuracy"]
+        print(
+            f"{name:>28} {row['accuracy']:9.2%} {row['accuracy_delta']:+8.2%}"
+            f" {row['argmax_agreement']:8.2%} {row['max_logit_diff']:12.5f}"
+        )
+
+    throughput = {}
+    print(
+        f"CPU throughput (batch {args.batch_size}, {torch.get_num_threads()} threads)"
+    )
+    with torch.inference_mode():
+        for name, fn in speed.items():
+            ms = measure_ms(fn, args.warmup, args.repeat)
+            throughput[name] = {"ms": ms, "images_per_sec": args.batch_size * 1000 / ms}
+            print(
+                f"{name:>28} {ms:9.2f} ms {throughput[name]['images_per_sec']:8.1f} img/s"
+            )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "host": socket.gethostname(),
+                    "backend": args.backend,
+                    "torch": torch.__version__,
+                    "calibration_images": len(images),
+                    "test_images": len(dataset),
+                    "accuracy": accuracy,
+                    "throughput": throughput,
+                },
+                f,
+                indent=2,
+            )
+        print(f"saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import torch
+
+sys.path.append(Path(__file__).parent.parent.as_posix())
+
+ROOT_DIR = Path(__file__).parent.parent
+
+from comm import ENCODINGS, ServerConnection
+from comm.protocol import HEADER_SIZE, encode_tensor
+from model import densenet201, load_densenet201, load_image, XRayFolder
+from model import cut_points, split_densenet, split_weight_paths
+from model import optimize_for_inference
+
+
+def arg_parse():
+    parser = argparse.ArgumentParser(
+        description="분할 지점별 헤드/테일 연산 시간과 전송량을 측정해 최적 분할 지점 추천"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    profile = sub.add_parser("profile", help="이 장비에서 분할 지점별 연산 시간 측정")
+    profile.add_argument(
+        "--weight", type=str, default=str(ROOT_DIR / "model/ckpt_densenet201.pt")
+    )
+    profile.add_argument("--data", type=str, default=str(ROOT_DIR / "data"))
+    profile.add_argument("--cuts", type=str, default="")
+    profile.add_argument("--batch-size", type=int, default=1)
+    profile.add_argument("--warmup", type=int, default=5)
+    profile.add_argument("--repeat", type=int, default=20)
+    profile.add_argument(
+        "--optimize", action="store_true", help="BatchNorm을 합친 추론용 모델로 측정"
+    )
+    profile.add_argument("--output", type=str, required=True)
+
+    rank = sub.add_parser(
+        "rank", help="장치/서버 측정 결과와 링크 정보로 분할 지점 순위 계산"
+    )
+    rank.add_argument("--device", type=str, required=True, help="장치 profile 결과")
+    rank.add_argument("--server", type=str, required=True, help="서버 profile 결과")
+    rank.add_argument(
+        "--encoding",
+        type=str,
+        default="raw",
+        choices=[name for name in ENCODINGS if name != "auto"],
+    )
+    rank.add_argument("--bandwidth-mbps", type=float, default=100.0)
+    rank.add_argument("--rtt-ms", type=float, default=1.0)
+    rank.add_argument(
+        "--measure", type=str, default="", help="ip:port, 실행 중인 AI 서버로 링크 측정"
+    )
+    rank.add_argument(
+        "--objective", type=str, default="latency", choices=["latency", "throughput"]
+    )
+    rank.add_argument("--output", type=str, default="")
+    rank.add_argument(
+        "--save",
+        type=str,
+        default="",
+        help="원본 가중치 경로, 지정하면 추천 분할 지점의 분할 모델과 manifest를 model/에 저장",
+    )
+    return parser.parse_args()
+
+
+def measure_ms(
+    fn: Callable[[], torch.Tensor], device: torch.device, warmup: int, repeat: int
+) -> float:
+    """함수 실행 시간 중앙값 (ms)"""
+    samples = []
+    for i in range(warmup + repeat):
+        if device.type == "cuda":
+            torch.cuda.synchronize(device)
+        start_time = time.perf_counter()
+        fn()
+        if device.type == "cuda":
+            torch.cuda.synchronize(device)
+        if i >= warmup:
+            samples.append((time.perf_counter() - start_time) * 1000)
+    return statistics.median(samples)
+
+
+def sample_input(data_dir: str, batch_size: int) -> torch.Tensor:
+    """data 폴더의 첫 이미지로 만든 입력, 이미지가 없으면 정규분포 입력"""
+    try:
+        dataset = XRayFolder(data_dir, 1)
+        image = load_image(dataset.images[0])
+        print(f"input image: {dataset.images[0]}")
+    except (OSError, IndexError):
+        print("input image: random")
+        image = torch.randn(1, 1, 256, 256)
+    return image.repeat(batch_size, 1, 1, 1)
+
+
+def wire_bytes(tensor: torch.Tensor) -> Dict[str, int]:
+    """인코딩별 전송 프레임 크기"""
+    sizes = {}
+    for name, encoding in ENCODINGS.items():
+        if name == "auto":
+            continue
+        _, meta, payload = encode_tensor(tensor, 0, encoding=encoding)
+        sizes[name] = HEADER_SIZE + len(meta) + payload.nbytes
+    return sizes
+
+
+def profile(args) -> None:
+    """분할 지점별 헤드/테일 연산 시간 측정"""
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    if Path(args.weight).exists():
+        model = load_densenet201(args.weight, device)
+    else:
+        # 연산 시간은 가중치 값과 무관하므로 임의 가중치로 측정
+        print(f"weight not found, using random weights: {args.weight}")
+        model = densenet201(num_classes=2).to(device).eval()
+    inputs = sample_input(args.data, args.batch_size).to(device)
+    cuts = args.cuts.split(",") if args.cuts else cut_points(model)
+    results = []
+    with torch.inference_mode():
+        for cut in cuts:
+            head, tail, manifest = split_densenet(model, cut)
+            feature = head(inputs)
+            # 테일의 inplace ReLU가 feature를 바꾸므로 테일 실행 전에 전송 크기 계산
+            sizes = wire_bytes(feature[:1].cpu())
+            if args.optimize:
+                head, _ = optimize_for_inference(head, inputs)
+                tail, _ = optimize_for_inference(tail, feature)
+            head_ms = measure_ms(lambda: head(inputs), device, args.warmup, args.repeat)
+            tail_ms = measure_ms(
+                lambda: tail(feature), device, args.warmup, args.repeat
+            )
+            results.append(
+                dict(
+                    manifest.to_dict(),
+                    head_ms=head_ms,
+                    tail_ms=tail_ms,
+                    wire_bytes=sizes,
+                )
+            )
+            print(
+                f"{cut:>12} {str(manifest.shape):>20}"
+                f" head {head_ms:8.2f} ms  tail {tail_ms:8.2f} ms"
+            )
+    with open(args.output, "w") as f:
+        json.dump(
+            {
+                "host": socket.gethostname(),
+                "device": str(device),
+                "batch_size": args.batch_size,
+                "optimize": args.optimize,
+                "torch": torch.__version__,
+                "cuts": results,
+            },
+            f,
+            indent=2,
+        )
+    print(f"saved: {args.output}")
+
+
+def measure_link(address: str, payload_bytes: int = 1 << 20, repeat: int = 10):
+    """실행 중인 AI 서버와의 왕복 시간(ms)과 대역폭(Mbps) 측정"""
+    ip, port = address.rsplit(":", 1)
+    connection = ServerConnection(ip, int(port), log=lambda msg: None)
+    try:
+        if not connection.connect():
+            raise ConnectionError(f"connect failed: {address}")
+        connection.ping(0, 5.0)
+        rtt = statistics.median(connection.ping(0, 5.0) for _ in range(repeat))
+        transfer = statistics.median(
+            connection.ping(payload_bytes, 30.0) for _ in range(repeat)
+        )
+    finally:
+        connection.close()
+    bandwidth_mbps = payload_bytes * 8 / max(transfer - rtt, 1e-6) / 1e6
+    return rtt * 1000, bandwidth_mbps
+
+
+def rank(args) -> None:
+    """분할 지점별 예상 지연 시간과 처리량 계산 및 추천"""
+    with open(args.device) as f:
+        device_profile = json.load(f)
+    with open(args.server) as f:
+        server_profile = json.load(f)
+    rtt_ms, bandwidth_mbps = args.rtt_ms, args.bandwidth_mbps
+    if args.measure:
+        rtt_ms, bandwidth_mbps = measure_link(args.measure)
+        print(f"measured link: rtt {rtt_ms:.2f} ms, {bandwidth_mbps:.1f} Mbps")
+
+    server_cuts = {row["cut"]: row for row in server_profile["cuts"]}
+    rows: List[Dict] = []
+    for device_row in device_profile["cuts"]:
+        server_row = server_cuts.get(device_row["cut"])
+        if server_row is None:
+            continue
+        size = device_row["wire_bytes"][args.encoding]
+        transfer_ms = size * 8 / (bandwidth_mbps * 1e6) * 1000
+        head_ms, tail_ms = device_row["head_ms"], server_row["tail_ms"]
+        latency_ms = head_ms + rtt_ms + transfer_ms + tail_ms
+        # 파이프라인으로 연속 요청하면 가장 느린 단계가 처리량을 결정
+        throughput = 1000 / max(head_ms, transfer_ms, tail_ms)
+        rows.append(
+            {
+                "cut": device_row["cut"],
+                "shape": device_row["shape"],
+                "wire_bytes": size,
+                "head_ms": head_ms,
+                "transfer_ms": transfer_ms,
+                "tail_ms": tail_ms,
+                "latency_ms": latency_ms,
+                "throughput": throughput,
+            }
+        )
+    if not rows:
+        raise SystemExit("no common cut point between device and server profiles")
+    if args.objective == "latency":
+        rows.sort(key=lambda row: row["latency_ms"])
+    else:
+        rows.sort(key=lambda row: -row["throughput"])
+
+    print(
+        f"link: rtt {rtt_ms:.2f} ms, {bandwidth_mbps:.1f} Mbps,"
+        f" encoding {args.encoding}, objective {args.objective}"
+    )
+    print(
+        f"{'rank':>4} {'cut':>12} {'bytes':>11} {'head':>9} {'transfer':>9}"
+        f" {'tail':>9} {'latency':>9} {'img/s':>8}"
+    )
+    for i, row in enumerate(rows):
+        print(
+            f"{i + 1:4d} {row['cut']:>12} {row['wire_bytes']:11,d}"
+            f" {row['head_ms']:9.2f} {row['transfer_ms']:9.2f} {row['tail_ms']:9.2f}"
+            f" {row['latency_ms']:9.2f} {row['throughput']:8.1f}"
+        )
+    best = rows[0]["cut"]
+    print(f"recommended split_point: {best}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "rtt_ms": rtt_ms,
+                    "bandwidth_mbps": bandwidth_mbps,
+                    "encoding": args.encoding,
+                    "objective": args.objective,
+                    "recommended": best,
+                    "ranking": rows,
+                },
+                f,
+                indent=2,
+            )
+        print(f"saved: {args.output}")
+    if args.save:
+        model = load_densenet201(args.save)
+        head, tail, manifest = split_densenet(model, best)
+        head_path, tail_path, manifest_path = split_weight_paths(
+            ROOT_DIR / "model", best
+        )
+        torch.save(head, head_path)
+        torch.save(tail, tail_path)
+        manifest.save(manifest_path)
+        print(f"saved: {head_path}, {tail_path}, {manifest_path}")
+        print(f"set `split_point: {best}` in config.yml")
+
+
+def main():
+    """메인 함수"""
+    args = arg_parse()
+    if args.command == "profile":
+        profile(args)
+    else:
+        rank(args)
+
+
+if __name__ == "__main__":
+    main()
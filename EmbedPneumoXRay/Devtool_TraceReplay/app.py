@@ -0,0 +1,339 @@
+import sys
+import json
+import time
+import argparse
+import threading
+import statistics
+from collections import Counter
+from concurrent.futures import wait
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import torch
+
+sys.path.append(Path(__file__).parent.parent.as_posix())
+
+from comm import ENCODINGS, MSG_ERROR, MSG_PING, MSG_REQUEST, MSG_RESPONSE
+from comm import ServerConnection, TraceRecord, read_trace
+
+# 응답 검증 결과
+MATCHED = "matched"
+MISMATCHED = "mismatched"
+UNVERIFIABLE = "unverifiable"
+ERROR = "error"
+
+
+def arg_parse():
+    parser = argparse.ArgumentParser(
+        description="기록한 요청 트레이스를 AI 연산 서버에 재현하고 응답과 지연 시간 비교"
+    )
+    parser.add_argument(
+        "trace", type=str, help="클라이언트 또는 서버에서 기록한 트레이스"
+    )
+    parser.add_argument("--server", type=str, default="127.0.0.1:8000")
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="재현 속도 배율, 0이면 기록 간격을 무시하고 최대 속도로 전송",
+    )
+    parser.add_argument(
+        "--encoding",
+        type=str,
+        default="",
+        choices=[""] + list(ENCODINGS),
+        help="전송 인코딩, 지정하지 않으면 기록된 원래 인코딩",
+    )
+    parser.add_argument(
+        "--atol", type=float, default=1e-4, help="응답 텐서 비교 허용 오차"
+    )
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--output", type=str, default="")
+    parser.add_argument(
+        "--info", action="store_true", help="재현하지 않고 트레이스 요약만 출력"
+    )
+    return parser.parse_args()
+
+
+def load_trace(
+    path: str,
+) -> Tuple[List[TraceRecord], Dict[Tuple[int, int], TraceRecord]]:
+    """요청 레코드 목록과 (스트림, 요청 ID)별 응답 레코드"""
+    requests = []
+    responses = {}
+    for record in read_trace(path):
+        if record.header.kind in (MSG_REQUEST, MSG_PING):
+            requests.append(record)
+        elif record.header.kind in (MSG_RESPONSE, MSG_ERROR):
+            responses[(record.stream, record.header.request_id)] = record
+    return requests, responses
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """백분위수 (최근접 순위)"""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def latency_summary(latencies: List[float]) -> Dict:
+    """지연 시간 분포 (ms)"""
+    if not latencies:
+        return {}
+    return {
+        "mean_ms": statistics.mean(latencies),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": max(latencies),
+    }
+
+
+def verify(
+    request: TraceRecord, response: Optional[TraceRecord], output: torch.Tensor, atol
+) -> str:
+    """재현 응답을 기록된 응답과 비교"""
+    if response is None or response.header.kind == MSG_ERROR:
+        return UNVERIFIABLE
+    if request.tensor is None or response.tensor is None:
+        # 페이로드 없이 기록하면 입력을 합성하므로 응답을 비교할 수 없음
+        return UNVERIFIABLE
+    expected = response.tensor
+    if output.shape != expected.shape:
+        return MISMATCHED
+    if not expected.is_floating_point():
+        return MATCHED if torch.equal(output, expected) else MISMATCHED
+    return (
+        MATCHED
+        if torch.allclose(output.float(), expected.float(), atol=atol)
+        else MISMATCHED
+    )
+
+
+def request_tensor(record: TraceRecord) -> torch.Tensor:
+    """기록된 요청 텐서, 페이로드가 없으면 같은 shape과 dtype의 0 텐서"""
+    if record.tensor is not None:
+        return record.tensor
+    return torch.zeros(record.header.shape, dtype=record.header.dtype)
+
+
+class StreamReplayer:
+    __connection: ServerConnection
+    __records: List[TraceRecord]
+    __responses: Dict[Tuple[int, int], TraceRecord]
+    __encoding: Optional[int]
+    __speed: float
+    __atol: float
+    __timeout: float
+    __results: List[Dict]
+    __lock: threading.Lock
+
+    def __init__(
+        self,
+        address: str,
+        records: List[TraceRecord],
+        responses: Dict[Tuple[int, int], TraceRecord],
+        encoding: Optional[int],
+        speed: float,
+        atol: float,
+        timeout: float,
+    ) -> None:
+        """스트림(접속) 하나의 요청을 기록된 간격으로 같은 연결에서 재현 (기록된 기한과 클라이언트 ID 포함)"""
+        ip, port = address.rsplit(":", 1)
+        self.__connection = ServerConnection(
+            ip,
+            int(port),
+            timeout,
+            log=lambda msg: None,
+            client_id=records[0].header.client_id if records else 0,
+        )
+        self.__records = records
+        self.__responses = responses
+        self.__encoding = encoding
+        self.__speed = speed
+        self.__atol = atol
+        self.__timeout = timeout
+        self.__results = []
+        self.__lock = threading.Lock()
+
+    @property
+    def results(self) -> List[Dict]:
+        """요청별 재현 결과"""
+        with self.__lock:
+            return list(self.__results)
+
+    def connect(self) -> bool:
+        """서버 접속"""
+        return self.__connection.connect()
+
+    def run(self, origin: float, start: float) -> None:
+        """기록 시각에 맞춰 요청 전송, origin은 재현 시작 시각, start는 첫 기록 시각"""
+        futures = []
+        for record in self.__records:
+            if self.__speed > 0:
+                send_at = origin + (record.time - start) / self.__speed
+                time.sleep(max(0.0, send_at - time.perf_counter()))
+            encoding = record.encoding if self.__encoding is None else self.__encoding
+            sent = time.perf_counter()
+            _, future = self.__connection.submit(
+                request_tensor(record),
+                encoding,
+                record.header.kind,
+                record.header.deadline_ms,
+            )
+            future.add_done_callback(
+                lambda f, record=record, sent=sent: self._on_done(record, sent, f)
+            )
+            futures.append(future)
+        wait(futures, self.__timeout)
+        self.__connection.close()
+
+    def _on_done(self, record: TraceRecord, sent: float, future) -> None:
+        """응답 검증 및 지연 시간 기록"""
+        latency = (time.perf_counter() - sent) * 1000
+        key = (record.stream, record.header.request_id)
+        response = self.__responses.get(key)
+        error = future.exception()
+        if error is not None:
+            result = ERROR
+        elif record.header.kind == MSG_PING:
+            result = UNVERIFIABLE
+        else:
+            result = verify(record, response, future.result(), self.__atol)
+        original = None
+        if response is not None:
+            original = (response.time - record.time) * 1000
+        with self.__lock:
+            self.__results.append(
+                {
+                    "stream": record.stream,
+                    "request_id": record.header.request_id,
+                    "time": record.time,
+                    "result": result,
+                    "latency_ms": latency,
+                    "original_ms": original,
+                    "error": str(error) if error is not None else "",
+                }
+            )
+
+
+def trace_info(requests: List[TraceRecord], responses: Dict) -> Dict:
+    """트레이스 요약: 스트림 수, 요청 수, 기간, shape과 인코딩 분포"""
+    if not requests:
+        return {"requests": 0}
+    names = {code: name for name, code in ENCODINGS.items()}
+    duration = requests[-1].time - requests[0].time
+    return {
+        "streams": len({record.stream for record in requests}),
+        "requests": len(requests),
+        "responses": len(responses),
+        "payload": sum(record.tensor is not None for record in requests),
+        "duration_s": duration,
+        "rate": len(requests) / duration if duration > 0 else 0.0,
+        "shapes": Counter(
+            str(tuple(record.header.shape)) for record in requests
+        ).most_common(),
+        "encodings": Counter(
+            names.get(record.encoding, str(record.encoding)) for record in requests
+        ).most_common(),
+    }
+
+
+def main():
+    """메인 함수"""
+    args = arg_parse()
+    requests, responses = load_trace(args.trace)
+    info = trace_info(requests, responses)
+    print(f"trace: {args.trace}")
+    for key, value in info.items():
+        print(f"  {key}: {value}")
+    if args.info or not requests:
+        return
+
+    streams: Dict[int, List[TraceRecord]] = {}
+    for record in requests:
+        streams.setdefault(record.stream, []).append(record)
+    encoding = ENCODINGS[args.encoding] if args.encoding else None
+    replayers = [
+        StreamReplayer(
+            args.server,
+            records,
+            responses,
+            encoding,
+            args.speed,
+            args.atol,
+            args.timeout,
+        )
+        for records in streams.values()
+    ]
+    if not all(replayer.connect() for replayer in replayers):
+        raise SystemExit(f"connect failed: {args.server}")
+
+    origin = time.perf_counter()
+    start = requests[0].time
+    threads = [
+        threading.Thread(target=replayer.run, args=(origin, start))
+        for replayer in replayers
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - origin
+
+    results = sorted(
+        (row for replayer in replayers for row in replayer.results),
+        key=lambda row: row["time"],
+    )
+    counts = Counter(row["result"] for row in results)
+    summary = {
+        "requests": len(requests),
+        "completed": len(results),
+        **{name: counts[name] for name in (MATCHED, MISMATCHED, UNVERIFIABLE, ERROR)},
+        "elapsed_s": elapsed,
+        "replay": latency_summary(
+            [row["latency_ms"] for row in results if row["result"] != ERROR]
+        ),
+        "original": latency_summary(
+            [row["original_ms"] for row in results if row["original_ms"] is not None]
+        ),
+    }
+    print(
+        f"{summary['completed']}/{summary['requests']} completed in {elapsed:.2f} s:"
+        f" matched {summary[MATCHED]}, mismatched {summary[MISMATCHED]},"
+        f" unverifiable {summary[UNVERIFIABLE]}, error {summary[ERROR]}"
+    )
+    for name in ("original", "replay"):
+        latency = summary[name]
+        if latency:
+            print(
+                f"{name:>8} ms: mean {latency['mean_ms']:.2f} p50 {latency['p50_ms']:.2f}"
+                f" p95 {latency['p95_ms']:.2f} p99 {latency['p99_ms']:.2f}"
+                f" max {latency['max_ms']:.2f}"
+            )
+    for row in results:
+        if row["result"] in (MISMATCHED, ERROR):
+            print(
+                f"  {row['result']}: stream {row['stream']} #{row['request_id']}"
+                f" {row['error']}"
+            )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "config": vars(args),
+                    "trace": info,
+                    "summary": summary,
+                    "requests": results,
+                },
+                f,
+                indent=2,
+            )
+        print(f"saved: {args.output}")
+    if counts[MISMATCHED] or counts[ERROR]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+from .protocol import ProtocolError, FrameHeader
+from .protocol import MSG_REQUEST, MSG_RESPONSE, MSG_ERROR, MSG_PING
+from .protocol import STATUS_OK, STATUS_BUSY, STATUS_EXPIRED
+from .protocol import send_tensor, send_error, recv_tensor, recv_frame
+from .protocol import write_tensor, write_error, read_tensor, read_frame, decode_tensor
+from .codec import ENC_RAW, ENC_FP16, ENC_BF16, ENC_INT8, ENCODINGS
+from .codec import ENC_SPARSE, ENC_ZLIB, ENC_SPARSE_ZLIB, ENC_SHM, ENC_AUTO
+from .codec import CodecStats, codec_stats, AdaptiveEncoder
+from .connection import ServerError, ServerBusyError, DeadlineExceededError
+from .connection import ResponseFuture, ServerConnection
+from .trace import TraceRecord, TraceWriter, read_trace, tensor_digest
+from .shm import local_socket_path, is_local_address
+from .shm import SharedTensorRing, SharedTensorReader
+from .balancer import BALANCE_POLICIES, parse_servers, ServerPool
@@ -0,0 +1,276 @@
+import time
+import itertools
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+import torch
+
+from .protocol import MSG_REQUEST
+from .codec import ENC_RAW
+from .trace import TraceWriter
+from .connection import ServerError, ServerBusyError, ResponseFuture, ServerConnection
+
+__all__ = ["BALANCE_POLICIES", "parse_servers", "ServerPool"]
+
+# 서버 선택 정책
+# least-outstanding: 응답 대기 중인 요청이 가장 적은 서버
+# latency: 왕복 시간 이동 평균 x (대기 요청 수 + 1)이 가장 작은 서버
+BALANCE_POLICIES = ("least-outstanding", "latency")
+
+_LATENCY_ALPHA = 0.2  # 왕복 시간 지수 이동 평균 가중치
+_MAX_EJECT_TIME = 60.0  # 초
+
+
+def parse_servers(text: str, default_port: int = 8000) -> List[Tuple[str, int]]:
+    """`ip:port,ip:port` 형식의 서버 목록 파싱, 포트를 생략하면 default_port"""
+    servers = []
+    for item in text.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        ip, _, port = item.rpartition(":") if ":" in item else (item, "", "")
+        servers.append((ip, int(port) if port else default_port))
+    return servers
+
+
+class _Backend:
+    connection: ServerConnection
+    name: str
+    latency: float = 0.0  # 왕복 시간 지수 이동 평균 (초), 0이면 측정 전
+    failures: int = 0  # 연속 실패 횟수
+    ejected_until: float = 0.0  # 제외 해제 시각 (monotonic), 0이면 사용 중
+    eject_time: float = 0.0  # 마지막 제외 시간 (재실패 시 2배)
+
+    @property
+    def ejected(self) -> bool:
+        """상태 이상으로 선택에서 제외되었는지 여부"""
+        return self.ejected_until > 0.0
+
+
+class ServerPool:
+    __backends: List[_Backend]
+    __policy: str
+    __max_failures: int
+    __eject_time: float
+    __timeout: float
+    __request_ids: itertools.count
+    __rotation: itertools.count
+    __lock: threading.Lock
+    __log: Callable[[str], None]
+
+    def __init__(
+        self,
+        servers: Sequence[Tuple[str, int]],
+        policy: str = "least-outstanding",
+        timeout: float = 3.0,
+        encoding: int = ENC_RAW,
+        log: Callable[[str], None] = print,
+        link_mbps: float = 100.0,
+        trace: Optional[TraceWriter] = None,
+        max_failures: int = 3,
+        eject_time: float = 5.0,
+        client_id: int = 0,
+    ) -> None:
+        """AI 연산 서버 여러 대에 요청을 분산하는 클라이언트 측 부하 분산기
+
+        연속 max_failures번 접속 또는 요청에 실패한 서버는 eject_time초 동안 제외하며,
+        이후 ping에 응답하면 다시 사용합니다. 다시 실패하면 제외 시간은 2배씩 늘어납니다.
+        client_id는 모든 서버에 알리는 공정 분배 단위 클라이언트 ID입니다.
+        """
+        if not servers:
+            raise ValueError("no server")
+        if policy not in BALANCE_POLICIES:
+            raise ValueError(f"unknown balance policy: {policy}")
+        self.__backends = []
+        for stream, (ip, port) in enumerate(servers):
+            backend = _Backend()
+            backend.name = f"{ip}:{port}"
+            backend.connection = ServerConnection(
+                ip,
+                port,
+                timeout,
+                encoding,
+                log=log,
+                link_mbps=link_mbps,
+                trace=trace,
+                stream=stream,
+                client_id=client_id,
+            )
+            self.__backends.append(backend)
+        self.__policy = policy
+        self.__max_failures = max(1, max_failures)
+        self.__eject_time = eject_time
+        self.__timeout = timeout
+        self.__request_ids = itertools.count(1)
+        self.__rotation = itertools.count()
+        self.__lock = threading.Lock()
+        self.__log = log
+
+    @property
+    def connected(self) -> bool:
+        """요청을 보낼 수 있는 서버가 하나라도 있는지 여부"""
+        return any(
+            not backend.ejected and backend.connection.connected
+            for backend in self.__backends
+        )
+
+    @property
+    def outstanding(self) -> int:
+        """응답 대기 중인 요청 수"""
+        return sum(backend.connection.outstanding for backend in self.__backends)
+
+    def status(self) -> List[Dict]:
+        """서버별 상태 (주소, 접속/제외 여부, 대기 요청 수, 왕복 시간)"""
+        return [
+            {
+                "server": backend.name,
+                "connected": backend.connection.connected,
+                "ejected": backend.ejected,
+                "outstanding": backend.connection.outstanding,
+                "latency_ms": backend.latency * 1000,
+            }
+            for backend in self.__backends
+        ]
+
+    def connect(self) -> bool:
+        """접속이 끊긴 서버 재접속, 제외 시간이 지난 서버는 ping으로 확인 후 복귀"""
+        now = time.monotonic()
+        for backend in self.__backends:
+            if backend.ejected:
+                if now >= backend.ejected_until:
+                    self._probe(backend)
+            elif not backend.connection.connected:
+                if not backend.connection.connect():
+                    self._record_failure(backend)
+        return self.connected
+
+    def submit(
+        self,
+        tensor: torch.Tensor,
+        encoding: Optional[int] = None,
+        kind: int = MSG_REQUEST,
+        deadline_ms: int = 0,
+    ) -> Tuple[int, ResponseFuture]:
+        """요청을 선택한 서버로 전송, 접속 오류나 과부하 거절이면 다른 서버로 재전송"""
+        request_id = next(self.__request_ids)
+        future = ResponseFuture()
+        self._dispatch(future, tensor, encoding, kind, deadline_ms, set())
+        return request_id, future
+
+    def request(self, tensor: torch.Tensor, timeout: float = None) -> torch.Tensor:
+        """텐서 요청 후 응답 대기"""
+        _, future = self.submit(tensor)
+        return future.result(timeout)
+
+    def close(self) -> None:
+        """모든 서버 연결 종료"""
+        for backend in self.__backends:
+            backend.connection.close()
+
+    def _select(self, tried: Set[_Backend]) -> Optional[_Backend]:
+        """정책에 따라 요청을 보낼 서버 선택, 아직 시도하지 않은 정상 서버 중에서"""
+        candidates = [
+            backend
+            for backend in self.__backends
+            if not backend.ejected and backend not in tried
+        ]
+        if not candidates:
+            return None
+        connected = [b for b in candidates if b.connection.connected]
+        candidates = connected or candidates
+        # 동률이면 돌아가며 선택
+        start = next(self.__rotation) % len(candidates)
+        candidates = candidates[start:] + candidates[:start]
+        if self.__policy == "latency":
+            return min(
+                candidates,
+                key=lambda b: b.latency * (b.connection.outstanding + 1),
+            )
+        return min(candidates, key=lambda b: b.connection.outstanding)
+
+    def _dispatch(
+        self,
+        future: ResponseFuture,
+        tensor: torch.Tensor,
+        encoding: Optional[int],
+        kind: int,
+        deadline_ms: int,
+        tried: Set[_Backend],
+        error: Optional[Exception] = None,
+    ) -> None:
+        """아직 시도하지 않은 서버로 요청 전송, 남은 서버가 없으면 마지막 오류로 실패"""
+        backend = self._select(tried)
+        if backend is None:
+            future.set_exception(error or ConnectionError("no available server"))
+            return
+        tried.add(backend)
+        sent = time.perf_counter()
+        _, inner = backend.connection.submit(tensor, encoding, kind, deadline_ms)
+        inner.add_done_callback(
+            lambda f: self._on_done(
+                backend, sent, f, future, tensor, encoding, kind, deadline_ms, tried
+            )
+        )
+
+    def _on_done(
+        self,
+        backend: _Backend,
+        sent: float,
+        inner: ResponseFuture,
+        future: ResponseFuture,
+        tensor: torch.Tensor,
+        encoding: Optional[int],
+        kind: int,
+        deadline_ms: int,
+        tried: Set[_Backend],
+    ) -> None:
+        """서버 응답 처리: 왕복 시간과 상태 갱신, 실패하면 다른 서버로 재전송"""
+        error = inner.exception()
+        future.header = inner.header
+        if error is None:
+            latency = time.perf_counter() - sent
+            with self.__lock:
+                backend.failures = 0
+                if backend.latency == 0.0:
+                    backend.latency = latency
+                backend.latency += _LATENCY_ALPHA * (latency - backend.latency)
+            future.set_result(inner.result())
+            return
+        if isinstance(error, ServerBusyError):
+            # 과부하는 서버 상태 이상이 아니므로 제외하지 않고 다른 서버로
+            self._dispatch(future, tensor, encoding, kind, deadline_ms, tried, error)
+        elif isinstance(error, ServerError):
+            future.set_exception(error)
+        else:
+            self._record_failure(backend)
+            self._dispatch(future, tensor, encoding, kind, deadline_ms, tried, error)
+
+    def _record_failure(self, backend: _Backend) -> None:
+        """연속 실패 횟수 갱신, 한도를 넘으면 제외"""
+        with self.__lock:
+            backend.failures += 1
+            if backend.ejected or backend.failures < self.__max_failures:
+                return
+            backend.eject_time = self.__eject_time
+            backend.ejected_until = time.monotonic() + backend.eject_time
+        self.__log(f"server ejected: {backend.name} for {backend.eject_time:.0f} s")
+
+    def _probe(self, backend: _Backend) -> None:
+        """제외된 서버 상태 확인, ping에 응답하면 복귀하고 아니면 제외 시간 연장"""
+        try:
+            if not backend.connection.connect():
+                raise ConnectionError("connect failed")
+            backend.connection.ping(0, self.__timeout)
+        except Exception as e:
+            with self.__lock:
+                backend.eject_time = min(backend.eject_time * 2, _MAX_EJECT_TIME)
+                backend.ejected_until = time.monotonic() + backend.eject_time
+            self.__log(
+                f"server still unhealthy: {backend.name} {e},"
+                f" retry in {backend.eject_time:.0f} s"
+            )
+            return
+        with self.__lock:
+            backend.failures = 0
+            backend.ejected_until = 0.0
+        self.__log(f"server readmitted: {backend.name}")
@@ -0,0 +1,397 @@
+import time
+import zlib
+import struct
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+
+__all__ = [
+    "ENC_RAW",
+    "ENC_FP16",
+    "ENC_BF16",
+    "ENC_INT8",
+    "ENC_SPARSE",
+    "ENC_ZLIB",
+    "ENC_SPARSE_ZLIB",
+    "ENC_SHM",
+    "ENC_AUTO",
+    "ENCODINGS",
+    "LOSSLESS_ENCODINGS",
+    "DTYPE_CODES",
+    "CODE_DTYPES",
+    "encoding_name",
+    "encode",
+    "decode",
+    "CodecStats",
+    "codec_stats",
+    "AdaptiveEncoder",
+]
+
+# 전송 인코딩
+# ENC_INT8 메타데이터: scale[C] float32, zero_point[C] int32
+# ENC_SPARSE, ENC_ZLIB, ENC_SPARSE_ZLIB 메타데이터: 원본 dtype, ndim, shape
+ENC_RAW = 0  # 원본 dtype 그대로
+ENC_FP16 = 1  # float16 변환
+ENC_BF16 = 2  # bfloat16 변환
+ENC_INT8 = 3  # 채널별 affine int8 양자화
+ENC_SPARSE = 4  # 0이 아닌 원소의 비트맵 + 해당 값 (무손실)
+ENC_ZLIB = 5  # 원시 바이트 zlib 압축 (무손실)
+ENC_SPARSE_ZLIB = 6  # 비트맵 + 값을 zlib 압축 (무손실)
+ENC_SHM = 7  # 전송 계층 전용: 페이로드 대신 공유 메모리 슬롯 위치 (comm/shm.py)
+ENC_AUTO = 255  # 클라이언트 설정 전용: 텐서마다 무손실 인코딩 자동 선택
+
+ENCODINGS = {
+    "raw": ENC_RAW,
+    "fp16": ENC_FP16,
+    "bf16": ENC_BF16,
+    "int8": ENC_INT8,
+    "sparse": ENC_SPARSE,
+    "zlib": ENC_ZLIB,
+    "sparse+zlib": ENC_SPARSE_ZLIB,
+    "auto": ENC_AUTO,
+}
+LOSSLESS_ENCODINGS = (ENC_RAW, ENC_SPARSE, ENC_ZLIB, ENC_SPARSE_ZLIB)
+
+DTYPE_CODES = {
+    torch.float32: 1,
+    torch.float16: 2,
+    torch.bfloat16: 3,
+    torch.int8: 4,
+    torch.uint8: 5,
+    torch.int32: 6,
+    torch.int64: 7,
+    torch.bool: 8,
+}
+CODE_DTYPES = {code: dtype for dtype, code in DTYPE_CODES.items()}
+
+# 원소 크기가 같은 정수 dtype, 비트 단위로 0을 판별해 -0.0도 손실 없이 보존
+_BIT_DTYPES = {1: torch.uint8, 2: torch.int16, 4: torch.int32, 8: torch.int64}
+
+_ZLIB_LEVEL = 1
+
+
+def encoding_name(encoding: int) -> str:
+    """인코딩 이름"""
+    for name, code in ENCODINGS.items():
+        if code == encoding:
+            return name
+    return f"unknown({encoding})"
+
+
+def _channel_view(tensor: torch.Tensor) -> torch.Tensor:
+    """채널 축(dim 1)을 앞으로 둔 (C, -1) 뷰"""
+    if tensor.dim() < 2:
+        return tensor.reshape(1, -1)
+    return tensor.transpose(0, 1).reshape(tensor.shape[1], -1)
+
+
+def _quantize_int8(tensor: torch.Tensor) -> Tuple[torch.Tensor, bytes]:
+    """채널별 affine int8 양자화 (0은 오차 없이 표현)"""
+    tensor = tensor.float()
+    channels = _channel_view(tensor)
+    low = channels.amin(dim=1).clamp(max=0)
+    high = channels.amax(dim=1).clamp(min=0)
+    scale = (high - low) / 255
+    scale = torch.where(scale > 0, scale, torch.ones_like(scale))
+    zero_point = (-128 - torch.round(low / scale)).clamp(-128, 127).to(torch.int32)
+
+    shape = [1] * tensor.dim()
+    if tensor.dim() >= 2:
+        shape[1] = -1
+    quantized = torch.round(tensor / scale.view(shape)) + zero_point.view(shape)
+    quantized = quantized.clamp(-128, 127).to(torch.int8)
+    meta = scale.numpy().astype(">f4").tobytes()
+    meta += zero_point.numpy().astype(">i4").tobytes()
+    return quantized, meta
+
+
+def _dequantize_int8(tensor: torch.Tensor, meta: bytes) -> torch.Tensor:
+    """채널별 affine int8 역양자화"""
+    channels = tensor.shape[1] if tensor.dim() >= 2 else 1
+    if len(meta) != channels * 8:
+        raise ValueError(f"int8 metadata size mismatch: {len(meta)} byte")
+    scale = torch.from_numpy(np.frombuffer(meta, ">f4", channels).astype(np.float32))
+    zero_point = np.frombuffer(meta, ">i4", channels, channels * 4)
+    zero_point = torch.from_numpy(zero_point.astype(np.float32))
+    shape = [1] * tensor.dim()
+    if tensor.dim() >= 2:
+        shape[1] = -1
+    return (tensor.float() - zero_point.view(shape)) * scale.view(shape)
+
+
+def _pack_shape(tensor: torch.Tensor) -> bytes:
+    """원본 dtype과 shape 메타데이터"""
+    shape = tuple(tensor.shape)
+    return struct.pack(
+        f"!BB{len(shape)}I", DTYPE_CODES[tensor.dtype], len(shape), *shape
+    )
+
+
+def _unpack_shape(meta: bytes) -> Tuple[torch.dtype, Tuple[int, ...]]:
+    """원본 dtype과 shape 복원"""
+    try:
+        dtype_code, ndim = struct.unpack_from("!BB", meta)
+        shape = struct.unpack_from(f"!{ndim}I", meta, 2)
+    except struct.error as e:
+        raise ValueError(f"invalid encoding metadata: {e}")
+    if dtype_code not in CODE_DTYPES:
+        raise ValueError(f"unsupported dtype code: {dtype_code}")
+    return CODE_DTYPES[dtype_code], shape
+
+
+def _to_bytes(tensor: torch.Tensor) -> np.ndarray:
+    """텐서의 uint8 배열 뷰"""
+    return tensor.contiguous().reshape(-1).view(torch.uint8).numpy()
+
+
+def _itemsize(dtype: torch.dtype) -> int:
+    """dtype 원소 하나의 바이트 수"""
+    return torch.empty(0, dtype=dtype).element_size()
+
+
+def _from_bytes(data: np.ndarray, dtype: torch.dtype) -> torch.Tensor:
+    """uint8 배열을 지정한 dtype의 1차원 텐서로 복사"""
+    if len(data) == 0:
+        return torch.empty(0, dtype=dtype)
+    return torch.from_numpy(data.copy()).view(dtype)
+
+
+def _nonzero_mask(tensor: torch.Tensor) -> torch.Tensor:
+    """비트 단위로 0이 아닌 원소 마스크 (1차원)"""
+    flat = tensor.contiguous().reshape(-1)
+    return flat.view(_BIT_DTYPES[flat.element_size()]) != 0
+
+
+def _encode_sparse(tensor: torch.Tensor) -> np.ndarray:
+    """0이 아닌 원소의 비트맵과 해당 값을 이어 붙인 바이트 배열"""
+    mask = _nonzero_mask(tensor)
+    bitmap = np.packbits(mask.numpy())
+    values = tensor.contiguous().reshape(-1)[mask]
+    return np.concatenate([bitmap, _to_bytes(values)])
+
+
+def _decode_sparse(
+    buffer: np.ndarray, dtype: torch.dtype, shape: Tuple[int, ...]
+) -> torch.Tensor:
+    """비트맵 + 값 바이트 배열을 원본 텐서로 복원"""
+    numel = int(np.prod(shape, dtype=np.int64))
+    bitmap_len = (numel + 7) // 8
+    if len(buffer) < bitmap_len:
+        raise ValueError(f"sparse bitmap too short: {len(buffer)} byte")
+    mask = torch.from_numpy(np.unpackbits(buffer[:bitmap_len], count=numel).view(bool))
+    if (len(buffer) - bitmap_len) % _itemsize(dtype):
+        raise ValueError(f"sparse value bytes not aligned: {len(buffer) - bitmap_len}")
+    values = _from_bytes(buffer[bitmap_len:], dtype)
+    if values.numel() != int(mask.sum()):
+        raise ValueError(f"sparse value count mismatch: {values.numel()}")
+    tensor = torch.zeros(numel, dtype=dtype)
+    tensor[mask] = values
+    return tensor.view(shape)
+
+
+def _encode(tensor: torch.Tensor, encoding: int) -> Tuple[torch.Tensor, bytes]:
+    """인코딩별 변환"""
+    if encoding == ENC_RAW:
+        return tensor, b""
+    if encoding == ENC_FP16:
+        return tensor.to(torch.float16), b""
+    if encoding == ENC_BF16:
+        return tensor.to(torch.bfloat16), b""
+    if encoding == ENC_INT8:
+        return _quantize_int8(tensor)
+    if encoding == ENC_SPARSE:
+        data = _encode_sparse(tensor)
+    elif encoding == ENC_ZLIB:
+        data = zlib.compress(_to_bytes(tensor), _ZLIB_LEVEL)
+    elif encoding == ENC_SPARSE_ZLIB:
+        data = zlib.compress(_encode_sparse(tensor), _ZLIB_LEVEL)
+    else:
+        raise ValueError(f"unsupported encoding: {encoding}")
+    wire = _from_bytes(np.frombuffer(data, np.uint8), torch.uint8)
+    return wire, _pack_shape(tensor)
+
+
+def _decode(tensor: torch.Tensor, meta: bytes, encoding: int) -> torch.Tensor:
+    """인코딩별 복원"""
+    if encoding == ENC_RAW:
+        return tensor
+    if encoding in (ENC_FP16, ENC_BF16):
+        return tensor.float()
+    if encoding == ENC_INT8:
+        return _dequantize_int8(tensor, meta)
+    if encoding not in (ENC_SPARSE, ENC_ZLIB, ENC_SPARSE_ZLIB):
+        raise ValueError(f"unsupported encoding: {encoding}")
+    dtype, shape = _unpack_shape(meta)
+    data = tensor.reshape(-1).numpy()
+    if encoding in (ENC_ZLIB, ENC_SPARSE_ZLIB):
+        try:
+            data = np.frombuffer(zlib.decompress(data), np.uint8)
+        except zlib.error as e:
+            raise ValueError(f"invalid compressed payload: {e}")
+    if encoding == ENC_ZLIB:
+        expected = int(np.prod(shape, dtype=np.int64)) * _itemsize(dtype)
+        if len(data) != expected:
+            raise ValueError(
+                f"decoded size mismatch: {len(data):,} byte (shape {shape} needs {expected:,} byte)"
+            )
+        return _from_bytes(data, dtype).view(shape)
+    return _decode_sparse(data, dtype, shape)
+
+
+def encode(
+    tensor: torch.Tensor, encoding: int, stats: Optional["CodecStats"] = None
+) -> Tuple[torch.Tensor, bytes]:
+    """부동소수점 텐서를 전송용 텐서와 메타데이터로 변환, stats를 지정하지 않으면 프로세스 통계에 기록"""
+    tensor = tensor.detach().cpu()
+    start_time = time.perf_counter()
+    wire, meta = _encode(tensor, encoding)
+    elapsed = time.perf_counter() - start_time
+    (_STATS if stats is None else stats).record_encode(
+        encoding,
+        tensor.numel() * tensor.element_size(),
+        wire.numel() * wire.element_size() + len(meta),
+        elapsed,
+    )
+    return wire, meta
+
+
+def decode(
+    tensor: torch.Tensor,
+    meta: bytes,
+    encoding: int,
+    stats: Optional["CodecStats"] = None,
+) -> torch.Tensor:
+    """수신한 텐서 복원 (무손실 인코딩은 원본 dtype, 손실 인코딩은 float32)"""
+    start_time = time.perf_counter()
+    result = _decode(tensor, bytes(meta), encoding)
+    elapsed = time.perf_counter() - start_time
+    (_STATS if stats is None else stats).record_decode(encoding, elapsed)
+    return result
+
+
+class CodecStats:
+    __encoded: Dict[int, List[float]]
+    __decoded: Dict[int, List[float]]
+
+    def __init__(self) -> None:
+        """인코딩별 절감 바이트와 인코딩/디코딩 시간 누적 통계"""
+        # 인코딩: [텐서 수, 원본 바이트, 전송 바이트, 인코딩 시간]
+        self.__encoded = defaultdict(lambda: [0, 0, 0, 0.0])
+        # 인코딩: [텐서 수, 디코딩 시간]
+        self.__decoded = defaultdict(lambda: [0, 0.0])
+
+    def record_encode(
+        self, encoding: int, raw_bytes: int, wire_bytes: int, seconds: float
+    ) -> None:
+        """인코딩 기록"""
+        row = self.__encoded[encoding]
+        row[0] += 1
+        row[1] += raw_bytes
+        row[2] += wire_bytes
+        row[3] += seconds
+
+    def record_decode(self, encoding: int, seconds: float) -> None:
+        """디코딩 기록"""
+        row = self.__decoded[encoding]
+        row[0] += 1
+        row[1] += seconds
+
+    def ratio(self, encoding: int, default: float = 1.0) -> float:
+        """전송 바이트 / 원본 바이트, 기록이 없으면 default"""
+        row = self.__encoded.get(encoding)
+        if row is None or row[1] == 0:
+            return default
+        return row[2] / row[1]
+
+    def seconds_per_byte(self, encoding: int) -> float:
+        """원본 1바이트당 인코딩 + 디코딩 시간"""
+        row = self.__encoded.get(encoding)
+        if row is None or row[1] == 0:
+            return 0.0
+        encode_time = row[3] / row[0]
+        decoded = self.__decoded.get(encoding)
+        # 같은 프로세스에서 디코딩하지 않으면 인코딩과 같은 시간으로 가정
+        decode_time = decoded[1] / decoded[0] if decoded else encode_time
+        return (encode_time + decode_time) / (row[1] / row[0])
+
+    def saved_bytes(self) -> int:
+        """인코딩으로 절감한 전체 바이트"""
+        return sum(row[1] - row[2] for row in self.__encoded.values())
+
+    def report(self) -> str:
+        """인코딩별 통계 문자열"""
+        lines = []
+        for encoding in sorted(set(self.__encoded) | set(self.__decoded)):
+            line = f"{encoding_name(encoding)}:"
+            count, raw_bytes, wire_bytes, seconds = self.__encoded.get(
+                encoding, [0, 0, 0, 0.0]
+            )
+            if count:
+                line += (
+                    f" encode {count} ({raw_bytes:,} -> {wire_bytes:,} byte,"
+                    f" {seconds / count * 1000:.3f} ms)"
+                )
+            decode_count, decode_seconds = self.__decoded.get(encoding, [0, 0.0])
+            if decode_count:
+                line += f" decode {decode_count} ({decode_seconds / decode_count * 1000:.3f} ms)"
+            lines.append(line)
+        lines.append(f"saved {self.saved_bytes():,} byte")
+        return "codec: " + ", ".join(lines)
+
+
+_STATS = CodecStats()
+
+
+def codec_stats() -> CodecStats:
+    """프로세스 전체 인코딩 통계"""
+    return _STATS
+
+
+class AdaptiveEncoder:
+    __link_bytes_per_sec: float
+    __candidates: Tuple[int, ...]
+    __stats: CodecStats
+
+    def __init__(
+        self,
+        link_mbps: float,
+        candidates: Sequence[int] = LOSSLESS_ENCODINGS,
+        stats: CodecStats = None,
+    ) -> None:
+        """측정한 희소도, 링크 대역폭, 인코딩 비용으로 텐서마다 예상 전송 시간이 가장 짧은 무손실 인코딩 선택"""
+        self.__link_bytes_per_sec = link_mbps * 1e6 / 8
+        self.__candidates = tuple(candidates)
+        self.__stats = stats or _STATS
+
+    def estimate(
+        self, raw_bytes: int, numel: int, density: float, encoding: int
+    ) -> float:
+        """인코딩 + 전송 + 디코딩 예상 시간 (초)"""
+        sparse_ratio = (numel / 8 + raw_bytes * density) / raw_bytes
+        if encoding == ENC_RAW:
+            ratio = 1.0
+        elif encoding == ENC_SPARSE:
+            ratio = sparse_ratio
+        elif encoding == ENC_ZLIB:
+            ratio = self.__stats.ratio(ENC_ZLIB, 0.8)
+        elif encoding == ENC_SPARSE_ZLIB:
+            ratio = self.__stats.ratio(ENC_SPARSE_ZLIB, 0.8 * sparse_ratio)
+        else:
+            raise ValueError(f"not a lossless encoding: {encoding}")
+        transfer_time = raw_bytes * ratio / self.__link_bytes_per_sec
+        return transfer_time + raw_bytes * self.__stats.seconds_per_byte(encoding)
+
+    def choose(self, tensor: torch.Tensor) -> int:
+        """예상 시간이 가장 짧은 인코딩"""
+        if not tensor.is_floating_point() or tensor.numel() == 0:
+            return ENC_RAW
+        tensor = tensor.detach().cpu()
+        numel = tensor.numel()
+        density = _nonzero_mask(tensor).sum().item() / numel
+        raw_bytes = numel * tensor.element_size()
+        return min(
+            self.__candidates,
+            key=lambda enc: self.estimate(raw_bytes, numel, density, enc),
+        )
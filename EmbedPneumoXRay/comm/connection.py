@@ -0,0 +1,335 @@
+import os
+import time
+import socket
+import itertools
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional, Tuple
+
+import torch
+
+from .protocol import FrameHeader, MSG_REQUEST, MSG_ERROR, MSG_PING
+from .protocol import STATUS_BUSY, STATUS_EXPIRED
+from .protocol import encode_tensor, recv_tensor, decode_error
+from .codec import ENC_RAW, ENC_AUTO, AdaptiveEncoder
+from .trace import TraceWriter
+from .shm import SharedTensorRing, is_local_address, local_socket_path
+
+__all__ = [
+    "ServerError",
+    "ServerBusyError",
+    "DeadlineExceededError",
+    "ResponseFuture",
+    "ServerConnection",
+]
+
+
+class ServerError(RuntimeError):
+    """서버가 반환한 오류"""
+
+
+class ServerBusyError(ServerError):
+    retry_after: float
+
+    def __init__(self, message: str, retry_after: float) -> None:
+        """서버 과부하로 거절된 요청 (retry_after 초 이후 재시도)"""
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class DeadlineExceededError(ServerError):
+    """요청 기한 안에 처리할 수 없어 서버가 실행하지 않은 요청"""
+
+
+class ResponseFuture(Future):
+    header: Optional[FrameHeader] = None  # 응답 프레임 헤더 (서버 대기 시간 등)
+
+
+class ServerConnection:
+    __ip: str
+    __port: int
+    __timeout: float
+    __encoding: int
+    __selector: AdaptiveEncoder
+    __trace: Optional[TraceWriter]
+    __stream: int
+    __client_id: int
+    __local: bool
+    __ring: Optional[SharedTensorRing]
+    __slots: Dict[int, int]
+    __socket: Optional[socket.socket]
+    __reader: Optional[threading.Thread]
+    __pending: Dict[int, ResponseFuture]
+    __request_ids: itertools.count
+    __lock: threading.Lock
+    __send_lock: threading.Lock
+    __closed: bool
+    __queue_depth: int
+    __log: Callable[[str], None]
+
+    def __init__(
+        self,
+        ip: str,
+        port: int,
+        timeout: float = 3.0,
+        encoding: int = ENC_RAW,
+        log: Callable[[str], None] = print,
+        link_mbps: float = 100.0,
+        trace: Optional[TraceWriter] = None,
+        local: bool = True,
+        stream: int = 0,
+        client_id: int = 0,
+    ) -> None:
+        """AI 연산 서버와의 지속 연결 (요청 파이프라이닝 및 자동 재접속)
+
+        encoding이 ENC_AUTO이면 link_mbps와 측정한 희소도로 요청마다 무손실 인코딩을 선택합니다.
+        trace를 지정하면 요청과 응답을 stream 번호로 기록합니다.
+        client_id는 서버 공정 분배 단위이며, 0이면 서버가 접속마다 따로 분배합니다.
+        local이 True이고 서버가 같은 호스트이면 Unix 소켓으로 접속하고 요청 텐서는 공유 메모리로 전달합니다.
+        """
+        self.__ip = ip
+        self.__port = port
+        self.__timeout = timeout
+        self.__encoding = encoding
+        self.__selector = AdaptiveEncoder(link_mbps)
+        self.__trace = trace
+        self.__stream = stream
+        self.__client_id = client_id
+        self.__local = local and is_local_address(ip)
+        self.__ring = None
+        self.__slots = {}
+        self.__socket = None
+        self.__reader = None
+        self.__pending = {}
+        self.__request_ids = itertools.count(1)
+        self.__lock = threading.Lock()
+        self.__send_lock = threading.Lock()
+        self.__closed = False
+        self.__queue_depth = 0
+        self.__log = log
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        """서버 주소"""
+        return self.__ip, self.__port
+
+    @property
+    def connected(self) -> bool:
+        """서버 접속 여부"""
+        return self.__socket is not None
+
+    @property
+    def transport(self) -> str:
+        """현재 전송 방식 (tcp, unix+shm), 접속하지 않았으면 빈 문자열"""
+        if self.__socket is None:
+            return ""
+        return "unix+shm" if self.__socket.family == socket.AF_UNIX else "tcp"
+
+    @property
+    def outstanding(self) -> int:
+        """응답 대기 중인 요청 수"""
+        return len(self.__pending)
+
+    @property
+    def server_queue_depth(self) -> int:
+        """마지막 응답에서 서버가 보고한 대기열 길이"""
+        return self.__queue_depth
+
+    def connect(self) -> bool:
+        """서버 접속, 이미 접속되어 있으면 유지"""
+        with self.__lock:
+            if self.__closed:
+                return False
+            if self.__socket is not None:
+                return True
+            sock = self._connect_local()
+            if sock is None:
+                try:
+                    sock = socket.create_connection(self.address, self.__timeout)
+                except OSError as e:
+                    self.__log(f"connect error: {self.__ip}:{self.__port} {e}")
+                    return False
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.settimeout(None)
+            self.__socket = sock
+            self.__reader = threading.Thread(
+                target=self._read_loop, args=(sock,), daemon=True
+            )
+            self.__reader.start()
+        self.__log(f"connected to {self.__ip}:{self.__port} ({self.transport})")
+        return True
+
+    def _connect_local(self) -> Optional[socket.socket]:
+        """같은 호스트 서버의 Unix 소켓 접속 및 공유 메모리 준비, 실패하면 None"""
+        path = local_socket_path(self.__port)
+        if not self.__local or not os.path.exists(path):
+            return None
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.__timeout)
+        try:
+            sock.connect(path)
+            if self.__ring is None:
+                self.__ring = SharedTensorRing()
+        except OSError as e:
+            self.__log(f"local connect error: {path} {e}")
+            sock.close()
+            return None
+        return sock
+
+    def submit(
+        self,
+        tensor: torch.Tensor,
+        encoding: Optional[int] = None,
+        kind: int = MSG_REQUEST,
+        deadline_ms: int = 0,
+    ) -> Tuple[int, ResponseFuture]:
+        """텐서 요청 전송, 요청 ID와 응답 Future 반환 (encoding 생략 시 기본 인코딩)
+
+        deadline_ms는 서버 도착 후 응답 기한이며, 기한 안에 처리할 수 없는 요청은
+        서버가 실행하지 않고 DeadlineExceededError로 바로 실패시킵니다.
+        """
+        if encoding is None:
+            encoding = self.__encoding
+        if encoding == ENC_AUTO:
+            encoding = self.__selector.choose(tensor)
+        request_id = next(self.__request_ids)
+        future = ResponseFuture()
+        self.connect()
+        with self.__lock:
+            sock = self.__socket
+        if sock is None:
+            future.set_exception(
+                ConnectionError(f"not connected: {self.__ip}:{self.__port}")
+            )
+            return request_id, future
+        fields = {"deadline_ms": deadline_ms, "client_id": self.__client_id}
+        # 프레임을 먼저 만들어 인코딩 오류(지원하지 않는 dtype 등)는 응답 대기 목록에 남기지 않음
+        shared = None
+        try:
+            if kind == MSG_REQUEST and sock.family == socket.AF_UNIX:
+                shared = self.__ring.pack(tensor, request_id, **fields)
+            if shared is None:
+                header, meta, payload = encode_tensor(
+                    tensor, request_id, kind, encoding, **fields
+                )
+        except Exception as e:
+            future.set_exception(e)
+            return request_id, future
+        with self.__lock:
+            registered = self.__socket is sock
+            if registered:
+                self.__pending[request_id] = future
+                if shared is not None:
+                    self.__slots[request_id] = shared[0]
+        if not registered:
+            if shared is not None:
+                self.__ring.release(shared[0])
+            future.set_exception(
+                ConnectionError(f"connection lost: {self.__ip}:{self.__port}")
+            )
+            return request_id, future
+        if self.__trace is not None:
+            self.__trace.record(
+                kind, request_id, tensor, self.__stream, encoding=encoding, **fields
+            )
+        try:
+            with self.__send_lock:
+                if shared is not None:
+                    sock.sendall(shared[1])
+                else:
+                    sock.sendall(header + meta)
+                    sock.sendall(payload)
+        except OSError as e:
+            self._disconnect(sock, e)
+        return request_id, future
+
+    def request(self, tensor: torch.Tensor, timeout: float = None) -> torch.Tensor:
+        """텐서 요청 후 응답 대기"""
+        _, future = self.submit(tensor)
+        return future.result(timeout)
+
+    def ping(self, payload_bytes: int = 0, timeout: float = None) -> float:
+        """payload_bytes 크기의 측정용 프레임 왕복 시간 (초)"""
+        tensor = torch.zeros(payload_bytes, dtype=torch.uint8)
+        start_time = time.perf_counter()
+        _, future = self.submit(tensor, ENC_RAW, MSG_PING)
+        future.result(timeout)
+        return time.perf_counter() - start_time
+
+    def close(self) -> None:
+        """연결 종료, 대기 중인 요청은 실패 처리"""
+        with self.__lock:
+            self.__closed = True
+            sock = self.__socket
+        if sock is not None:
+            self._disconnect(sock, ConnectionError("connection closed"))
+        if self.__ring is not None:
+            self.__ring.close()
+
+    def _read_loop(self, sock: socket.socket) -> None:
+        """응답 수신 루프, 요청 ID로 Future와 매칭"""
+        try:
+            while True:
+                header, tensor = recv_tensor(sock)
+                if header.kind == MSG_ERROR and header.request_id == 0:
+                    # 특정 요청이 아닌 접속 단위 오류 (접속 거절 등)
+                    raise self._server_error(header, tensor)
+                if self.__trace is not None:
+                    self.__trace.record(
+                        header.kind,
+                        header.request_id,
+                        tensor,
+                        self.__stream,
+                        encoding=header.encoding,
+                        status=header.status,
+                    )
+                future = self.__pending.pop(header.request_id, None)
+                slot = self.__slots.pop(header.request_id, None)
+                if slot is not None:
+                    # 서버는 응답 전에 요청 텐서를 배치로 복사했으므로 슬롯 재사용 가능
+                    self.__ring.release(slot)
+                if future is None:
+                    self.__log(f"unknown response: #{header.request_id}")
+                    continue
+                self.__queue_depth = header.queue_depth
+                future.header = header
+                if header.kind == MSG_ERROR:
+                    future.set_exception(self._server_error(header, tensor))
+                else:
+                    future.set_result(tensor)
+        except Exception as e:
+            self._disconnect(sock, e)
+
+    def _server_error(self, header: FrameHeader, tensor: torch.Tensor) -> ServerError:
+        """오류 프레임을 예외로 변환"""
+        message = decode_error(tensor)
+        if header.status == STATUS_BUSY:
+            return ServerBusyError(message, header.retry_after_ms / 1000)
+        if header.status == STATUS_EXPIRED:
+            return DeadlineExceededError(message)
+        return ServerError(message)
+
+    def _disconnect(self, sock: socket.socket, error: Exception) -> None:
+        """소켓 정리 후 대기 중인 요청 실패 처리"""
+        with self.__lock:
+            if self.__socket is not sock:
+                return
+            self.__socket = None
+            pending = self.__pending
+            self.__pending = {}
+            slots = self.__slots
+            self.__slots = {}
+        for slot in slots.values():
+            self.__ring.release(slot)
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        sock.close()
+        if not self.__closed:
+            self.__log(f"disconnected from {self.__ip}:{self.__port}: {error}")
+        if not isinstance(error, ServerError):
+            error = ConnectionError(str(error))
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(error)
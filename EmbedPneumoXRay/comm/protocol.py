@@ -0,0 +1,343 @@
+import math
+import socket
+import asyncio
+import struct
+from typing import NamedTuple, Optional, Tuple
+
+import torch
+
+from . import codec
+
+__all__ = [
+    "PROTOCOL_VERSION",
+    "MSG_REQUEST",
+    "MSG_RESPONSE",
+    "MSG_ERROR",
+    "MSG_PING",
+    "STATUS_OK",
+    "STATUS_BUSY",
+    "HEADER_SIZE",
+    "ProtocolError",
+    "FrameHeader",
+    "pack_header",
+    "unpack_header",
+    "encode_tensor",
+    "decode_tensor",
+    "decode_error",
+    "send_tensor",
+    "send_error",
+    "recv_frame",
+    "recv_tensor",
+    "read_frame",
+    "read_tensor",
+    "write_tensor",
+    "write_error",
+]
+
+PROTOCOL_MAGIC = b"TW"
+PROTOCOL_VERSION = 4
+MAX_NDIM = 8
+MAX_PAYLOAD = 256 * 1024 * 1024  # 256 MiB
+
+# 메시지 종류
+MSG_REQUEST = 1
+MSG_RESPONSE = 2
+MSG_ERROR = 3
+MSG_PING = 4  # 연결 측정용, 서버는 페이로드를 버리고 빈 응답을 보냄
+
+# 응답 상태
+STATUS_OK = 0
+STATUS_BUSY = 1  # 서버 과부하로 거절, retry_after_ms 이후 재시도
+STATUS_EXPIRED = 2  # 요청 기한 안에 처리할 수 없어 실행하지 않음
+
+# 헤더: magic, version, kind, dtype, ndim, encoding, status,
+#       request_id, meta_len, payload_len, queue_depth, retry_after_ms,
+#       queue_us, service_us, deadline_ms, client_id, shape[MAX_NDIM]
+_HEADER = struct.Struct(f"!2sBBBBBBQIQHHIIII{MAX_NDIM}I")
+HEADER_SIZE = _HEADER.size
+
+_DTYPE_CODES = codec.DTYPE_CODES
+_CODE_DTYPES = codec.CODE_DTYPES
+
+
+class ProtocolError(ValueError):
+    """프레임 형식 오류"""
+
+
+class FrameHeader(NamedTuple):
+    kind: int
+    request_id: int
+    dtype: torch.dtype
+    shape: Tuple[int, ...]
+    payload_len: int
+    meta_len: int = 0
+    encoding: int = 0
+    status: int = 0
+    queue_depth: int = 0
+    retry_after_ms: int = 0
+    queue_us: int = 0  # 응답: 서버 대기열에서 기다린 시간 (us)
+    service_us: int = 0  # 응답: 요청이 포함된 배치의 실행 시간 (us)
+    deadline_ms: int = 0  # 요청: 서버 도착 후 응답 기한 (ms), 0이면 기한 없음
+    client_id: int = 0  # 요청: 공정 분배 단위 클라이언트 ID, 0이면 접속 단위
+
+
+def pack_header(header: FrameHeader) -> bytes:
+    """프레임 헤더 직렬화"""
+    if len(header.shape) > MAX_NDIM:
+        raise ProtocolError(f"too many dimensions: {len(header.shape)}")
+    if header.dtype not in _DTYPE_CODES:
+        raise ProtocolError(f"unsupported dtype: {header.dtype}")
+    shape = list(header.shape) + [0] * (MAX_NDIM - len(header.shape))
+    return _HEADER.pack(
+        PROTOCOL_MAGIC,
+        PROTOCOL_VERSION,
+        header.kind,
+        _DTYPE_CODES[header.dtype],
+        len(header.shape),
+        header.encoding,
+        header.status,
+        header.request_id,
+        header.meta_len,
+        header.payload_len,
+        min(header.queue_depth, 0xFFFF),
+        min(header.retry_after_ms, 0xFFFF),
+        min(header.queue_us, 0xFFFFFFFF),
+        min(header.service_us, 0xFFFFFFFF),
+        min(header.deadline_ms, 0xFFFFFFFF),
+        header.client_id & 0xFFFFFFFF,
+        *shape,
+    )
+
+
+def unpack_header(buffer: bytes) -> FrameHeader:
+    """프레임 헤더 역직렬화"""
+    if len(buffer) != HEADER_SIZE:
+        raise ProtocolError(f"invalid header size: {len(buffer)}")
+    (
+        magic,
+        version,
+        kind,
+        dtype_code,
+        ndim,
+        encoding,
+        status,
+        request_id,
+        meta_len,
+        payload_len,
+        queue_depth,
+        retry_after_ms,
+        queue_us,
+        service_us,
+        deadline_ms,
+        client_id,
+        *shape,
+    ) = _HEADER.unpack(buffer)
+    if magic != PROTOCOL_MAGIC:
+        raise ProtocolError(f"invalid magic: {magic!r}")
+    if version != PROTOCOL_VERSION:
+        raise ProtocolError(f"unsupported protocol version: {version}")
+    if dtype_code not in _CODE_DTYPES:
+        raise ProtocolError(f"unsupported dtype code: {dtype_code}")
+    if ndim > MAX_NDIM:
+        raise ProtocolError(f"too many dimensions: {ndim}")
+    if payload_len + meta_len > MAX_PAYLOAD:
+        raise ProtocolError(f"payload too large: {payload_len + meta_len:,} byte")
+    return FrameHeader(
+        kind=kind,
+        request_id=request_id,
+        dtype=_CODE_DTYPES[dtype_code],
+        shape=tuple(shape[:ndim]),
+        payload_len=payload_len,
+        meta_len=meta_len,
+        encoding=encoding,
+        status=status,
+        queue_depth=queue_depth,
+        retry_after_ms=retry_after_ms,
+        queue_us=queue_us,
+        service_us=service_us,
+        deadline_ms=deadline_ms,
+        client_id=client_id,
+    )
+
+
+def encode_tensor(
+    tensor: torch.Tensor,
+    request_id: int,
+    kind: int = MSG_REQUEST,
+    encoding: int = codec.ENC_RAW,
+    stats: Optional[codec.CodecStats] = None,
+    **fields,
+) -> Tuple[bytes, bytes, memoryview]:
+    """텐서를 헤더, 메타데이터, 원시 바이트 버퍼로 변환
+
+    encoding은 부동소수점 텐서에만 적용되며, fields는 status 등 추가 헤더 필드입니다.
+    stats를 지정하면 프로세스 전체 인코딩 통계 대신 stats에 기록합니다.
+    """
+    tensor = tensor.detach().cpu()
+    if not tensor.is_floating_point():
+        encoding = codec.ENC_RAW
+    tensor, meta = codec.encode(tensor, encoding, stats)
+    tensor = tensor.contiguous()
+    payload = memoryview(tensor.reshape(-1).view(torch.uint8).numpy())
+    header = FrameHeader(
+        kind=kind,
+        request_id=request_id,
+        dtype=tensor.dtype,
+        shape=tuple(tensor.shape),
+        payload_len=payload.nbytes,
+        meta_len=len(meta),
+        encoding=encoding,
+        **fields,
+    )
+    return pack_header(header), meta, payload
+
+
+def decode_tensor(
+    header: FrameHeader,
+    payload: bytearray,
+    meta: bytes = b"",
+    stats: Optional[codec.CodecStats] = None,
+) -> torch.Tensor:
+    """원시 바이트 버퍼를 텐서로 변환, 인코딩하지 않은 텐서는 복사하지 않음
+
+    헤더의 shape/dtype 크기와 페이로드 길이가 다르면 ProtocolError가 발생합니다.
+    """
+    itemsize = torch.empty(0, dtype=header.dtype).element_size()
+    expected = math.prod(header.shape) * itemsize
+    if expected != header.payload_len or len(payload) != header.payload_len:
+        raise ProtocolError(
+            f"payload size mismatch: {len(payload):,} byte"
+            f" (shape {tuple(header.shape)} needs {expected:,} byte)"
+        )
+    if header.payload_len == 0:
+        tensor = torch.empty(header.shape, dtype=header.dtype)
+    else:
+        tensor = torch.frombuffer(payload, dtype=header.dtype).view(header.shape)
+    if header.encoding == codec.ENC_RAW:
+        return tensor
+    try:
+        return codec.decode(tensor, meta, header.encoding, stats)
+    except ValueError as e:
+        raise ProtocolError(str(e))
+
+
+def decode_error(payload: torch.Tensor) -> str:
+    """오류 프레임의 메시지 반환"""
+    return bytes(payload.numpy()).decode("utf-8")
+
+
+def _error_tensor(message: str) -> torch.Tensor:
+    """오류 메시지를 uint8 텐서로 변환"""
+    return torch.tensor(list(message.encode("utf-8")), dtype=torch.uint8)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytearray:
+    """지정한 크기만큼 수신"""
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:], size - received)
+        if count == 0:
+            raise ConnectionError("connection closed by peer")
+        received += count
+    return buffer
+
+
+def send_tensor(
+    sock: socket.socket,
+    tensor: torch.Tensor,
+    request_id: int,
+    kind: int = MSG_REQUEST,
+    encoding: int = codec.ENC_RAW,
+    **fields,
+) -> int:
+    """텐서 프레임 전송, 전송한 바이트 수 반환"""
+    header, meta, payload = encode_tensor(tensor, request_id, kind, encoding, **fields)
+    sock.sendall(header + meta)
+    sock.sendall(payload)
+    return len(header) + len(meta) + payload.nbytes
+
+
+def send_error(sock: socket.socket, request_id: int, message: str, **fields) -> int:
+    """오류 프레임 전송"""
+    return send_tensor(sock, _error_tensor(message), request_id, MSG_ERROR, **fields)
+
+
+def recv_frame(sock: socket.socket) -> Tuple[FrameHeader, bytearray, bytearray]:
+    """프레임 수신: 헤더, 메타데이터, 페이로드"""
+    header = unpack_header(bytes(_recv_exact(sock, HEADER_SIZE)))
+    meta = _recv_exact(sock, header.meta_len)
+    payload = _recv_exact(sock, header.payload_len)
+    return header, meta, payload
+
+
+def recv_tensor(sock: socket.socket) -> Tuple[FrameHeader, torch.Tensor]:
+    """텐서 프레임 수신"""
+    header, meta, payload = recv_frame(sock)
+    return header, decode_tensor(header, payload, meta)
+
+
+async def _read_exact(reader: asyncio.StreamReader, size: int) -> bytearray:
+    """지정한 크기만큼 비동기 수신"""
+    try:
+        return bytearray(await reader.readexactly(size))
+    except asyncio.IncompleteReadError:
+        raise ConnectionError("connection closed by peer")
+
+
+async def _read_body(
+    reader: asyncio.StreamReader, header: FrameHeader
+) -> Tuple[bytearray, bytearray]:
+    """메타데이터와 페이로드 비동기 수신"""
+    meta = await _read_exact(reader, header.meta_len)
+    payload = await _read_exact(reader, header.payload_len)
+    return meta, payload
+
+
+async def read_frame(
+    reader: asyncio.StreamReader,
+    idle_timeout: Optional[float] = None,
+    read_timeout: Optional[float] = None,
+) -> Tuple[FrameHeader, bytearray, bytearray]:
+    """프레임 비동기 수신: 헤더, 메타데이터, 페이로드
+
+    idle_timeout은 다음 헤더를 기다리는 시간, read_timeout은 헤더 이후 본문 수신 기한이며
+    초과하면 asyncio.TimeoutError가 발생합니다.
+    """
+    buffer = await asyncio.wait_for(_read_exact(reader, HEADER_SIZE), idle_timeout)
+    header = unpack_header(bytes(buffer))
+    meta, payload = await asyncio.wait_for(_read_body(reader, header), read_timeout)
+    return header, meta, payload
+
+
+async def read_tensor(
+    reader: asyncio.StreamReader,
+    idle_timeout: Optional[float] = None,
+    read_timeout: Optional[float] = None,
+) -> Tuple[FrameHeader, torch.Tensor]:
+    """텐서 프레임 비동기 수신"""
+    header, meta, payload = await read_frame(reader, idle_timeout, read_timeout)
+    return header, decode_tensor(header, payload, meta)
+
+
+def write_tensor(
+    writer: asyncio.StreamWriter,
+    tensor: torch.Tensor,
+    request_id: int,
+    kind: int = MSG_REQUEST,
+    encoding: int = codec.ENC_RAW,
+    **fields,
+) -> int:
+    """텐서 프레임을 쓰기 버퍼에 등록, 바이트 수 반환 (drain은 호출자가 수행)"""
+    header, meta, payload = encode_tensor(tensor, request_id, kind, encoding, **fields)
+    writer.write(header + meta)
+    writer.write(payload)
+    return len(header) + len(meta) + payload.nbytes
+
+
+def write_error(
+    writer: asyncio.StreamWriter, request_id: int, message: str, **fields
+) -> int:
+    """오류 프레임을 쓰기 버퍼에 등록"""
+    return write_tensor(writer, _error_tensor(message), request_id, MSG_ERROR, **fields)
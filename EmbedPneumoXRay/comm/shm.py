@@ -0,0 +1,163 @@
+import os
+import mmap
+import socket
+import struct
+import tempfile
+import threading
+import ipaddress
+from typing import Dict, List, Optional, Tuple
+
+import torch
+
+from .codec import ENC_SHM
+from .protocol import MSG_REQUEST, FrameHeader, ProtocolError, pack_header
+
+__all__ = [
+    "local_socket_path",
+    "is_local_address",
+    "SharedTensorRing",
+    "SharedTensorReader",
+]
+
+SHM_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+_PREFIX = "tdistwork-"
+
+# ENC_SHM 메타데이터: 슬롯 오프셋, 바이트 수, 이어서 공유 메모리 파일 경로
+_SLOT_META = struct.Struct("!QQ")
+
+
+def local_socket_path(port: int) -> str:
+    """같은 호스트 클라이언트용 Unix 소켓 경로 (TCP 포트별)"""
+    return os.path.join(tempfile.gettempdir(), f"{_PREFIX}{port}.sock")
+
+
+def is_local_address(ip: str) -> bool:
+    """서버 주소가 이 호스트인지 여부 (Unix 소켓을 지원하는 OS만)"""
+    if not hasattr(socket, "AF_UNIX"):
+        return False
+    try:
+        address = socket.gethostbyname(ip)
+        if ipaddress.ip_address(address).is_loopback:
+            return True
+        return address in socket.gethostbyname_ex(socket.gethostname())[2]
+    except (OSError, ValueError):
+        return False
+
+
+class SharedTensorRing:
+    __path: str
+    __map: mmap.mmap
+    __slot_bytes: int
+    __free: List[int]
+    __lock: threading.Lock
+
+    def __init__(self, slots: int = 8, slot_bytes: int = 8 * 1024 * 1024) -> None:
+        """클라이언트의 요청 텐서 슬롯 (공유 메모리 파일), 슬롯은 응답을 받을 때까지 점유"""
+        fd, self.__path = tempfile.mkstemp(prefix=_PREFIX, suffix=".shm", dir=SHM_DIR)
+        try:
+            os.ftruncate(fd, slots * slot_bytes)
+            self.__map = mmap.mmap(fd, slots * slot_bytes)
+        finally:
+            os.close(fd)
+        self.__slot_bytes = slot_bytes
+        self.__free = list(range(slots))
+        self.__lock = threading.Lock()
+
+    def pack(
+        self, tensor: torch.Tensor, request_id: int, **fields
+    ) -> Optional[Tuple[int, bytes]]:
+        """텐서를 빈 슬롯에 복사하고 (슬롯, 헤더 + 메타데이터) 반환
+
+        슬롯보다 크거나 빈 슬롯이 없으면 None을 반환하며, 이때는 소켓으로 전송합니다.
+        fields는 deadline_ms 등 추가 헤더 필드입니다.
+        """
+        tensor = tensor.detach().cpu().contiguous()
+        nbytes = tensor.numel() * tensor.element_size()
+        if nbytes == 0 or nbytes > self.__slot_bytes:
+            return None
+        path = self.__path.encode()
+        # 헤더를 먼저 만들어 지원하지 않는 dtype(ProtocolError)이면 슬롯을 잡지 않음
+        header = FrameHeader(
+            kind=MSG_REQUEST,
+            request_id=request_id,
+            dtype=tensor.dtype,
+            shape=tuple(tensor.shape),
+            payload_len=0,
+            meta_len=_SLOT_META.size + len(path),
+            encoding=ENC_SHM,
+            **fields,
+        )
+        frame = pack_header(header)
+        with self.__lock:
+            if not self.__free:
+                return None
+            slot = self.__free.pop()
+        offset = slot * self.__slot_bytes
+        target = torch.frombuffer(
+            self.__map, dtype=torch.uint8, count=nbytes, offset=offset
+        )
+        target.copy_(tensor.reshape(-1).view(torch.uint8))
+        del target
+        return slot, frame + _SLOT_META.pack(offset, nbytes) + path
+
+    def release(self, slot: int) -> None:
+        """슬롯 반환"""
+        with self.__lock:
+            self.__free.append(slot)
+
+    def close(self) -> None:
+        """공유 메모리 해제 및 파일 삭제"""
+        if self.__map.closed:
+            return
+        self.__map.close()
+        try:
+            os.unlink(self.__path)
+        except OSError:
+            pass
+
+
+class SharedTensorReader:
+    __maps: Dict[str, mmap.mmap]
+
+    def __init__(self) -> None:
+        """서버 측 공유 메모리 요청 읽기 (접속별), 텐서는 복사하지 않고 슬롯을 그대로 참조"""
+        self.__maps = {}
+
+    def tensor(self, header: FrameHeader, meta: bytes) -> torch.Tensor:
+        """ENC_SHM 프레임이 가리키는 슬롯의 텐서 (클라이언트가 응답을 받을 때까지 유효)"""
+        if len(meta) <= _SLOT_META.size:
+            raise ProtocolError("invalid shared memory metadata")
+        offset, nbytes = _SLOT_META.unpack_from(meta)
+        path = bytes(meta[_SLOT_META.size :]).decode()
+        name = os.path.basename(path)
+        if os.path.dirname(path) != SHM_DIR or not name.startswith(_PREFIX):
+            raise ProtocolError(f"invalid shared memory path: {path}")
+        numel = 1
+        for size in header.shape:
+            numel *= size
+        itemsize = torch.empty(0, dtype=header.dtype).element_size()
+        if numel == 0 or numel * itemsize != nbytes:
+            raise ProtocolError(f"shared memory size mismatch: {nbytes:,} byte")
+        shared = self.__maps.get(path)
+        if shared is None:
+            try:
+                with open(path, "r+b") as f:
+                    shared = mmap.mmap(f.fileno(), 0)
+            except (OSError, ValueError) as e:
+                raise ProtocolError(f"cannot open shared memory: {path} {e}")
+            self.__maps[path] = shared
+        if offset + nbytes > len(shared):
+            raise ProtocolError(f"shared memory out of range: {offset + nbytes:,} byte")
+        tensor = torch.frombuffer(
+            shared, dtype=header.dtype, count=numel, offset=offset
+        )
+        return tensor.view(header.shape)
+
+    def close(self) -> None:
+        """매핑 해제, 아직 참조 중인 텐서가 있으면 해당 텐서가 해제될 때 정리"""
+        for shared in self.__maps.values():
+            try:
+                shared.close()
+            except BufferError:
+                pass
+        self.__maps = {}
@@ -0,0 +1,153 @@
+import time
+import queue
+import struct
+import hashlib
+import threading
+from typing import BinaryIO, Iterator, NamedTuple, Optional
+
+import torch
+
+from . import codec
+from .protocol import HEADER_SIZE, FrameHeader, ProtocolError
+from .protocol import encode_tensor, decode_tensor, unpack_header
+
+__all__ = ["TraceRecord", "TraceWriter", "read_trace", "tensor_digest"]
+
+TRACE_MAGIC = b"TWTRACE1"
+
+# 레코드: 기록 시각(초), 스트림(접속) 번호, 원래 전송 인코딩, 페이로드 포함 여부,
+#         원본 텐서 digest, 이어서 프로토콜 프레임(헤더 + 메타데이터 [+ 페이로드])
+_RECORD = struct.Struct("!dIB?16s")
+
+
+class TraceRecord(NamedTuple):
+    time: float  # 기록 시작 기준 시각 (초)
+    stream: int  # 접속 번호, 같은 스트림의 요청은 같은 연결로 재현
+    header: FrameHeader  # 기록된 프레임 헤더 (kind, request_id, dtype, shape)
+    encoding: int  # 원래 전송 인코딩
+    digest: bytes  # 원본 텐서 바이트의 blake2b digest
+    tensor: Optional[torch.Tensor]  # 페이로드를 저장하지 않았으면 None
+
+
+def tensor_digest(tensor: torch.Tensor) -> bytes:
+    """텐서 dtype, shape, 바이트의 16바이트 blake2b digest"""
+    tensor = tensor.detach().cpu().contiguous()
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{tensor.dtype}{tuple(tensor.shape)}".encode())
+    digest.update(tensor.reshape(-1).view(torch.uint8).numpy())
+    return digest.digest()
+
+
+class TraceWriter:
+    __file: BinaryIO
+    __store_payload: bool
+    __encoding: int
+    __stats: codec.CodecStats
+    __start: float
+    __queue: "queue.Queue[Optional[tuple]]"
+    __thread: threading.Thread
+    __count: int
+
+    def __init__(
+        self,
+        path: str,
+        store_payload: bool = True,
+        encoding: int = codec.ENC_SPARSE_ZLIB,
+    ) -> None:
+        """요청/응답 트레이스 기록기, 인코딩과 파일 쓰기는 별도 스레드에서 수행
+
+        store_payload가 False이면 텐서 대신 digest와 shape만 기록합니다.
+        """
+        self.__file = open(path, "wb")
+        self.__file.write(TRACE_MAGIC)
+        self.__store_payload = store_payload
+        self.__encoding = encoding
+        # 트레이스 저장용 인코딩은 전송이 아니므로 프로세스 전체 통계(절감 바이트, 자동 인코딩 선택)와 분리
+        self.__stats = codec.CodecStats()
+        self.__start = time.monotonic()
+        self.__queue = queue.Queue()
+        self.__count = 0
+        self.__thread = threading.Thread(target=self._write_loop, daemon=True)
+        self.__thread.start()
+
+    @property
+    def count(self) -> int:
+        """기록한 레코드 수"""
+        return self.__count
+
+    def record(
+        self,
+        kind: int,
+        request_id: int,
+        tensor: torch.Tensor,
+        stream: int = 0,
+        encoding: int = codec.ENC_RAW,
+        **fields,
+    ) -> None:
+        """프레임 하나 기록 (호출 스레드를 막지 않음)"""
+        elapsed = time.monotonic() - self.__start
+        item = (elapsed, stream, kind, request_id, tensor, encoding, fields)
+        self.__queue.put(item)
+
+    def close(self) -> None:
+        """남은 레코드를 기록하고 파일 닫기"""
+        if self.__file.closed:
+            return
+        self.__queue.put(None)
+        self.__thread.join()
+        self.__file.close()
+
+    def _write_loop(self) -> None:
+        """레코드 직렬화 및 파일 쓰기"""
+        while True:
+            item = self.__queue.get()
+            if item is None:
+                break
+            elapsed, stream, kind, request_id, tensor, encoding, fields = item
+            tensor = tensor.detach().cpu()
+            # 페이로드를 저장하지 않으면 헤더의 shape만 필요하므로 인코딩하지 않음
+            storage = self.__encoding if self.__store_payload else codec.ENC_RAW
+            header, meta, payload = encode_tensor(
+                tensor, request_id, kind, storage, self.__stats, **fields
+            )
+            record = _RECORD.pack(
+                elapsed, stream, encoding, self.__store_payload, tensor_digest(tensor)
+            )
+            self.__file.write(record + header + meta)
+            if self.__store_payload:
+                self.__file.write(payload)
+            self.__count += 1
+        self.__file.flush()
+
+
+def _read_exact(f: BinaryIO, size: int) -> bytes:
+    """지정한 크기만큼 읽기, 파일이 끝나면 ProtocolError"""
+    data = f.read(size)
+    if len(data) != size:
+        raise ProtocolError("truncated trace record")
+    return data
+
+
+def read_trace(path: str) -> Iterator[TraceRecord]:
+    """트레이스 파일의 레코드를 기록 순서대로 반환"""
+    stats = codec.CodecStats()  # 프로세스 전체 디코딩 통계에 섞이지 않도록 분리
+    with open(path, "rb") as f:
+        if f.read(len(TRACE_MAGIC)) != TRACE_MAGIC:
+            raise ProtocolError(f"not a trace file: {path}")
+        while True:
+            data = f.read(_RECORD.size)
+            if not data:
+                break
+            if len(data) != _RECORD.size:
+                raise ProtocolError("truncated trace record")
+            elapsed, stream, encoding, has_payload, digest = _RECORD.unpack(data)
+            header = unpack_header(_read_exact(f, HEADER_SIZE))
+            meta = _read_exact(f, header.meta_len)
+            tensor = None
+            if has_payload:
+                payload = bytearray(_read_exact(f, header.payload_len))
+                tensor = decode_tensor(header, payload, meta, stats)
+            if tensor is not None:
+                header = header._replace(dtype=tensor.dtype, shape=tuple(tensor.shape))
+            header = header._replace(encoding=encoding)
+            yield TraceRecord(elapsed, stream, header, encoding, digest, tensor)
@@ -1 +1,11 @@
-from .densenet_1ch import DenseNet, densenet201
+from .densenet_1ch import DenseNet, densenet201, set_concat_buffer
+from .dataset import load_image, XRayFolder
+from .partition import DEFAULT_CUT, SplitManifest, cut_points, count_flops
+from .partition import split_densenet, split_weight_paths
+from .checkpoint import load_densenet201
+from .optimize import ChannelAffine, OptimizeReport, optimize_for_inference
+from .quantize import quantize_int8, save_quantized, load_quantized
+from .quantize import quantized_weight_paths
+from .prune import prune_densenet, search_ratios, fine_tune, pruned_weight_paths
+from .early_exit import EarlyExitSequential, build_exit_heads, train_exits
+from .early_exit import save_exits, load_exits, attach_exits, exit_weight_path
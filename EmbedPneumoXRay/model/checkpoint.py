@@ -0,0 +1,20 @@
+from pathlib import Path
+from typing import Union
+
+import torch
+
+from .densenet_1ch import DenseNet, densenet201
+
+__all__ = ["load_densenet201"]
+
+
+def load_densenet201(
+    weight_path: Union[str, Path], device: Union[str, torch.device] = "cpu"
+) -> DenseNet:
+    """학습 체크포인트(`model_state_dict`)로 흑백 2클래스 DenseNet-201 생성 (eval 모드)"""
+    load_info = torch.load(str(weight_path), map_location=device)
+    model = densenet201(pretrained=True, num_classes=2)
+    model.to(device)
+    model.load_state_dict(load_info["model_state_dict"], strict=False)
+    model.eval()
+    return model
@@ -0,0 +1,60 @@
+from pathlib import Path
+from typing import List, Tuple
+
+import torch
+from torch.utils.data import Dataset
+from torchvision import transforms
+from PIL import Image
+
+__all__ = ["IMAGE_SIZE", "xray_transform", "load_image", "XRayFolder"]
+
+IMAGE_SIZE = 256
+
+
+def xray_transform() -> transforms.Compose:
+    """흉부 X레이 전처리 (흑백 256x256, [-1, 1] 정규화)"""
+    return transforms.Compose(
+        [
+            transforms.Resize((IMAGE_SIZE, IMAGE_SIZE)),
+            transforms.ToTensor(),
+            transforms.Normalize(mean=[0.5], std=[0.5]),
+        ]
+    )
+
+
+def load_image(image_path: str) -> torch.Tensor:
+    """이미지 파일을 모델 입력 텐서 (1, 1, 256, 256)로 변환"""
+    with Image.open(image_path) as image:
+        image = image.convert("L")
+        return xray_transform()(image).unsqueeze(0)
+
+
+class XRayFolder(Dataset):
+    root_dir: Path
+    class_names: List[str]
+    images: List[str]
+    labels: List[int]
+
+    def __init__(self, root_dir: str, limit: int = 0) -> None:
+        """`root_dir/<라벨>/*.jpeg` 구조의 라벨별 X레이 폴더 (라벨 이름 정렬 순서가 클래스 번호)"""
+        self.root_dir = Path(root_dir)
+        self.class_names = sorted(p.name for p in self.root_dir.iterdir() if p.is_dir())
+        self.images = []
+        self.labels = []
+        for label, class_name in enumerate(self.class_names):
+            for image_path in sorted((self.root_dir / class_name).glob("*.jpeg")):
+                self.images.append(str(image_path))
+                self.labels.append(label)
+        if limit > 0 and len(self.images) > limit:
+            # 클래스 비율을 유지하도록 고르게 추출
+            step = len(self.images) / limit
+            indices = [int(i * step) for i in range(limit)]
+            self.images = [self.images[i] for i in indices]
+            self.labels = [self.labels[i] for i in indices]
+
+    def __len__(self) -> int:
+        return len(self.images)
+
+    def __getitem__(self, idx: int) -> Tuple[torch.Tensor, int, str]:
+        image = load_image(self.images[idx]).squeeze(0)
+        return image, self.labels[idx], self.images[idx]
@@ -0,0 +1,286 @@
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Sequence, Union
+
+import torch
+from torch import nn
+import torch.nn.functional as F
+from torch.utils.data import DataLoader, Dataset
+
+from .densenet_1ch import DenseNet
+from .partition import split_densenet
+
+__all__ = [
+    "EXIT_POINTS",
+    "FINAL",
+    "OFFLOADED",
+    "ExitHead",
+    "ExitStats",
+    "EarlyExitSequential",
+    "densenet_sequential",
+    "build_exit_heads",
+    "exit_features",
+    "train_exits",
+    "save_exits",
+    "load_exits",
+    "attach_exits",
+    "exit_weight_path",
+]
+
+EXIT_POINTS = ("denseblock2", "denseblock3")
+FINAL = "final"  # 출구를 지나 끝까지 실행한 경우의 통계 이름
+OFFLOADED = "offloaded"  # 분할 헤드의 출구를 지나 테일(서버)로 넘긴 경우의 통계 이름
+
+
+class ExitHead(nn.Module):
+    def __init__(self, in_channels: int, num_classes: int = 2) -> None:
+        """dense block 출력에 붙이는 출구 분류기 (BN -> ReLU -> 전역 평균 풀링 -> Linear)"""
+        super().__init__()
+        self.norm = nn.BatchNorm2d(in_channels)
+        self.relu = nn.ReLU(inplace=True)
+        self.pool = nn.AdaptiveAvgPool2d((1, 1))
+        self.flatten = nn.Flatten(start_dim=1)
+        self.classifier = nn.Linear(in_channels, num_classes)
+
+    @property
+    def in_channels(self) -> int:
+        """입력 채널 수"""
+        return self.norm.num_features
+
+    def forward(self, input: torch.Tensor) -> torch.Tensor:
+        out = self.relu(self.norm(input))
+        return self.classifier(self.flatten(self.pool(out)))
+
+
+class ExitStats:
+    counts: Dict[str, int]
+
+    def __init__(self) -> None:
+        """출구별 샘플 수 통계"""
+        self.counts = OrderedDict()
+
+    def record(self, name: str, count: int) -> None:
+        """출구 name에서 끝난 샘플 수 기록"""
+        if count > 0:
+            self.counts[name] = self.counts.get(name, 0) + count
+
+    def reset(self) -> None:
+        """통계 초기화"""
+        self.counts.clear()
+
+    @property
+    def total(self) -> int:
+        """기록한 전체 샘플 수"""
+        return sum(self.counts.values())
+
+    def fractions(self) -> Dict[str, float]:
+        """출구별 샘플 비율"""
+        total = max(1, self.total)
+        return {name: count / total for name, count in self.counts.items()}
+
+    def report(self) -> str:
+        """통계 문자열"""
+        if not self.total:
+            return "early exit: no samples"
+        exits = ", ".join(
+            f"{name} {fraction:.1%}" for name, fraction in self.fractions().items()
+        )
+        return f"early exit: {exits} ({self.total} samples)"
+
+
+class EarlyExitSequential(nn.Module):
+    stats: ExitStats
+
+    def __init__(
+        self, body: nn.Sequential, exits: nn.ModuleDict, threshold: float = 0.9
+    ) -> None:
+        """Sequential 모델(전체 모델, 분할 헤드/테일) 중간의 출구 분류기에서 확신도가 threshold 이상이면 바로 반환
+
+        body의 마지막 모듈이 분류기(Linear)이면 출구에서 끝난 샘플은 뒤의 연산에서 빼고
+        배치 전체의 logit을 반환합니다. 분할 헤드처럼 특징을 반환하는 모델은 배치의 모든 샘플이
+        출구에서 끝나면 logit `(N, 클래스 수)`를, 아니면 원래 특징을 반환하며 통계에는 OFFLOADED로 기록합니다.
+        """
+        super().__init__()
+        names = [name for name, _ in body.named_children()]
+        self.body = body
+        self.exits = nn.ModuleDict(
+            OrderedDict((name, exits[name]) for name in names if name in exits)
+        )
+        self.threshold = threshold
+        self.classifies = isinstance(list(body.children())[-1], nn.Linear)
+        self.stats = ExitStats()
+
+    def forward(self, input: torch.Tensor) -> torch.Tensor:
+        if not len(self.exits) or self.threshold <= 0:
+            return self.body(input)
+        output = input
+        logits = None
+        active = torch.arange(input.shape[0], device=input.device)
+        for name, module in self.body.named_children():
+            output = module(output)
+            if name not in self.exits:
+                continue
+            exit_logits = self.exits[name](output)
+            done = F.softmax(exit_logits, dim=1).max(dim=1).values >= self.threshold
+            if not self.classifies:
+                if bool(done.all()):
+                    self.stats.record(name, input.shape[0])
+                    return exit_logits
+                continue
+            if logits is None:
+                logits = exit_logits.new_empty((input.shape[0], exit_logits.shape[1]))
+            self.stats.record(name, int(done.sum()))
+            logits[active[done]] = exit_logits[done]
+            active = active[~done]
+            if not active.numel():
+                return logits
+            output = output[~done]
+        # 분류기가 없는 분할 헤드의 출력은 테일에서 계속 실행되므로 최종 출력이 아님
+        self.stats.record(FINAL if self.classifies else OFFLOADED, output.shape[0])
+        if logits is None:
+            return output
+        logits[active] = output
+        return logits
+
+
+def densenet_sequential(model: DenseNet) -> nn.Sequential:
+    """DenseNet을 features 모듈과 분류기를 차례로 실행하는 Sequential로 변환 (가중치 공유)"""
+    head, tail, _ = split_densenet(model, "norm5")
+    return nn.Sequential(
+        OrderedDict(list(head.named_children()) + list(tail.named_children()))
+    ).eval()
+
+
+def build_exit_heads(
+    model: DenseNet, points: Sequence[str] = EXIT_POINTS
+) -> nn.ModuleDict:
+    """분할 지점 이름별 출구 분류기 생성 (입력 채널 수는 빈 입력으로 확인)"""
+    device = next(model.parameters()).device
+    body = densenet_sequential(model)
+    output = torch.zeros((1, 1, 64, 64), device=device)
+    heads = nn.ModuleDict()
+    with torch.no_grad():
+        for name, module in body.named_children():
+            output = module(output)
+            if name in points:
+                heads[name] = ExitHead(output.shape[1], model.classifier.out_features)
+            if len(heads) == len(points):
+                break
+    unknown = set(points) - set(heads.keys())
+    if unknown:
+        raise ValueError(f"unknown exit point: {', '.join(sorted(unknown))}")
+    return heads.to(device)
+
+
+def exit_features(
+    body: nn.Sequential, names: Iterable[str], input: torch.Tensor
+) -> Dict[str, torch.Tensor]:
+    """body를 마지막 출구까지만 실행하고 출구 위치의 출력 반환"""
+    names = set(names)
+    features = {}
+    output = input
+    for name, module in body.named_children():
+        output = module(output)
+        if name in names:
+            features[name] = output
+            if len(features) == len(names):
+                break
+    return features
+
+
+def train_exits(
+    model: DenseNet,
+    heads: nn.ModuleDict,
+    dataset: Dataset,
+    epochs: int = 5,
+    lr: float = 1e-3,
+    batch_size: int = 16,
+    log: Callable[[str], None] = print,
+) -> nn.ModuleDict:
+    """고정한 backbone(eval 모드, 기울기 없음)의 출구 위치 출력으로 출구 분류기만 학습 (Adam, cross entropy)"""
+    device = next(model.parameters()).device
+    body = densenet_sequential(model)
+    heads.to(device).train()
+    loader = DataLoader(dataset, batch_size=batch_size, shuffle=True)
+    optimizer = torch.optim.Adam(heads.parameters(), lr=lr)
+    criterion = nn.CrossEntropyLoss()
+    for epoch in range(epochs):
+        losses = {name: 0.0 for name in heads.keys()}
+        count = 0
+        for images, labels, _ in loader:
+            images, labels = images.to(device), labels.to(device)
+            with torch.no_grad():
+                features = exit_features(body, heads.keys(), images)
+            optimizer.zero_grad()
+            loss = 0
+            for name, head in heads.items():
+                head_loss = criterion(head(features[name]), labels)
+                losses[name] += head_loss.item() * len(labels)
+                loss = loss + head_loss
+            loss.backward()
+            optimizer.step()
+            count += len(labels)
+        log(
+            f"epoch {epoch + 1}/{epochs} loss "
+            + ", ".join(f"{name} {v / max(1, count):.4f}" for name, v in losses.items())
+        )
+    return heads.eval()
+
+
+def save_exits(heads: nn.ModuleDict, path: Union[str, Path]) -> None:
+    """출구 분류기 저장 (출구별 입력 채널 수와 가중치)"""
+    torch.save(
+        {
+            "channels": {name: head.in_channels for name, head in heads.items()},
+            "num_classes": next(iter(heads.values())).classifier.out_features,
+            "exit_state_dict": heads.state_dict(),
+        },
+        str(path),
+    )
+
+
+def load_exits(
+    path: Union[str, Path], device: Union[str, torch.device] = "cpu"
+) -> nn.ModuleDict:
+    """출구 분류기 로드 (eval 모드)"""
+    load_info = torch.load(str(path), map_location=device)
+    heads = nn.ModuleDict(
+        OrderedDict(
+            (name, ExitHead(channels, load_info["num_classes"]))
+            for name, channels in load_info["channels"].items()
+        )
+    )
+    heads.load_state_dict(load_info["exit_state_dict"])
+    return heads.to(device).eval()
+
+
+def attach_exits(
+    body: nn.Module,
+    heads: nn.ModuleDict,
+    threshold: float,
+    sample: Optional[torch.Tensor] = None,
+) -> nn.Module:
+    """Sequential 모델에 그 안에 있는 출구만 붙인 EarlyExitSequential 반환, 붙일 출구가 없으면 body 그대로
+
+    sample을 지정하면 출구 분류기까지 실행해 채널 수가 맞는지(가지치기 모델 등) 확인하며 맞지 않으면 ValueError가 발생합니다.
+    """
+    if not isinstance(body, nn.Sequential):
+        return body
+    names = [name for name, _ in body.named_children()]
+    if not any(name in heads for name in names):
+        return body
+    model = EarlyExitSequential(body, heads, threshold).eval()
+    if sample is not None:
+        try:
+            with torch.no_grad():
+                features = exit_features(body, model.exits.keys(), sample)
+                for name, head in model.exits.items():
+                    head(features[name])
+        except RuntimeError as e:
+            raise ValueError(f"exit heads do not match the model: {e}") from e
+    return model
+
+
+def exit_weight_path(model_dir: Path) -> Path:
+    """출구 분류기 파일 경로"""
+    return Path(model_dir) / "ckpt_densenet201_exits.pt"
@@ -0,0 +1,135 @@
+import copy
+from typing import Dict, List, NamedTuple, Tuple
+
+import torch
+from torch import nn
+from torch.nn.utils.fusion import fuse_conv_bn_eval
+
+from .densenet_1ch import _DenseLayer
+
+__all__ = ["ChannelAffine", "OptimizeReport", "optimize_for_inference"]
+
+
+class ChannelAffine(nn.Module):
+    def __init__(self, norm: nn.BatchNorm2d) -> None:
+        """eval 모드 BatchNorm2d와 같은 채널별 y = x * scale + shift (통계 정규화를 미리 계산)"""
+        super().__init__()
+        scale = norm.running_var.add(norm.eps).rsqrt()
+        shift = -norm.running_mean * scale
+        if norm.affine:
+            scale = scale * norm.weight
+            shift = shift * norm.weight + norm.bias
+        self.register_buffer("scale", scale.detach().clone())
+        self.register_buffer("shift", shift.detach().clone())
+
+    def forward(self, input: torch.Tensor) -> torch.Tensor:
+        # BN 커널 대신 곱 한 번과 그 결과에 대한 in-place 덧셈 (추가 메모리 할당은 곱 결과 하나)
+        shape = (1, -1) + (1,) * (input.dim() - 2)
+        return input.mul(self.scale.view(shape)).add_(self.shift.view(shape))
+
+
+class OptimizeReport(NamedTuple):
+    # 모듈 이름별 (컨볼루션에 합쳐 제거한 BN 수, affine으로 바꾼 BN 수 (연산은 남음))
+    layers: Dict[str, Tuple[int, int]]
+    max_error: float  # 예제 입력에 대한 최대 출력 오차
+
+    @property
+    def folded(self) -> int:
+        """컨볼루션에 합쳐 제거한 BatchNorm 연산 수"""
+        return sum(folded for folded, _ in self.layers.values())
+
+    @property
+    def affine(self) -> int:
+        """채널 affine 연산(곱, 덧셈)으로 바꾼 BatchNorm 수, 제거한 연산이 아님"""
+        return sum(affine for _, affine in self.layers.values())
+
+    def summary(self) -> str:
+        """요약 문자열"""
+        return (
+            f"removed {self.folded} BN (folded into conv),"
+            f" {self.affine} BN -> channel affine (not removed)"
+            f" ({len(self.layers)} layers), max error {self.max_error:.2e}"
+        )
+
+
+def _foldable(conv: nn.Module, norm: nn.Module) -> bool:
+    """conv 출력에 바로 적용되는 BN을 conv 가중치에 합칠 수 있는지 여부"""
+    return (
+        isinstance(conv, nn.Conv2d)
+        and isinstance(norm, nn.BatchNorm2d)
+        and norm.track_running_stats
+        and norm.running_mean is not None
+        and norm.num_features == conv.out_channels
+    )
+
+
+def _fold_pairs(module: nn.Module) -> List[str]:
+    """모듈 안의 conv -> BN 쌍을 BN을 합친 conv와 Identity로 교체, 교체한 BN 이름 반환"""
+    if isinstance(module, _DenseLayer):
+        pairs = [("conv1", "norm2")]
+    elif isinstance(module, nn.Sequential):
+        names = [name for name, _ in module.named_children()]
+        pairs = list(zip(names, names[1:]))
+    else:
+        return []
+    folded = []
+    for conv_name, norm_name in pairs:
+        conv = getattr(module, conv_name)
+        norm = getattr(module, norm_name)
+        if not _foldable(conv, norm):
+            continue
+        setattr(module, conv_name, fuse_conv_bn_eval(conv, norm))
+        setattr(module, norm_name, nn.Identity())
+        folded.append(norm_name)
+    return folded
+
+
+def optimize_for_inference(
+    model: nn.Module,
+    inputs: torch.Tensor,
+    atol: float = 1e-4,
+    rtol: float = 1e-4,
+) -> Tuple[nn.Module, OptimizeReport]:
+    """DenseNet 또는 분할 모델(헤드/테일)을 추론용으로 변환한 복사본과 변환 결과 반환
+
+    conv 바로 뒤의 BatchNorm(conv0 -> norm0, denselayer의 conv1 -> norm2)은 conv 가중치와 bias에 합치고,
+    ReLU 앞의 pre-activation BatchNorm(norm1, transition norm, norm5 등)은 앞에 합칠 conv가 없으므로
+    채널별 affine 연산(곱, 덧셈)으로 바꾸며, 보고서의 제거한 연산 수(folded)에는 포함하지 않습니다.
+    inputs로 원본과 변환 모델의 출력을 비교해 오차가 atol + rtol * max|출력|을 넘으면 ValueError가 발생합니다.
+    """
+    model = model.eval()
+    optimized = copy.deepcopy(model)
+    layers: Dict[str, List[int]] = {}
+    for name, module in list(optimized.named_modules()):
+        for norm_name in _fold_pairs(module):
+            key = _layer_name(name, module, norm_name)
+            layers.setdefault(key, [0, 0])[0] += 1
+    for name, module in list(optimized.named_modules()):
+        for child_name, child in list(module.named_children()):
+            if isinstance(child, nn.BatchNorm2d) and child.track_running_stats:
+                setattr(module, child_name, ChannelAffine(child))
+                key = _layer_name(name, module, child_name)
+                layers.setdefault(key, [0, 0])[1] += 1
+
+    with torch.no_grad():
+        expected = model(inputs)
+        output = optimized(inputs)
+    max_error = (output - expected).abs().max().item()
+    tolerance = atol + rtol * expected.abs().max().item()
+    if max_error > tolerance:
+        raise ValueError(
+            f"optimized model output mismatch: max error {max_error:.3e}"
+            f" > tolerance {tolerance:.3e}"
+        )
+    report = OptimizeReport(
+        layers={key: tuple(counts) for key, counts in layers.items()},
+        max_error=max_error,
+    )
+    return optimized, report
+
+
+def _layer_name(parent: str, module: nn.Module, child: str) -> str:
+    """보고서 항목 이름: dense layer와 transition은 해당 모듈, 그 외는 BN 자신의 이름"""
+    if isinstance(module, _DenseLayer) or (parent and "transition" in parent):
+        return parent
+    return f"{parent}.{child}" if parent else child
@@ -0,0 +1,297 @@
+import copy
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import torch
+from torch import nn
+from torch.utils.data import DataLoader, Dataset
+
+from .densenet_1ch import DenseNet, _DenseBlock, _DenseLayer, _Transition
+from .partition import DEFAULT_CUT, split_weight_paths
+
+__all__ = [
+    "MAX_RATIO",
+    "CHANNEL_MULTIPLE",
+    "prune_groups",
+    "channel_importance",
+    "pruning_damage",
+    "prune_densenet",
+    "search_ratios",
+    "fine_tune",
+    "pruned_weight_paths",
+]
+
+# 그룹별 최대 제거 비율 (denseblock: 블록 내 layer의 conv1 출력 채널, transition: 출력 채널)
+MAX_RATIO = {"denseblock": 0.75, "transition": 0.5}
+CHANNEL_MULTIPLE = 8
+
+
+def prune_groups(model: DenseNet) -> List[str]:
+    """가지치기 그룹 이름 (features의 denseblock, transition 순서)"""
+    return [
+        name
+        for name, module in model.features.named_children()
+        if isinstance(module, (_DenseBlock, _Transition))
+    ]
+
+
+def _consumers(model: DenseNet, group: str) -> List[Tuple[nn.BatchNorm2d, nn.Module]]:
+    """transition 출력을 입력 앞부분 채널로 받는 (BN, conv 또는 classifier) 쌍"""
+    children = list(model.features.named_children())
+    index = [name for name, _ in children].index(group)
+    pairs = []
+    for name, module in children[index + 1 :]:
+        if isinstance(module, _DenseBlock):
+            pairs += [(layer.norm1, layer.conv1) for layer in module.values()]
+        elif isinstance(module, _Transition):
+            pairs.append((module.norm, module.conv))
+            break
+        elif name == "norm5":
+            pairs.append((module, model.classifier))
+    return pairs
+
+
+def _outgoing(weight: torch.Tensor, channels: int) -> torch.Tensor:
+    """입력 채널 앞 channels개 각각에 연결된 가중치의 L1 합"""
+    weight = weight.detach().abs()
+    if weight.dim() == 2:
+        return weight[:, :channels].sum(0)
+    return weight[:, :channels].sum((0, 2, 3))
+
+
+def channel_importance(model: DenseNet) -> Dict[str, List[torch.Tensor]]:
+    """그룹별 채널 중요도 (layer마다 채널별 값), BN scale 크기와 그 채널을 받는 가중치 L1의 곱
+
+    denseblock은 layer마다 conv1 출력(norm2 -> conv2 입력) 채널, transition은 conv 출력 채널이며
+    transition 출력은 다음 블록의 모든 layer와 다음 transition(또는 norm5, classifier)이 받으므로 합산합니다.
+    """
+    scores = {}
+    blocks = dict(model.features.named_children())
+    for group in prune_groups(model):
+        module = blocks[group]
+        if isinstance(module, _DenseBlock):
+            scores[group] = [
+                layer.norm2.weight.detach().abs()
+                * _outgoing(layer.conv2.weight, layer.conv2.in_channels)
+                for layer in module.values()
+            ]
+        else:
+            channels = module.conv.out_channels
+            score = torch.zeros(channels)
+            for norm, consumer in _consumers(model, group):
+                score += (
+                    norm.weight.detach().abs()[:channels].cpu()
+                    * _outgoing(consumer.weight, channels).cpu()
+                )
+            scores[group] = [score]
+    return scores
+
+
+def _keep(score: torch.Tensor, ratio: float) -> torch.Tensor:
+    """중요도가 낮은 채널을 ratio만큼 제거하고 남길 채널 번호 (원래 순서)"""
+    count = score.numel()
+    keep = max(1, count - int(round(count * ratio)))
+    if count % CHANNEL_MULTIPLE == 0:
+        # 남는 채널 수를 CPU/GPU 컨볼루션 커널의 벡터 폭 배수로 맞춤
+        keep = min(count, -(-keep // CHANNEL_MULTIPLE) * CHANNEL_MULTIPLE)
+    return score.argsort(descending=True)[:keep].sort().values
+
+
+def pruning_damage(
+    scores: Dict[str, List[torch.Tensor]], ratios: Dict[str, float]
+) -> float:
+    """제거하는 채널의 중요도 비율 합 (layer마다 중요도 합으로 나눈 값의 그룹 평균)"""
+    damage = 0.0
+    for group, ratio in ratios.items():
+        if ratio <= 0:
+            continue
+        removed = []
+        for score in scores[group]:
+            score = score.cpu()
+            keep = _keep(score, ratio)
+            total = score.sum().item() or 1.0
+            removed.append(1.0 - score[keep].sum().item() / total)
+        damage += sum(removed) / len(removed)
+    return damage
+
+
+def _slice_conv(
+    conv: nn.Conv2d,
+    out_index: Optional[torch.Tensor] = None,
+    in_index: Optional[torch.Tensor] = None,
+) -> nn.Conv2d:
+    """출력/입력 채널 일부만 남긴 컨볼루션"""
+    weight = conv.weight.detach()
+    bias = conv.bias.detach() if conv.bias is not None else None
+    if out_index is not None:
+        weight = weight[out_index.to(weight.device)]
+        bias = bias[out_index.to(weight.device)] if bias is not None else None
+    if in_index is not None:
+        weight = weight[:, in_index.to(weight.device)]
+    sliced = nn.Conv2d(
+        weight.shape[1],
+        weight.shape[0],
+        kernel_size=conv.kernel_size,
+        stride=conv.stride,
+        padding=conv.padding,
+        bias=bias is not None,
+    ).to(weight.device)
+    sliced.weight.data.copy_(weight)
+    if bias is not None:
+        sliced.bias.data.copy_(bias)
+    return sliced
+
+
+def _slice_norm(norm: nn.BatchNorm2d, index: torch.Tensor) -> nn.BatchNorm2d:
+    """채널 일부만 남긴 BatchNorm"""
+    index = index.to(norm.weight.device)
+    sliced = nn.BatchNorm2d(index.numel(), eps=norm.eps, momentum=norm.momentum)
+    sliced = sliced.to(norm.weight.device)
+    sliced.weight.data.copy_(norm.weight.detach()[index])
+    sliced.bias.data.copy_(norm.bias.detach()[index])
+    sliced.running_mean.copy_(norm.running_mean[index])
+    sliced.running_var.copy_(norm.running_var[index])
+    sliced.num_batches_tracked.copy_(norm.num_batches_tracked)
+    return sliced
+
+
+def _slice_linear(linear: nn.Linear, in_index: torch.Tensor) -> nn.Linear:
+    """입력 채널 일부만 남긴 Linear"""
+    in_index = in_index.to(linear.weight.device)
+    sliced = nn.Linear(in_index.numel(), linear.out_features).to(linear.weight.device)
+    sliced.weight.data.copy_(linear.weight.detach()[:, in_index])
+    sliced.bias.data.copy_(linear.bias.detach())
+    return sliced
+
+
+def prune_densenet(
+    model: DenseNet,
+    ratios: Dict[str, float],
+    scores: Optional[Dict[str, List[torch.Tensor]]] = None,
+) -> DenseNet:
+    """그룹별 비율만큼 채널을 제거한 DenseNet 복사본 (dense 연결 구조는 유지)
+
+    denseblock은 layer마다 conv1 출력, norm2, conv2 입력 채널을 줄이며 블록 출력 채널 수는 그대로입니다.
+    transition은 conv 출력 채널을 줄이고, 그 출력을 받는 다음 블록 layer의 norm1/conv1과
+    다음 transition(또는 norm5, classifier)의 입력 앞부분 채널을 같이 줄입니다.
+    """
+    scores = scores or channel_importance(model)
+    model = copy.deepcopy(model)
+    blocks = dict(model.features.named_children())
+    for group, ratio in ratios.items():
+        if ratio <= 0:
+            continue
+        module = blocks[group]
+        if isinstance(module, _DenseBlock):
+            for layer, score in zip(module.values(), scores[group]):
+                keep = _keep(score.cpu(), ratio)
+                layer.conv1 = _slice_conv(layer.conv1, out_index=keep)
+                layer.norm2 = _slice_norm(layer.norm2, keep)
+                layer.conv2 = _slice_conv(layer.conv2, in_index=keep)
+            continue
+        channels = module.conv.out_channels
+        keep = _keep(scores[group][0].cpu(), ratio)
+        consumers = _consumers(model, group)
+        module.conv = _slice_conv(module.conv, out_index=keep)
+        for norm, consumer in consumers:
+            # 입력 앞 channels개가 transition 출력이고 그 뒤는 블록 layer 출력
+            total = norm.num_features
+            index = torch.cat([keep, torch.arange(channels, total)])
+            new_norm = _slice_norm(norm, index)
+            if isinstance(consumer, nn.Linear):
+                model.features.norm5 = new_norm
+                model.classifier = _slice_linear(consumer, index)
+                continue
+            owner = _owner(model, norm)
+            if isinstance(owner, _DenseLayer):
+                owner.norm1 = new_norm
+                owner.conv1 = _slice_conv(consumer, in_index=index)
+            else:
+                owner.norm = new_norm
+                owner.conv = _slice_conv(consumer, in_index=index)
+    return model
+
+
+def _owner(model: nn.Module, target: nn.Module) -> nn.Module:
+    """target을 직접 하위 모듈로 가진 모듈"""
+    for module in model.modules():
+        if any(child is target for child in module.children()):
+            return module
+    raise ValueError("module not found")
+
+
+def search_ratios(
+    model: DenseNet,
+    cost: Callable[[DenseNet], float],
+    target: float,
+    groups: Sequence[str],
+    step: float = 0.05,
+    log: Callable[[str], None] = print,
+) -> Tuple[Dict[str, float], float]:
+    """cost(가지치기 모델)가 target 이하가 될 때까지 그룹별 비율을 탐욕적으로 늘린 비율과 cost 반환
+
+    매 단계 그룹마다 비율을 step만큼 늘려 보고, 줄어든 cost 대비 늘어난 중요도 손실이 가장 유리한 그룹을 선택합니다.
+    모든 그룹이 최대 비율(MAX_RATIO)에 도달해도 target보다 크면 ValueError가 발생합니다.
+    """
+    scores = channel_importance(model)
+    ratios = {group: 0.0 for group in groups}
+    current = cost(model)
+    damage = 0.0
+    log(f"start cost {current:.4g}, target {target:.4g}")
+    while current > target:
+        best = None
+        for group in groups:
+            limit = MAX_RATIO["denseblock" if "denseblock" in group else "transition"]
+            ratio = min(limit, ratios[group] + step)
+            if ratio <= ratios[group]:
+                continue
+            candidate = dict(ratios, **{group: ratio})
+            candidate_cost = cost(prune_densenet(model, candidate, scores))
+            candidate_damage = pruning_damage(scores, candidate)
+            gain = (current - candidate_cost) / max(candidate_damage - damage, 1e-6)
+            if best is None or gain > best[0]:
+                best = (gain, candidate, candidate_cost, candidate_damage)
+        if best is None:
+            raise ValueError(f"target not reachable: cost {current:.4g} > {target:.4g}")
+        _, ratios, current, damage = best
+        log(
+            f"cost {current:.4g}, damage {damage:.3f}, ratios "
+            + ", ".join(f"{g} {r:.2f}" for g, r in ratios.items() if r > 0)
+        )
+    return ratios, current
+
+
+def fine_tune(
+    model: DenseNet,
+    dataset: Dataset,
+    epochs: int = 1,
+    lr: float = 1e-3,
+    batch_size: int = 8,
+    device: str = "cpu",
+    log: Callable[[str], None] = print,
+) -> DenseNet:
+    """가지치기 모델을 `(이미지, 라벨, 경로)` 데이터셋으로 재학습 (SGD, cross entropy), eval 모드로 반환"""
+    model.to(device).train()
+    loader = DataLoader(dataset, batch_size=batch_size, shuffle=True)
+    optimizer = torch.optim.SGD(model.parameters(), lr=lr, momentum=0.9)
+    criterion = nn.CrossEntropyLoss()
+    for epoch in range(epochs):
+        total_loss, count = 0.0, 0
+        for images, labels, _ in loader:
+            images, labels = images.to(device), labels.to(device)
+            optimizer.zero_grad()
+            loss = criterion(model(images), labels)
+            loss.backward()
+            optimizer.step()
+            total_loss += loss.item() * len(labels)
+            count += len(labels)
+        log(f"epoch {epoch + 1}/{epochs} loss {total_loss / max(1, count):.4f}")
+    return model.eval()
+
+
+def pruned_weight_paths(
+    model_dir: Path, cut: str = DEFAULT_CUT
+) -> Tuple[Path, Path, Path]:
+    """가지치기 모델 파일 경로 (전체, 분할 헤드, 분할 테일)"""
+    head_path, tail_path, _ = split_weight_paths(model_dir, cut, "densenet201_pruned")
+    return Path(model_dir) / "ckpt_densenet201_pruned.pt", head_path, tail_path
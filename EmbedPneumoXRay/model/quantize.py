@@ -0,0 +1,85 @@
+import copy
+import json
+import platform
+from pathlib import Path
+from typing import Dict, Iterable, Tuple, Union
+
+import torch
+from torch import nn
+from torch.ao.quantization import get_default_qconfig_mapping
+from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+from .densenet_1ch import set_concat_buffer
+from .partition import DEFAULT_CUT, split_weight_paths
+
+__all__ = [
+    "default_backend",
+    "quantize_int8",
+    "save_quantized",
+    "load_quantized",
+    "quantized_weight_paths",
+]
+
+_INFO_FILE = "quantize.json"
+
+
+def default_backend() -> str:
+    """이 장비의 int8 연산 백엔드 (ARM은 qnnpack, 그 외 x86)"""
+    if platform.machine().lower() in ("aarch64", "arm64", "armv7l"):
+        return "qnnpack"
+    return "x86"
+
+
+def quantize_int8(
+    model: nn.Module, calibration: Iterable[torch.Tensor], backend: str = ""
+) -> torch.jit.ScriptModule:
+    """float 모델(DenseNet 또는 분할 모델)을 보정 입력으로 관측해 int8 정적 양자화한 TorchScript 모듈 반환
+
+    FX 그래프 모드로 conv -> BN -> ReLU를 합친 뒤 컨볼루션, 분류기(Linear), BN과 활성화를 int8로 바꾸며,
+    입력은 float로 받아 양자화하고 출력은 다시 float로 돌려줍니다. int8 연산은 CPU에서만 실행됩니다.
+    """
+    backend = backend or default_backend()
+    torch.backends.quantized.engine = backend
+    model = copy.deepcopy(model).cpu().eval()
+    # 출력 버퍼 경로(slice 복사)는 양자화할 수 없으므로 torch.cat 경로로 추적
+    set_concat_buffer(model, False)
+    calibration = iter(calibration)
+    example = next(calibration).cpu()
+    prepared = prepare_fx(
+        model, get_default_qconfig_mapping(backend), example_inputs=(example,)
+    )
+    with torch.no_grad():
+        prepared(example)
+        for inputs in calibration:
+            prepared(inputs.cpu())
+        converted = convert_fx(prepared).eval()
+        scripted = torch.jit.trace(converted, example)
+    return torch.jit.freeze(scripted.eval())
+
+
+def save_quantized(
+    module: torch.jit.ScriptModule, path: Union[str, Path], info: Dict = None
+) -> None:
+    """양자화 모듈 저장 (백엔드 등 정보는 TorchScript 추가 파일로 함께 저장)"""
+    info = dict(info or {}, backend=torch.backends.quantized.engine)
+    torch.jit.save(module, str(path), _extra_files={_INFO_FILE: json.dumps(info)})
+
+
+def load_quantized(path: Union[str, Path]) -> Tuple[torch.jit.ScriptModule, Dict]:
+    """양자화 모듈과 저장 정보 로드, 저장 시 백엔드를 이 장비에서 쓸 수 있으면 그 백엔드로 실행"""
+    extra_files = {_INFO_FILE: ""}
+    module = torch.jit.load(str(path), map_location="cpu", _extra_files=extra_files)
+    info = json.loads(extra_files[_INFO_FILE] or "{}")
+    backend = info.get("backend", "")
+    if backend not in torch.backends.quantized.supported_engines:
+        backend = default_backend()
+    torch.backends.quantized.engine = backend
+    return module.eval(), info
+
+
+def quantized_weight_paths(
+    model_dir: Path, cut: str = DEFAULT_CUT
+) -> Tuple[Path, Path, Path]:
+    """int8 모델 파일 경로 (전체, 분할 헤드, 분할 테일)"""
+    head_path, tail_path, _ = split_weight_paths(model_dir, cut, "densenet201_int8")
+    return Path(model_dir) / "ckpt_densenet201_int8.pt", head_path, tail_path
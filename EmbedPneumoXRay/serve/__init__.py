@@ -0,0 +1,4 @@
+from .batcher import InferenceFuture, RequestExpired, BatchScheduler
+from .cache import weight_version, weight_signature, ResultCache
+from .server import InferenceServer, ServerLimits
+from .workers import core_sets, WorkerPool
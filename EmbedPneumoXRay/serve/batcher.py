@@ -0,0 +1,380 @@
+import math
+import time
+import heapq
+import queue
+import itertools
+import threading
+from collections import Counter
+from concurrent.futures import Future
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import torch
+
+__all__ = ["InferenceFuture", "RequestExpired", "BatchScheduler"]
+
+# 남은 시간이 배치 실행 시간의 이 배수보다 짧으면 공정 분배보다 우선
+_URGENT_BATCHES = 2
+
+
+class RequestExpired(TimeoutError):
+    """응답 기한 안에 실행을 마칠 수 없어 실행하지 않은 요청"""
+
+
+class InferenceFuture(Future):
+    queue_time: float = 0.0  # 대기열에서 기다린 시간 (초)
+    run_time: float = 0.0  # 요청이 포함된 배치의 실행 시간 (초)
+
+
+class _Request(NamedTuple):
+    tensor: torch.Tensor
+    future: InferenceFuture
+    arrival: float
+    deadline: float = math.inf  # 응답 기한 (monotonic), 없으면 inf
+    client: int = 0  # 공정 분배 단위
+
+
+class _RequestQueue:
+    __cond: threading.Condition
+    __clients: Dict[int, List[Tuple[float, int, _Request]]]
+    __served: Dict[int, float]
+    __virtual: float
+    __size: int
+    __closed: bool
+    __order: itertools.count
+
+    def __init__(self) -> None:
+        """클라이언트별 기한 순 대기열, 클라이언트 사이에는 처리한 행 수로 공정 분배
+
+        클라이언트마다 (기한, 도착 순서) 힙을 두고, 각 힙의 맨 앞 요청 중
+        기한이 임박한 요청이 있으면 기한이 가장 이른 요청(EDF)을, 없으면 지금까지
+        처리한 행 수가 가장 적은 클라이언트의 요청을 꺼냅니다.
+        """
+        self.__cond = threading.Condition()
+        self.__clients = {}
+        self.__served = {}
+        self.__virtual = 0.0
+        self.__size = 0
+        self.__closed = False
+        self.__order = itertools.count()
+
+    def __len__(self) -> int:
+        return self.__size
+
+    def put(self, request: _Request) -> None:
+        """요청 등록"""
+        with self.__cond:
+            heap = self.__clients.get(request.client)
+            if heap is None:
+                heap = self.__clients[request.client] = []
+                # 쉬고 있던 클라이언트는 현재 가상 시간부터 시작 (몫을 쌓아두지 않음)
+                served = self.__served.get(request.client, 0.0)
+                self.__served[request.client] = max(served, self.__virtual)
+            heapq.heappush(heap, (request.deadline, next(self.__order), request))
+            self.__size += 1
+            self.__cond.notify()
+
+    def get(
+        self,
+        timeout: Optional[float] = None,
+        urgent: float = 0.0,
+        match: Callable[[_Request], bool] = None,
+    ) -> Optional[_Request]:
+        """다음 요청 반환, timeout까지 없으면 queue.Empty, 닫힌 뒤 꺼낼 요청이 없으면 None
+
+        urgent는 기한 우선 처리 기준 (남은 시간, 초), match는 꺼낼 수 있는 요청 조건입니다.
+        """
+        with self.__cond:
+            end = None if timeout is None else time.monotonic() + timeout
+            while True:
+                request = self._pop(urgent, match)
+                if request is not None:
+                    return request
+                if self.__closed:
+                    return None
+                remaining = None if end is None else end - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise queue.Empty
+                self.__cond.wait(remaining)
+
+    def close(self) -> None:
+        """대기 중인 get 종료, 남은 요청은 계속 꺼낼 수 있음"""
+        with self.__cond:
+            self.__closed = True
+            self.__cond.notify_all()
+
+    def drain(self) -> List[_Request]:
+        """남은 요청을 모두 꺼내고 다시 열기"""
+        with self.__cond:
+            requests = [
+                item[2] for heap in self.__clients.values() for item in sorted(heap)
+            ]
+            self.__clients = {}
+            self.__served = {}
+            self.__virtual = 0.0
+            self.__size = 0
+            self.__closed = False
+            return requests
+
+    def _pop(
+        self, urgent: float, match: Optional[Callable[[_Request], bool]]
+    ) -> Optional[_Request]:
+        """정책에 따라 요청 하나 꺼내기 (잠금 상태에서 호출)"""
+        heads = [
+            (client, heap[0])
+            for client, heap in self.__clients.items()
+            if match is None or match(heap[0][2])
+        ]
+        if not heads:
+            return None
+        limit = time.monotonic() + urgent
+        pressing = [head for head in heads if head[1][0] <= limit]
+        if pressing:
+            client, _ = min(pressing, key=lambda head: head[1][:2])
+        else:
+            client, _ = min(
+                heads, key=lambda head: (self.__served[head[0]],) + head[1][:2]
+            )
+        heap = self.__clients[client]
+        _, _, request = heapq.heappop(heap)
+        self.__size -= 1
+        # 가상 시간은 마지막으로 꺼낸 요청의 시작 시점 (처리량 기준)
+        self.__virtual = max(self.__virtual, self.__served[client])
+        self.__served[client] += request.tensor.shape[0]
+        if not heap:
+            del self.__clients[client]
+        # 오래 쉬는 클라이언트 기록 정리 (다시 오면 가상 시간부터 시작하므로 불필요)
+        for idle in [c for c, v in self.__served.items() if v <= self.__virtual]:
+            if idle not in self.__clients:
+                del self.__served[idle]
+        return request
+
+
+class BatchScheduler:
+    __model: Callable[[torch.Tensor], torch.Tensor]
+    __device: torch.device
+    __max_batch_size: int
+    __max_wait: float
+    __queue: _RequestQueue
+    __concurrency: int
+    __threads: List[threading.Thread]
+    __collect_lock: threading.Lock
+    __stats_lock: threading.Lock
+    __batch_sizes: Counter
+    __latency: float
+    __expired: int
+    __report_interval: float
+    __log: Callable[[str], None]
+
+    def __init__(
+        self,
+        model: Callable[[torch.Tensor], torch.Tensor],
+        device: torch.device = torch.device("cpu"),
+        max_batch_size: int = 8,
+        max_wait: float = 0.005,
+        report_interval: float = 60.0,
+        log: Callable[[str], None] = print,
+        concurrency: int = 1,
+    ) -> None:
+        """동시 요청을 하나의 배치로 묶어 모델을 실행하는 스케줄러
+
+        concurrency는 동시에 실행할 배치 수이며, 여러 배치를 병렬로 처리하는 모델(WorkerPool)과 함께 사용합니다.
+        요청은 클라이언트별 기한 순으로, 클라이언트 사이에는 공정 분배로 실행하며
+        기한 안에 끝낼 수 없는 요청은 실행하지 않고 RequestExpired로 실패시킵니다.
+        """
+        self.__model = model
+        self.__device = torch.device(device)
+        self.__max_batch_size = max(1, max_batch_size)
+        self.__max_wait = max(0.0, max_wait)
+        self.__queue = _RequestQueue()
+        self.__concurrency = max(1, concurrency)
+        self.__threads = []
+        self.__collect_lock = threading.Lock()
+        self.__stats_lock = threading.Lock()
+        self.__batch_sizes = Counter()
+        self.__latency = 0.0
+        self.__expired = 0
+        self.__report_interval = report_interval
+        self.__log = log
+
+    @property
+    def batch_sizes(self) -> Counter:
+        """실행한 배치 크기별 횟수"""
+        with self.__stats_lock:
+            return Counter(self.__batch_sizes)
+
+    @property
+    def max_batch_size(self) -> int:
+        """배치 추론 최대 크기"""
+        return self.__max_batch_size
+
+    @property
+    def batch_latency(self) -> float:
+        """배치 1회 실행 시간의 지수 이동 평균 (초)"""
+        return self.__latency
+
+    @property
+    def expired(self) -> int:
+        """기한 초과로 실행하지 않은 요청 수"""
+        return self.__expired
+
+    @property
+    def queue_depth(self) -> int:
+        """대기 중인 요청 수"""
+        return len(self.__queue)
+
+    def start(self) -> None:
+        """배치 실행 스레드 시작"""
+        if self.__threads:
+            return
+        self.__threads = [
+            threading.Thread(target=self._run, daemon=True)
+            for _ in range(self.__concurrency)
+        ]
+        for thread in self.__threads:
+            thread.start()
+
+    def stop(self) -> None:
+        """배치 실행 스레드 종료, 대기 중인 요청은 취소"""
+        if not self.__threads:
+            return
+        self.__queue.close()
+        for thread in self.__threads:
+            thread.join()
+        self.__threads = []
+        for request in self.__queue.drain():
+            request.future.cancel()
+        self.__log(self.report())
+
+    def set_model(self, model: Callable[[torch.Tensor], torch.Tensor]) -> None:
+        """모델 교체, 실행 중인 배치는 이전 모델로 마치고 다음 배치부터 새 모델 사용"""
+        self.__model = model
+
+    def submit(
+        self,
+        tensor: torch.Tensor,
+        deadline: Optional[float] = None,
+        client: int = 0,
+    ) -> InferenceFuture:
+        """요청 등록, 해당 요청의 출력 행을 담은 Future 반환
+
+        deadline은 응답 기한 (time.monotonic 기준), client는 공정 분배 단위입니다.
+        """
+        future = InferenceFuture()
+        request = _Request(
+            tensor,
+            future,
+            time.monotonic(),
+            math.inf if deadline is None else deadline,
+            client,
+        )
+        if not self._expire(request):
+            self.__queue.put(request)
+        return future
+
+    def report(self) -> str:
+        """배치 크기 분포 문자열"""
+        with self.__stats_lock:
+            batch_sizes = Counter(self.__batch_sizes)
+        total = sum(batch_sizes.values())
+        if total == 0:
+            return "batch size distribution: (no batch)"
+        rows = sum(size * count for size, count in batch_sizes.items())
+        items = [
+            f"{size}: {count} ({count / total:.1%})"
+            for size, count in sorted(batch_sizes.items())
+        ]
+        expired = f", expired {self.__expired}" if self.__expired else ""
+        return (
+            f"batch size distribution: {', '.join(items)}"
+            f" / mean {rows / total:.2f} over {total} batches{expired}"
+        )
+
+    def _expire(self, request: _Request) -> bool:
+        """지금 실행해도 기한을 넘길 요청이면 RequestExpired로 실패시키고 True"""
+        if request.deadline - time.monotonic() >= self.__latency:
+            return False
+        if request.future.set_running_or_notify_cancel():
+            request.future.set_exception(
+                RequestExpired(
+                    f"deadline exceeded: {self.__latency * 1000:.1f} ms batch latency"
+                )
+            )
+            with self.__stats_lock:
+                self.__expired += 1
+        return True
+
+    def _next_request(
+        self,
+        timeout: Optional[float] = None,
+        match: Callable[[_Request], bool] = None,
+    ) -> Optional[_Request]:
+        """기한을 넘길 요청은 건너뛰고 다음 요청 반환"""
+        urgent = _URGENT_BATCHES * self.__latency + self.__max_wait
+        while True:
+            request = self.__queue.get(timeout, urgent, match)
+            if request is None or not self._expire(request):
+                return request
+
+    def _collect(self, first: _Request) -> List[_Request]:
+        """최대 배치 크기 또는 최대 대기 시간까지 같은 shape의 요청 수집
+
+        대기 시간은 첫 요청의 기한을 넘기지 않는 범위로 제한합니다.
+        """
+        batch = [first]
+        rows = first.tensor.shape[0]
+        deadline = min(first.arrival + self.__max_wait, first.deadline - self.__latency)
+
+        def match(request: _Request) -> bool:
+            return (
+                request.tensor.shape[1:] == first.tensor.shape[1:]
+                and rows + request.tensor.shape[0] <= self.__max_batch_size
+            )
+
+        while rows < self.__max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                request = self._next_request(max(remaining, 0), match)
+            except queue.Empty:
+                break
+            if request is None:
+                break
+            batch.append(request)
+            rows += request.tensor.shape[0]
+        return batch
+
+    def _run(self) -> None:
+        """배치 실행 루프"""
+        last_report = time.monotonic()
+        while True:
+            # 배치 구성은 한 스레드씩, 실행은 concurrency개까지 동시에
+            with self.__collect_lock:
+                request = self._next_request()
+                if request is None:
+                    break
+                batch = self._collect(request)
+            batch = [r for r in batch if r.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            sizes = [r.tensor.shape[0] for r in batch]
+            start_time = time.monotonic()
+            try:
+                inputs = torch.cat([r.tensor for r in batch]).to(self.__device)
+                with torch.inference_mode():
+                    outputs = self.__model(inputs).cpu()
+                run_time = time.monotonic() - start_time
+                for r, row in zip(batch, outputs.split(sizes)):
+                    r.future.queue_time = start_time - r.arrival
+                    r.future.run_time = run_time
+                    r.future.set_result(row)
+            except Exception as e:
+                for r in batch:
+                    r.future.set_exception(e)
+            latency = time.monotonic() - start_time
+            with self.__stats_lock:
+                self.__batch_sizes[sum(sizes)] += 1
+                if self.__latency == 0.0:
+                    self.__latency = latency
+                self.__latency += 0.2 * (latency - self.__latency)
+            if time.monotonic() - last_report >= self.__report_interval:
+                self.__log(self.report())
+                last_report = time.monotonic()
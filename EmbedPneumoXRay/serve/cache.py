@@ -0,0 +1,150 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple, Union
+
+import torch
+
+__all__ = ["weight_version", "weight_signature", "ResultCache"]
+
+_DIGEST_SIZE = 16
+_CHUNK = 1024 * 1024
+
+
+def weight_version(path: Union[str, Path]) -> str:
+    """모델 가중치 파일 내용의 digest (결과 캐시 버전)"""
+    digest = hashlib.blake2b(digest_size=8)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def weight_signature(*paths: Union[str, Path]) -> Tuple[Tuple[int, int], ...]:
+    """파일별 (수정 시각 ns, 크기), 없는 파일은 (0, 0) (내용 digest 전 빠른 변경 확인용)"""
+    signature = []
+    for path in paths:
+        try:
+            stat = Path(path).stat()
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append((0, 0))
+    return tuple(signature)
+
+
+def _nbytes(tensor: torch.Tensor) -> int:
+    """텐서 바이트 수"""
+    return tensor.numel() * tensor.element_size()
+
+
+class ResultCache:
+    __entries: "OrderedDict[bytes, torch.Tensor]"
+    __max_entries: int
+    __max_bytes: int
+    __bytes: int
+    __version: str
+    __hits: int
+    __misses: int
+    __evictions: int
+    __lock: threading.Lock
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: int = 64 * 1024 * 1024,
+        version: str = "",
+    ) -> None:
+        """요청 텐서 내용으로 찾는 LRU 추론 결과 캐시
+
+        키는 모델 버전과 요청 텐서(dtype, shape, 바이트)의 blake2b digest이며,
+        항목 수와 결과 텐서 바이트 합이 한도를 넘으면 가장 오래 사용하지 않은 항목부터 제거합니다.
+        """
+        self.__entries = OrderedDict()
+        self.__max_entries = max(1, max_entries)
+        self.__max_bytes = max_bytes
+        self.__bytes = 0
+        self.__version = version
+        self.__hits = 0
+        self.__misses = 0
+        self.__evictions = 0
+        self.__lock = threading.Lock()
+
+    @property
+    def version(self) -> str:
+        """모델 버전"""
+        return self.__version
+
+    @property
+    def hits(self) -> int:
+        """캐시 적중 횟수"""
+        return self.__hits
+
+    @property
+    def misses(self) -> int:
+        """캐시 미스 횟수"""
+        return self.__misses
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def key(self, tensor: torch.Tensor) -> bytes:
+        """모델 버전과 텐서 내용의 digest"""
+        tensor = tensor.detach().cpu().contiguous()
+        digest = hashlib.blake2b(digest_size=_DIGEST_SIZE)
+        digest.update(f"{self.__version}/{tensor.dtype}/{tuple(tensor.shape)}".encode())
+        if tensor.numel() > 0:
+            digest.update(tensor.reshape(-1).view(torch.uint8).numpy())
+        return digest.digest()
+
+    def get(self, key: bytes) -> Optional[torch.Tensor]:
+        """저장된 결과, 없으면 None"""
+        with self.__lock:
+            output = self.__entries.get(key)
+            if output is None:
+                self.__misses += 1
+                return None
+            self.__entries.move_to_end(key)
+            self.__hits += 1
+            return output
+
+    def put(self, key: bytes, output: torch.Tensor) -> None:
+        """결과 저장, 한도를 넘으면 오래된 항목 제거 (한도보다 큰 결과는 저장하지 않음)"""
+        output = output.detach().cpu()
+        size = _nbytes(output)
+        if size > self.__max_bytes:
+            return
+        with self.__lock:
+            previous = self.__entries.pop(key, None)
+            if previous is not None:
+                self.__bytes -= _nbytes(previous)
+            self.__entries[key] = output
+            self.__bytes += size
+            while (
+                len(self.__entries) > self.__max_entries
+                or self.__bytes > self.__max_bytes
+            ):
+                _, evicted = self.__entries.popitem(last=False)
+                self.__bytes -= _nbytes(evicted)
+                self.__evictions += 1
+
+    def set_version(self, version: str) -> bool:
+        """모델 버전 변경, 바뀌었으면 모든 항목을 무효화하고 True"""
+        with self.__lock:
+            if version == self.__version:
+                return False
+            self.__version = version
+            self.__entries.clear()
+            self.__bytes = 0
+            return True
+
+    def report(self) -> str:
+        """적중률과 사용량 문자열"""
+        with self.__lock:
+            lookups = self.__hits + self.__misses
+            ratio = self.__hits / lookups if lookups else 0.0
+            return (
+                f"result cache: hit {self.__hits} ({ratio:.1%}), miss {self.__misses},"
+                f" evicted {self.__evictions}, {len(self.__entries)} entries"
+                f" {self.__bytes / 1024:.1f} KiB / {self.__max_bytes / 1024:.0f} KiB"
+            )
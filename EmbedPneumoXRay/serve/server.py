@@ -0,0 +1,346 @@
+import os
+import time
+import socket
+import asyncio
+from concurrent.futures import Future
+from typing import Callable, NamedTuple, Optional, Set
+
+import torch
+
+from comm import ProtocolError, MSG_RESPONSE, MSG_PING, ENC_RAW, ENC_SHM
+from comm import STATUS_BUSY, STATUS_EXPIRED
+from comm import read_frame, decode_tensor, write_tensor, write_error, TraceWriter
+from comm import SharedTensorReader, local_socket_path
+
+from .batcher import InferenceFuture, RequestExpired, BatchScheduler
+from .cache import ResultCache
+
+__all__ = ["ServerLimits", "InferenceServer"]
+
+# client_id가 없는 접속의 공정 분배 단위 (헤더 ID와 겹치지 않게)
+_STREAM_CLIENT = 1 << 32
+
+
+class ServerLimits(NamedTuple):
+    max_connections: int = 256  # 동시 접속 수
+    max_concurrent_requests: int = 64  # 서버 전체에서 처리 중인 요청 수
+    max_queue_depth: int = 32  # 배치 스케줄러 대기열 길이
+    max_pipeline: int = 8  # 접속 하나에서 동시에 처리하는 요청 수
+    idle_timeout: float = 300.0  # 다음 요청을 기다리는 시간 (초)
+    read_timeout: float = 10.0  # 요청 헤더 이후 본문 수신 및 응답 송신 기한 (초)
+    backlog: int = 128  # listen 대기열 길이
+
+
+class InferenceServer:
+    __scheduler: BatchScheduler
+    __host: str
+    __port: int
+    __limits: ServerLimits
+    __postprocess: Callable[[torch.Tensor], torch.Tensor]
+    __log: Callable[[str], None]
+    __loop: Optional[asyncio.AbstractEventLoop]
+    __stop_event: Optional[asyncio.Event]
+    __connections: Set[asyncio.Task]
+    __in_flight: int
+    __rejected: int
+    __trace: Optional[TraceWriter]
+    __streams: int
+    __local_socket: bool
+    __cache: Optional[ResultCache]
+    __pong: torch.Tensor = torch.empty(0, dtype=torch.uint8)
+
+    def __init__(
+        self,
+        scheduler: BatchScheduler,
+        host: str,
+        port: int,
+        limits: ServerLimits = ServerLimits(),
+        postprocess: Callable[[torch.Tensor], torch.Tensor] = None,
+        log: Callable[[str], None] = print,
+        trace: Optional[TraceWriter] = None,
+        local_socket: bool = True,
+        cache: Optional[ResultCache] = None,
+    ) -> None:
+        """asyncio 이벤트 루프 기반 AI 연산 서버 (모델 실행은 배치 스케줄러 스레드가 담당)
+
+        trace를 지정하면 접속별 요청과 응답을 기록합니다.
+        local_socket이 True이면 같은 호스트 클라이언트용 Unix 소켓(공유 메모리 요청 허용)도 엽니다.
+        cache를 지정하면 같은 요청 텐서는 모델을 실행하지 않고 저장된 결과로 바로 응답합니다.
+        """
+        self.__scheduler = scheduler
+        self.__host = host
+        self.__port = port
+        self.__limits = limits
+        self.__postprocess = postprocess or (lambda output: output)
+        self.__log = log
+        self.__loop = None
+        self.__stop_event = None
+        self.__connections = set()
+        self.__in_flight = 0
+        self.__rejected = 0
+        self.__trace = trace
+        self.__streams = 0
+        self.__local_socket = local_socket and hasattr(asyncio, "start_unix_server")
+        self.__cache = cache
+
+    @property
+    def connection_count(self) -> int:
+        """접속 중인 클라이언트 수"""
+        return len(self.__connections)
+
+    @property
+    def in_flight(self) -> int:
+        """처리 중인 요청 수"""
+        return self.__in_flight
+
+    @property
+    def rejected(self) -> int:
+        """과부하로 거절한 요청 수"""
+        return self.__rejected
+
+    def run(self) -> None:
+        """이벤트 루프를 생성하고 종료 요청까지 서버 실행 (블로킹)"""
+        asyncio.run(self.serve())
+
+    def stop(self) -> None:
+        """서버 종료 요청, 다른 스레드에서 호출 가능"""
+        if self.__loop is None or self.__stop_event is None:
+            return
+        self.__loop.call_soon_threadsafe(self.__stop_event.set)
+
+    async def serve(self) -> None:
+        """서버 실행"""
+        self.__loop = asyncio.get_running_loop()
+        self.__stop_event = asyncio.Event()
+        server = await asyncio.start_server(
+            self._handle_client,
+            self.__host,
+            self.__port,
+            backlog=self.__limits.backlog,
+        )
+        self.__log(f"서버 시작: {self.__host}:{self.__port}")
+        local_server, path = None, ""
+        if self.__local_socket:
+            path = local_socket_path(server.sockets[0].getsockname()[1])
+            if os.path.exists(path):
+                os.unlink(path)  # 이전 실행이 남긴 소켓 파일
+            local_server = await asyncio.start_unix_server(self._handle_client, path)
+            self.__log(f"로컬 접속 (Unix 소켓 + 공유 메모리): {path}")
+        try:
+            async with server:
+                await self.__stop_event.wait()
+        finally:
+            if local_server is not None:
+                local_server.close()
+                await local_server.wait_closed()
+                os.unlink(path)
+            for task in list(self.__connections):
+                task.cancel()
+            await asyncio.gather(*self.__connections, return_exceptions=True)
+            self.__log(f"서버 종료: {self.__host}:{self.__port}")
+
+    def _retry_after_ms(self) -> int:
+        """대기열을 비우는 데 걸릴 예상 시간 (ms)"""
+        batches = self.__scheduler.queue_depth / self.__scheduler.max_batch_size
+        return max(10, int((batches + 1) * self.__scheduler.batch_latency * 1000))
+
+    def _busy_reason(self) -> Optional[str]:
+        """요청을 받을 수 없는 이유, 수용 가능하면 None"""
+        if self.__in_flight >= self.__limits.max_concurrent_requests:
+            return f"server busy: {self.__in_flight} requests in flight"
+        if self.__scheduler.queue_depth >= self.__limits.max_queue_depth:
+            return f"server busy: {self.__scheduler.queue_depth} requests queued"
+        return None
+
+    def _reject(self, writer: asyncio.StreamWriter, request_id: int, reason: str):
+        """과부하 거절 응답"""
+        self.__rejected += 1
+        write_error(
+            writer,
+            request_id,
+            reason,
+            status=STATUS_BUSY,
+            queue_depth=self.__scheduler.queue_depth,
+            retry_after_ms=self._retry_after_ms(),
+        )
+
+    async def _handle_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """클라이언트 접속 처리, 연결이 끊길 때까지 요청을 배치 스케줄러에 등록"""
+        task = asyncio.current_task()
+        address = writer.get_extra_info("peername")
+        if len(self.__connections) >= self.__limits.max_connections:
+            self.__log(f"접속 거절 (최대 접속 수 초과): {address}")
+            self._reject(writer, 0, "server busy: too many connections")
+            await self._close(writer)
+            return
+        self.__connections.add(task)
+        self.__streams += 1
+        stream = self.__streams
+        sock: socket.socket = writer.get_extra_info("socket")
+        if sock is not None and sock.family != socket.AF_UNIX:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.__log(f"클라이언트 접속: {address}")
+        replies = set()
+        shared = None
+        if sock is not None and sock.family == socket.AF_UNIX:
+            shared = SharedTensorReader()
+        try:
+            while True:
+                if len(replies) >= self.__limits.max_pipeline:
+                    # 응답이 밀린 접속은 읽기를 멈춰 TCP 흐름 제어로 송신 측을 늦춤
+                    await asyncio.wait(replies, return_when=asyncio.FIRST_COMPLETED)
+                header, meta, payload = await read_frame(
+                    reader, self.__limits.idle_timeout, self.__limits.read_timeout
+                )
+                if header.encoding == ENC_SHM:
+                    if shared is None:
+                        raise ProtocolError("shared memory request over TCP")
+                    tensor = shared.tensor(header, meta)
+                else:
+                    tensor = decode_tensor(header, payload, meta)
+                if self.__trace is not None:
+                    # 공유 메모리 슬롯은 응답 후 재사용되므로 복사해서 기록
+                    self.__trace.record(
+                        header.kind,
+                        header.request_id,
+                        tensor.clone() if header.encoding == ENC_SHM else tensor,
+                        stream,
+                        ENC_RAW if header.encoding == ENC_SHM else header.encoding,
+                        deadline_ms=header.deadline_ms,
+                        client_id=header.client_id,
+                    )
+                if header.kind == MSG_PING:
+                    write_tensor(writer, self.__pong, header.request_id, MSG_RESPONSE)
+                    await self._drain(writer)
+                    continue
+                key = None
+                if self.__cache is not None:
+                    # 캐시 적중은 모델을 실행하지 않으므로 과부하 상태에서도 응답
+                    key = self.__cache.key(tensor)
+                    output = self.__cache.get(key)
+                    if output is not None:
+                        self._send_output(writer, header.request_id, output, stream)
+                        await self._drain(writer)
+                        continue
+                reason = self._busy_reason()
+                if reason is not None:
+                    self._reject(writer, header.request_id, reason)
+                    await self._drain(writer)
+                    continue
+                deadline = None
+                if header.deadline_ms:
+                    # 기한은 서버 도착 시점 기준 (클라이언트와 시계를 맞추지 않음)
+                    deadline = time.monotonic() + header.deadline_ms / 1000
+                future = self.__scheduler.submit(
+                    tensor, deadline, header.client_id or _STREAM_CLIENT + stream
+                )
+                self.__in_flight += 1
+                reply = asyncio.ensure_future(
+                    self._reply(writer, header.request_id, future, stream, key)
+                )
+                replies.add(reply)
+                reply.add_done_callback(
+                    lambda task, future=future: self._reply_done(replies, task, future)
+                )
+        except ConnectionError:
+            self.__log(f"클라이언트 접속 종료: {address}")
+        except asyncio.TimeoutError:
+            self.__log(f"클라이언트 접속 대기 시간 초과: {address}")
+        except ProtocolError as e:
+            self.__log(f"잘못된 요청: {address} {e}")
+            write_error(writer, 0, str(e))
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self.__log(f"클라이언트 접속 오류: {address} {e}")
+        finally:
+            for reply in replies:
+                reply.cancel()
+            if shared is not None:
+                shared.close()
+            await self._close(writer)
+            self.__connections.discard(task)
+
+    async def _reply(
+        self,
+        writer: asyncio.StreamWriter,
+        request_id: int,
+        future: InferenceFuture,
+        stream: int = 0,
+        key: Optional[bytes] = None,
+    ) -> None:
+        """추론 결과 송신, 헤더에 대기 시간과 배치 실행 시간 기록 (key가 있으면 결과 캐시에 저장)"""
+        try:
+            output = await asyncio.wrap_future(future)
+        except RequestExpired as e:
+            write_error(
+                writer,
+                request_id,
+                str(e),
+                status=STATUS_EXPIRED,
+                queue_depth=self.__scheduler.queue_depth,
+            )
+        except Exception as e:
+            write_error(writer, request_id, str(e))
+        else:
+            output = self.__postprocess(output)
+            if key is not None:
+                self.__cache.put(key, output)
+            self._send_output(
+                writer,
+                request_id,
+                output,
+                stream,
+                queue_us=int(future.queue_time * 1e6),
+                service_us=int(future.run_time * 1e6),
+            )
+        await self._drain(writer)
+
+    def _send_output(
+        self,
+        writer: asyncio.StreamWriter,
+        request_id: int,
+        output: torch.Tensor,
+        stream: int,
+        **fields,
+    ) -> None:
+        """응답 프레임을 쓰기 버퍼에 등록하고 트레이스에 기록"""
+        if self.__trace is not None:
+            self.__trace.record(MSG_RESPONSE, request_id, output, stream)
+        write_tensor(
+            writer,
+            output,
+            request_id,
+            MSG_RESPONSE,
+            queue_depth=self.__scheduler.queue_depth,
+            **fields,
+        )
+
+    def _reply_done(
+        self, replies: Set[asyncio.Task], task: asyncio.Task, future: Future
+    ):
+        """응답 태스크 정리, 취소된 요청은 배치 스케줄러에서도 취소"""
+        replies.discard(task)
+        self.__in_flight -= 1
+        if task.cancelled():
+            future.cancel()
+
+    async def _drain(self, writer: asyncio.StreamWriter) -> None:
+        """송신 버퍼 비우기, 기한 내에 읽지 않는 클라이언트는 연결 종료"""
+        try:
+            await asyncio.wait_for(writer.drain(), self.__limits.read_timeout)
+        except asyncio.TimeoutError:
+            self.__log(f"송신 기한 초과: {writer.get_extra_info('peername')}")
+            writer.transport.abort()
+        except ConnectionError:
+            pass
+
+    async def _close(self, writer: asyncio.StreamWriter) -> None:
+        """접속 종료"""
+        writer.close()
+        try:
+            await asyncio.wait_for(writer.wait_closed(), self.__limits.read_timeout)
+        except (asyncio.TimeoutError, ConnectionError):
+            writer.transport.abort()
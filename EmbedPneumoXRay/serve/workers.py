@@ -0,0 +1,371 @@
+import os
+import time
+import queue
+import threading
+from multiprocessing.connection import Connection
+from typing import Callable, List, Optional, Tuple
+
+import torch
+import torch.multiprocessing as mp
+
+from model import optimize_for_inference, load_quantized, load_exits, attach_exits
+from model import EarlyExitSequential
+from model.early_exit import ExitStats
+
+__all__ = ["core_sets", "WorkerPool"]
+
+_START_TIMEOUT = 120.0  # 초, 모델 로드와 warm-up 포함
+
+
+def core_sets(workers: int) -> List[List[int]]:
+    """이 프로세스가 사용할 수 있는 코어를 워커 수만큼 연속 구간으로 분할"""
+    if hasattr(os, "sched_getaffinity"):
+        cores = sorted(os.sched_getaffinity(0))
+    else:
+        cores = list(range(os.cpu_count() or 1))
+    workers = max(1, min(workers, len(cores)))
+    size, extra = divmod(len(cores), workers)
+    sets = []
+    start = 0
+    for i in range(workers):
+        end = start + size + (1 if i < extra else 0)
+        sets.append(cores[start:end])
+        start = end
+    return sets
+
+
+def _shared_buffer(
+    rows: int, shape: Tuple[int, ...], dtype: torch.dtype
+) -> torch.Tensor:
+    """행 rows개를 담는 공유 메모리 텐서"""
+    return torch.empty((rows,) + tuple(shape), dtype=dtype).share_memory_()
+
+
+def _fits(buffer: Optional[torch.Tensor], tensor: torch.Tensor) -> bool:
+    """공유 버퍼에 텐서를 그대로 복사할 수 있는지 여부"""
+    return (
+        buffer is not None
+        and buffer.dtype == tensor.dtype
+        and buffer.shape[1:] == tensor.shape[1:]
+        and buffer.shape[0] >= tensor.shape[0]
+    )
+
+
+def _worker_main(
+    conn: Connection,
+    weight_path: str,
+    cores: List[int],
+    max_batch_size: int,
+    sample_shape: Optional[Tuple[int, ...]],
+    warmup: int,
+    optimize: bool,
+    quantized: bool,
+    exit_path: str,
+    exit_threshold: float,
+) -> None:
+    """워커 프로세스: 코어 고정, 모델 로드(int8 모델 또는 optimize이면 추론용 변환)와 warm-up 후 공유 버퍼의 배치 실행"""
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    torch.set_num_threads(max(1, len(cores)))
+    torch.set_num_interop_threads(1)
+    try:
+        note = ""
+        if quantized:
+            model, _ = load_quantized(weight_path)
+            note = f", int8 ({torch.backends.quantized.engine})"
+        else:
+            model = torch.load(weight_path, map_location="cpu", weights_only=False)
+            model.eval()
+        if optimize and sample_shape is not None:
+            sample = torch.randn((1,) + tuple(sample_shape))
+            try:
+                model, report = optimize_for_inference(model, sample)
+                note = f", {report.summary()}"
+            except ValueError as e:
+                note = f", optimize skipped: {e}"
+        if exit_path:
+            sample = None
+            if sample_shape is not None:
+                sample = torch.zeros((1,) + tuple(sample_shape))
+            try:
+                model = attach_exits(
+                    model, load_exits(exit_path), exit_threshold, sample
+                )
+                if isinstance(model, EarlyExitSequential):
+                    note += f", early exit {exit_threshold}"
+            except ValueError as e:
+                note += f", early exit skipped: {e}"
+        with torch.inference_mode():
+            if sample_shape is not None:
+                for rows in (max_batch_size, 1):
+                    sample = torch.zeros((rows,) + tuple(sample_shape))
+                    for _ in range(warmup):
+                        model(sample)
+        if isinstance(model, EarlyExitSequential):
+            model.stats.reset()  # warm-up 입력은 통계에서 제외
+    except Exception as e:
+        conn.send(("error", f"worker start failed: {e}"))
+        return
+    conn.send(("ready", (os.getpid(), note)))
+
+    inputs = None
+    outputs = None
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        command, value = message
+        if command == "stop":
+            if isinstance(model, EarlyExitSequential):
+                conn.send(("stats", dict(model.stats.counts)))
+            break
+        if command == "input":
+            inputs = value
+            continue
+        rows = value
+        try:
+            with torch.inference_mode():
+                result = model(inputs[:rows])
+            if not _fits(outputs, result):
+                outputs = _shared_buffer(
+                    max(rows, max_batch_size), result.shape[1:], result.dtype
+                )
+                conn.send(("output", outputs))
+            outputs[:rows].copy_(result)
+            conn.send(("done", rows))
+        except Exception as e:
+            conn.send(("error", str(e)))
+
+
+class _Worker:
+    process: mp.Process
+    conn: Connection
+    cores: List[int]
+    inputs: Optional[torch.Tensor] = None
+    outputs: Optional[torch.Tensor] = None
+
+
+class WorkerPool:
+    __weight_path: str
+    __workers: List[_Worker]
+    __count: int
+    __max_batch_size: int
+    __sample_shape: Optional[Tuple[int, ...]]
+    __warmup: int
+    __optimize: bool
+    __quantized: bool
+    __exit_path: str
+    __exit_threshold: float
+    __exit_stats: ExitStats
+    __idle: "queue.Queue[_Worker]"
+    __lock: threading.Lock
+    __log: Callable[[str], None]
+
+    def __init__(
+        self,
+        weight_path: str,
+        workers: int = 2,
+        max_batch_size: int = 8,
+        sample_shape: Optional[Tuple[int, ...]] = None,
+        warmup: int = 3,
+        log: Callable[[str], None] = print,
+        optimize: bool = False,
+        quantized: bool = False,
+        exit_path: str = "",
+        exit_threshold: float = 0.0,
+    ) -> None:
+        """테일 모델 복사본을 워커 프로세스 여러 개에서 실행하는 CPU 추론 풀
+
+        워커마다 서로 다른 코어 집합에 고정되며, 배치 입출력은 워커별 공유 메모리 버퍼로 주고받습니다.
+        sample_shape(배치 차원 제외 입력 shape)를 지정하면 시작 시 warm-up을 수행하며,
+        optimize이면 그 shape의 입력으로 검증한 추론용 모델(BatchNorm 합침)을 사용합니다.
+        quantized이면 weight_path는 `model.quantize`로 저장한 int8 모델입니다.
+        exit_path를 지정하면 테일 안의 출구 분류기를 붙여 확신도가 exit_threshold 이상인 샘플은 바로 반환합니다.
+        """
+        self.__weight_path = str(weight_path)
+        self.__workers = []
+        self.__count = max(1, workers)
+        self.__max_batch_size = max(1, max_batch_size)
+        self.__sample_shape = sample_shape
+        self.__warmup = warmup
+        self.__optimize = optimize
+        self.__quantized = quantized
+        self.__exit_path = str(exit_path)
+        self.__exit_threshold = exit_threshold
+        self.__exit_stats = ExitStats()
+        self.__idle = queue.Queue()
+        self.__lock = threading.Lock()
+        self.__log = log
+
+    @property
+    def workers(self) -> int:
+        """워커 프로세스 수"""
+        return self.__count
+
+    def start(self) -> None:
+        """워커 프로세스 시작, 모두 모델 로드와 warm-up을 마칠 때까지 대기"""
+        if self.__workers:
+            return
+        for cores in core_sets(self.__count):
+            self.__workers.append(self._spawn(cores))
+        # 코어 수보다 워커를 많이 요청하면 코어 수만큼만 실행
+        self.__count = len(self.__workers)
+        for worker in self.__workers:
+            try:
+                self._wait_ready(worker)
+            except RuntimeError:
+                self.stop()
+                raise
+            self.__idle.put(worker)
+
+    def _spawn(self, cores: List[int]) -> _Worker:
+        """코어 집합에 고정한 워커 프로세스 시작 (준비 완료는 _wait_ready로 확인)"""
+        context = mp.get_context("spawn")
+        parent, child = context.Pipe()
+        worker = _Worker()
+        worker.cores = cores
+        worker.conn = parent
+        worker.process = context.Process(
+            target=_worker_main,
+            args=(
+                child,
+                self.__weight_path,
+                cores,
+                self.__max_batch_size,
+                self.__sample_shape,
+                self.__warmup,
+                self.__optimize,
+                self.__quantized,
+                self.__exit_path,
+                self.__exit_threshold,
+            ),
+            daemon=True,
+        )
+        worker.process.start()
+        child.close()
+        return worker
+
+    def _wait_ready(self, worker: _Worker) -> None:
+        """워커가 모델 로드와 warm-up을 마칠 때까지 대기, 실패하면 RuntimeError"""
+        if not worker.conn.poll(_START_TIMEOUT):
+            raise RuntimeError("worker start timeout")
+        try:
+            status, value = worker.conn.recv()
+        except EOFError:
+            raise RuntimeError(f"worker exited: pid {worker.process.pid}")
+        if status != "ready":
+            raise RuntimeError(value)
+        pid, note = value
+        self.__log(f"추론 워커 시작: pid {pid}, cores {worker.cores}{note}")
+
+    @property
+    def exit_stats(self) -> ExitStats:
+        """종료한 워커들의 출구별 샘플 수 합계 (출구 분류기를 붙인 경우)"""
+        return self.__exit_stats
+
+    def stop(self, drain: float = 0.0) -> None:
+        """워커 프로세스 종료, drain초까지 실행 중인 배치가 끝나기를 기다림 (모델 교체 시)"""
+        idle = self.__idle
+        deadline = time.monotonic() + drain
+        for _ in range(len(self.__workers) if drain > 0 else 0):
+            try:
+                idle.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+        for worker in self.__workers:
+            try:
+                worker.conn.send(("stop", None))
+            except (BrokenPipeError, OSError):
+                pass
+        for worker in self.__workers:
+            try:
+                if self.__exit_path and worker.conn.poll(1.0):
+                    status, value = worker.conn.recv()
+                    if status == "stats":
+                        for name, count in value.items():
+                            self.__exit_stats.record(name, count)
+            except (EOFError, OSError):
+                pass
+            worker.process.join(5.0)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.conn.close()
+        with self.__lock:
+            self.__workers = []
+            self.__idle = queue.Queue()
+        # 종료 전에 이 풀을 호출해 유휴 워커를 기다리던 스레드를 깨움
+        idle.put(None)
+
+    def __call__(self, inputs: torch.Tensor) -> torch.Tensor:
+        """유휴 워커 하나에서 배치 실행 (여러 스레드에서 동시에 호출 가능)"""
+        idle = self.__idle
+        worker = idle.get()
+        if worker is None:
+            idle.put(None)
+            raise RuntimeError("worker pool stopped")
+        try:
+            return self._run(worker, inputs.cpu())
+        finally:
+            if worker.process.is_alive():
+                idle.put(worker)
+            else:
+                self._respawn(worker, idle)
+
+    def _respawn(self, worker: _Worker, idle: "queue.Queue[_Worker]") -> None:
+        """종료된 워커를 같은 코어 집합에 다시 시작, 실패하면 로그를 남기고 풀에서 제외"""
+        self.__log(
+            f"추론 워커 종료됨: pid {worker.process.pid}"
+            f" (exit code {worker.process.exitcode}), 다시 시작"
+        )
+        worker.conn.close()
+        with self.__lock:
+            if idle is not self.__idle:
+                return  # 풀 종료 중
+            replacement = self._spawn(worker.cores)
+            self.__workers[self.__workers.index(worker)] = replacement
+        try:
+            self._wait_ready(replacement)
+        except (RuntimeError, OSError) as e:
+            self.__log(f"추론 워커 다시 시작 실패: {e}")
+            if replacement.process.is_alive():
+                replacement.process.terminate()
+            with self.__lock:
+                if replacement in self.__workers:
+                    self.__workers.remove(replacement)
+                    self.__count = len(self.__workers)
+                if not self.__workers:
+                    # 남은 워커가 없으면 대기 중인 호출도 실패하도록 깨움
+                    idle.put(None)
+            return
+        idle.put(replacement)
+
+    def _send(self, worker: _Worker, message: tuple) -> None:
+        """워커에 명령 전송, 워커 프로세스가 종료되었으면 RuntimeError"""
+        try:
+            worker.conn.send(message)
+        except (BrokenPipeError, OSError):
+            raise RuntimeError(f"worker exited: pid {worker.process.pid}")
+
+    def _run(self, worker: _Worker, inputs: torch.Tensor) -> torch.Tensor:
+        """입력을 워커의 공유 버퍼에 복사하고 실행 결과를 받음"""
+        rows = inputs.shape[0]
+        if not _fits(worker.inputs, inputs):
+            worker.inputs = _shared_buffer(
+                max(rows, self.__max_batch_size), inputs.shape[1:], inputs.dtype
+            )
+            self._send(worker, ("input", worker.inputs))
+        worker.inputs[:rows].copy_(inputs)
+        self._send(worker, ("run", rows))
+        while True:
+            try:
+                status, value = worker.conn.recv()
+            except EOFError:
+                raise RuntimeError(f"worker exited: pid {worker.process.pid}")
+            if status == "output":
+                worker.outputs = value
+            elif status == "done":
+                # 다음 배치가 버퍼를 덮어쓰므로 복사해 반환
+                return worker.outputs[:rows].clone()
+            else:
+                raise RuntimeError(value)